@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Query
 from api.schemas import AlbumSearchResponse, AlbumDetail
 from services.metadata import MetadataService
+from services.jobs import job_manager
+from config.settings import settings
 
 router = APIRouter(prefix="/api/album", tags=["album"])
 metadata_service = MetadataService()
@@ -25,4 +27,9 @@ async def get_album_details(mbid: str):
     if not album:
         raise HTTPException(status_code=404, detail="Album not found")
 
+    # A montage request usually follows; get its first downloads going
+    # (unless downloads happen on separate workers)
+    if settings.PREFETCH_ENABLED and job_manager.queue is None:
+        job_manager.prefetcher.prefetch_album(album)
+
     return album
@@ -1,11 +1,27 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import FileResponse
-from api.schemas import MontageSaveRequest, SavedMontage, LibraryResponse
+from api.schemas import (
+    MontageSaveRequest,
+    SavedMontage,
+    LibraryResponse,
+    MontageRerenderRequest,
+    MontageRerenderResponse,
+)
+from api.routes.montage import client_id, too_busy
 from services import library
+from services.jobs import job_manager
+from services.admission import admission
+from services.formats import media_type_for_path
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/library", tags=["library"])
 
+# Peaks never change for a saved track, so clients can cache them indefinitely
+PEAKS_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 
 @router.post("/save")
 async def save_montage(request: dict):
@@ -21,7 +37,9 @@ async def save_montage(request: dict):
             job_id=job_id,
             album=album,
             duration_type=duration_type,
-            tracks=tracks
+            tracks=tracks,
+            codec=request.get("codec"),
+            bitrate=request.get("bitrate")
         )
 
         return {
@@ -66,7 +84,9 @@ async def get_library(
                 },
                 duration_type=montage["duration_type"],
                 tracks=tracks_data,
-                created_at=montage["created_at"]
+                created_at=montage["created_at"],
+                codec=montage.get("codec", "mp3"),
+                bitrate=montage.get("bitrate")
             ))
 
         return LibraryResponse(
@@ -77,6 +97,58 @@ async def get_library(
         raise HTTPException(status_code=500, detail=f"Failed to get library: {str(e)}")
 
 
+@router.post("/{montage_id}/rerender", response_model=MontageRerenderResponse)
+async def rerender_montage(montage_id: str, rerender_request: MontageRerenderRequest, request: Request):
+    """
+    Render a saved montage again at another duration, in its codec and bitrate.
+    Tracks whose source audio is still in the artifact cache aren't downloaded
+    again, and those with a cached envelope skip analysis too; only evicted
+    tracks are fetched. The new job is followed and saved like any other.
+    """
+    try:
+        montage = await library.get_montage(montage_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    album = library.montage_album(montage)
+    if album is None:
+        # Saved without recording IDs; look them up so the cache can be used
+        album = await job_manager.metadata.get_album_details(montage["album"]["mbid"])
+        if not album:
+            raise HTTPException(status_code=502, detail="Failed to fetch album details")
+
+    codec = montage.get("codec")
+    bitrate = montage.get("bitrate")
+    client = client_id(request)
+    if not job_manager.find_unfinished(album.mbid, rerender_request.duration, codec, bitrate):
+        rejection = admission.check(client)
+        if rejection:
+            logger.info(f"Refusing re-render for {client}: {rejection.message}")
+            raise too_busy(rejection)
+
+    try:
+        job_id = job_manager.create_job(
+            album.mbid,
+            rerender_request.duration,
+            codec=codec,
+            bitrate=bitrate,
+            priority=rerender_request.priority,
+            album=album
+        )
+        admission.record(client, job_id)
+    except Exception as e:
+        logger.error(f"Error re-rendering montage {montage_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to re-render montage: {str(e)}")
+
+    keys = [job_manager.artifacts.key_for(album.artist, track) for track in album.tracks]
+    return MontageRerenderResponse(
+        job_id=job_id,
+        total_tracks=len(keys),
+        cached_sources=sum(job_manager.artifacts.has_download(key) for key in keys),
+        cached_envelopes=sum(job_manager.artifacts.has_envelope(key) for key in keys)
+    )
+
+
 @router.get("/{montage_id}/tracks/{track_number}/stream")
 async def stream_track(montage_id: str, track_number: int):
     """Stream a specific track from a montage."""
@@ -94,10 +166,11 @@ async def stream_track(montage_id: str, track_number: int):
                 track_title = track.get("title", track_title)
                 break
 
+        extension = os.path.splitext(file_path)[1]
         return FileResponse(
             file_path,
-            media_type="audio/mpeg",
-            filename=f"{montage['album']['artist']} - {track_title}.mp3"
+            media_type=media_type_for_path(file_path),
+            filename=f"{montage['album']['artist']} - {track_title}{extension}"
         )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -107,6 +180,28 @@ async def stream_track(montage_id: str, track_number: int):
         raise HTTPException(status_code=500, detail=f"Failed to stream track: {str(e)}")
 
 
+@router.get("/{montage_id}/tracks/{track_number}/peaks")
+async def get_track_peaks(montage_id: str, track_number: int):
+    """
+    Get precomputed waveform peaks for a track.
+    Binary multi-resolution min/max data; see services/peaks.py for the layout.
+    """
+    try:
+        peaks_path = await library.get_track_peaks_file(montage_id, track_number)
+
+        return FileResponse(
+            peaks_path,
+            media_type="application/octet-stream",
+            headers={"Cache-Control": PEAKS_CACHE_CONTROL}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get track peaks: {str(e)}")
+
+
 @router.delete("/{montage_id}")
 async def delete_montage(montage_id: str):
     """Delete a saved montage."""
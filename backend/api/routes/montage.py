@@ -1,7 +1,18 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from api.schemas import MontageCreateRequest, MontageCreateResponse, JobStatus
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse
+from api.schemas import (
+    MontageCreateRequest,
+    MontageCreateResponse,
+    JobStatus,
+    MontageBatchRequest,
+    MontageBatchResponse,
+    BatchStatus,
+)
 from services.jobs import job_manager
+from services.batches import batch_manager
+from services.admission import admission, Rejection
+from config.settings import settings
+from services.formats import media_type_for_path
 import os
 import logging
 
@@ -10,11 +21,53 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/montage", tags=["montage"])
 
 
+def client_id(request: Request) -> str:
+    """Who a request counts against for the per-client job limit."""
+    if settings.TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def too_busy(rejection: Rejection) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=rejection.detail(),
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
+
+
 @router.post("/create", response_model=MontageCreateResponse)
-async def create_montage(montage_request: MontageCreateRequest):
-    """Create a new montage job."""
+async def create_montage(montage_request: MontageCreateRequest, request: Request):
+    """
+    Create a new montage job. Answers 429 with Retry-After when the server is
+    saturated or the client already has too many unfinished jobs; requests
+    that would attach to an identical running job are always accepted.
+    """
+    client = client_id(request)
+    existing = job_manager.find_unfinished(
+        montage_request.mbid,
+        montage_request.duration,
+        montage_request.codec,
+        montage_request.bitrate
+    )
+    if not existing or montage_request.profile:
+        rejection = admission.check(client)
+        if rejection:
+            logger.info(f"Refusing montage for {client}: {rejection.message}")
+            raise too_busy(rejection)
+
     try:
-        job_id = job_manager.create_job(montage_request.mbid, montage_request.duration)
+        job_id = job_manager.create_job(
+            montage_request.mbid,
+            montage_request.duration,
+            codec=montage_request.codec,
+            bitrate=montage_request.bitrate,
+            priority=montage_request.priority,
+            profile=montage_request.profile
+        )
+        admission.record(client, job_id)
         return MontageCreateResponse(job_id=job_id)
     except HTTPException:
         raise
@@ -26,6 +79,47 @@ async def create_montage(montage_request: MontageCreateRequest):
         )
 
 
+@router.post("/batch", response_model=MontageBatchResponse)
+async def create_montage_batch(batch_request: MontageBatchRequest, request: Request):
+    """
+    Create montage jobs for many albums at once. Returns straight away; album
+    lookups and job creation continue in the background.
+    """
+    if len(batch_request.items) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can hold at most {settings.MAX_BATCH_SIZE} items"
+        )
+
+    # The batch is admitted on the current load; its jobs then queue at their
+    # priority and count against the caller's limit for later requests
+    client = client_id(request)
+    rejection = admission.check_batch(client)
+    if rejection:
+        logger.info(f"Refusing batch of {len(batch_request.items)} for {client}: {rejection.message}")
+        raise too_busy(rejection)
+
+    batch_id = batch_manager.submit(batch_request.items, priority=batch_request.priority, client=client)
+    return MontageBatchResponse(batch_id=batch_id, total_jobs=len(batch_request.items))
+
+
+@router.get("/admission")
+async def get_admission_status(request: Request):
+    """Queue depth, free temp space, load and the caller's job count against their limits."""
+    return admission.status(client_id(request))
+
+
+@router.get("/batch/{batch_id}", response_model=BatchStatus)
+async def get_batch_status(batch_id: str):
+    """Aggregate progress of a batch and the status of each of its jobs."""
+    status = batch_manager.get_status(batch_id)
+
+    if not status:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    return status
+
+
 @router.get("/{job_id}/status", response_model=JobStatus)
 async def get_job_status(job_id: str):
     """Get the current status of a montage job."""
@@ -37,6 +131,38 @@ async def get_job_status(job_id: str):
     return status
 
 
+@router.post("/{job_id}/cancel", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running montage job and delete its temp files. A job
+    that identical requests attached to keeps running until all of them
+    have cancelled.
+    """
+    status = job_manager.get_job_status(job_id)
+
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if not await job_manager.cancel_request(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {status.status}")
+
+    return job_manager.get_job_status(job_id)
+
+
+@router.get("/{job_id}/trace")
+async def get_job_trace(job_id: str):
+    """Chrome trace-event JSON of a job created with profile=true."""
+    trace = job_manager.get_trace(job_id)
+
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No trace for this job (was it created with profile=true?)")
+
+    return JSONResponse(
+        trace,
+        headers={"Content-Disposition": f'attachment; filename="trace_{job_id}.json"'}
+    )
+
+
 @router.get("/{job_id}/download")
 async def download_montage(job_id: str):
     """Download the completed montage file."""
@@ -51,8 +177,9 @@ async def download_montage(job_id: str):
     if not status.file_path or not os.path.exists(status.file_path):
         raise HTTPException(status_code=404, detail="Montage file not found")
 
+    extension = os.path.splitext(status.file_path)[1]
     return FileResponse(
         status.file_path,
-        media_type="audio/mpeg",
-        filename=f"montage_{job_id}.mp3"
+        media_type=media_type_for_path(status.file_path),
+        filename=f"montage_{job_id}{extension}"
     )
@@ -1,5 +1,8 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from services.jobs import job_manager
+from services.broadcast import hub, EVENT_TOPICS
+from services.deltas import DeltaEncoder
+import asyncio
 import json
 
 router = APIRouter(tags=["websocket"])
@@ -19,20 +22,17 @@ async def websocket_progress(websocket: WebSocket, job_id: str):
         await websocket.close()
         return
 
-    # Define callback function
-    async def send_update(message: dict):
-        try:
-            await websocket.send_json(message)
-        except Exception as e:
-            print(f"Error sending WebSocket message: {e}")
+    # Updates are queued per connection; if this socket falls too far behind
+    # or stalls, the hub drops it and we close the connection
+    def dropped(_subscriber):
+        asyncio.create_task(websocket.close(code=1013))
 
-    # Register callback
-    job_manager.register_callback(job_id, send_update)
+    subscriber = job_manager.subscribe(job_id, websocket.send_json, on_close=dropped)
 
     # Send current status immediately
     status = job_manager.get_job_status(job_id)
     if status:
-        await websocket.send_json({
+        subscriber.offer({
             "type": "status",
             "data": status.dict()
         })
@@ -50,5 +50,80 @@ async def websocket_progress(websocket: WebSocket, job_id: str):
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for job {job_id}")
     finally:
-        # Unregister callback
-        job_manager.unregister_callback(job_id, send_update)
+        # Stop queueing updates for this socket
+        job_manager.unsubscribe(job_id, subscriber)
+
+
+@router.websocket("/ws")
+async def websocket_multiplex(websocket: WebSocket):
+    """
+    One WebSocket for any number of jobs plus library and playlist events.
+
+    Client messages (JSON):
+        {"action": "subscribe", "topics": ["job:<job_id>", "library", "playlists"]}
+        {"action": "unsubscribe", "topics": [...]}
+    or the text "ping". Every server message carries its "topic". A job topic
+    starts with a "snapshot" and then gets compact "delta" messages.
+    """
+    await websocket.accept()
+    encoder = DeltaEncoder()
+
+    async def send(message: dict):
+        encoded = encoder.encode(message)
+        if encoded is not None:
+            await websocket.send_json(encoded)
+
+    def dropped(_subscriber):
+        asyncio.create_task(websocket.close(code=1013))
+
+    subscriber = hub.connect(send, on_close=dropped)
+
+    def reply(message_type: str, data: dict, topic: str = None):
+        subscriber.offer({"topic": topic, "type": message_type, "data": data})
+
+    try:
+        while True:
+            text = await websocket.receive_text()
+            if text == "ping":
+                await websocket.send_text("pong")
+                continue
+
+            try:
+                request = json.loads(text)
+                action = request["action"]
+                topics = request.get("topics") or []
+                if not isinstance(topics, list) or not all(isinstance(topic, str) for topic in topics):
+                    raise TypeError("topics must be a list of strings")
+            except (ValueError, KeyError, TypeError, AttributeError):
+                reply("error", {"message": "Expected {\"action\": ..., \"topics\": [\"...\", ...]}"})
+                continue
+
+            if action == "subscribe":
+                for topic in topics:
+                    if topic in subscriber.topics:
+                        continue
+                    if topic.startswith("job:"):
+                        status = job_manager.get_job_status(topic[len("job:"):])
+                        if not status:
+                            reply("error", {"message": "Job not found"}, topic)
+                            continue
+                        hub.attach(topic, subscriber)
+                        subscriber.offer({"topic": topic, "type": "status", "data": status.dict()})
+                    elif topic in EVENT_TOPICS:
+                        hub.attach(topic, subscriber)
+                    else:
+                        reply("error", {"message": "Unknown topic"}, topic)
+            elif action == "unsubscribe":
+                for topic in topics:
+                    hub.detach(topic, subscriber)
+                    encoder.forget(topic)
+            else:
+                reply("error", {"message": f"Unknown action: {action}"})
+                continue
+
+            reply("subscriptions", {"topics": sorted(subscriber.topics)})
+
+    except WebSocketDisconnect:
+        print("Multiplexed WebSocket disconnected")
+    finally:
+        hub.disconnect(subscriber)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Generic, TypeVar
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Generic, TypeVar
 from enum import Enum
 
 T = TypeVar('T')
@@ -25,11 +25,24 @@ class DurationType(str, Enum):
     LONG = "long"
 
 
+class AudioCodec(str, Enum):
+    MP3 = "mp3"
+    AAC = "aac"
+    OPUS = "opus"
+
+
+class JobPriority(str, Enum):
+    HIGH = "high"
+    NORMAL = "normal"
+    LOW = "low"
+
+
 class Track(BaseModel):
     number: int
     title: str
     duration: Optional[int] = None  # Duration in seconds
     file_path: Optional[str] = None  # Path to individual track file
+    recording_id: Optional[str] = None  # MusicBrainz recording MBID
 
 
 class AlbumSearchResult(BaseModel):
@@ -56,6 +69,10 @@ class AlbumSearchResponse(BaseModel):
 class MontageCreateRequest(BaseModel):
     mbid: str
     duration: DurationType
+    codec: Optional[AudioCodec] = None  # Defaults to settings.CLIP_CODEC
+    bitrate: Optional[str] = Field(None, pattern=r"^\d{2,3}k$")  # e.g. "96k"
+    priority: JobPriority = JobPriority.NORMAL
+    profile: bool = False  # Record a Chrome trace, served at /api/montage/{job_id}/trace
 
 
 class MontageCreateResponse(BaseModel):
@@ -65,12 +82,20 @@ class MontageCreateResponse(BaseModel):
 class TrackStatus(BaseModel):
     track_number: int
     track_title: str
-    status: str  # "pending", "downloading", "analyzing", "complete", "failed"
+    status: str  # "pending", "downloading", "analyzing", "encoding", "complete", "failed"
     error: Optional[str] = None
+    timings: Dict[str, float] = {}  # Seconds per step: download, analyze, extract, normalize, encode
+
+
+class StageStatus(BaseModel):
+    queued: int = 0  # Tracks waiting for this stage
+    active: int = 0  # Tracks being worked on
+    done: int = 0  # Tracks this stage has finished with
+    workers: int = 0
 
 
 class JobStatus(BaseModel):
-    status: str  # "queued", "processing", "completed", "failed"
+    status: str  # "queued", "processing", "completed", "failed", "cancelled"
     progress: float  # 0.0 to 1.0
     current_track: Optional[int] = None
     total_tracks: int
@@ -78,6 +103,48 @@ class JobStatus(BaseModel):
     track_statuses: List[TrackStatus]
     errors: List[str] = []
     file_path: Optional[str] = None
+    stages: Dict[str, StageStatus] = {}  # Per-stage queue depths, keyed by stage name
+    priority: JobPriority = JobPriority.NORMAL
+    queue_position: Optional[int] = None  # 1-based while status is "queued"
+    estimated_start: Optional[str] = None  # ISO timestamp while status is "queued"
+    workspace_bytes: Optional[int] = None  # Disk used by intermediate files while running
+
+
+class MontageBatchItem(BaseModel):
+    mbid: str
+    duration: DurationType
+    codec: Optional[AudioCodec] = None
+    bitrate: Optional[str] = Field(None, pattern=r"^\d{2,3}k$")
+
+
+class MontageBatchRequest(BaseModel):
+    items: List[MontageBatchItem] = Field(..., min_length=1)
+    priority: JobPriority = JobPriority.LOW  # Batches are usually pre-generation
+
+
+class MontageBatchResponse(BaseModel):
+    batch_id: str
+    total_jobs: int
+
+
+class BatchItemStatus(BaseModel):
+    mbid: str
+    duration: DurationType
+    job_id: Optional[str] = None  # Set once the album's metadata is fetched
+    status: str  # "resolving", then the job's status; "failed" if the album lookup failed
+    progress: float = 0.0
+    error: Optional[str] = None
+
+
+class BatchStatus(BaseModel):
+    batch_id: str
+    status: str  # "resolving", "processing", "completed"
+    total_jobs: int
+    completed_jobs: int
+    failed_jobs: int
+    cancelled_jobs: int
+    progress: float  # Mean of the items' progress
+    items: List[BatchItemStatus]
 
 
 class WebSocketMessage(BaseModel):
@@ -98,12 +165,26 @@ class SavedMontage(BaseModel):
     duration_type: DurationType
     tracks: List[Track]  # Individual tracks with file paths
     created_at: str
+    codec: AudioCodec = AudioCodec.MP3
+    bitrate: Optional[str] = None
 
 
 class LibraryResponse(PaginatedResponse[SavedMontage]):
     pass
 
 
+class MontageRerenderRequest(BaseModel):
+    duration: DurationType
+    priority: JobPriority = JobPriority.NORMAL
+
+
+class MontageRerenderResponse(BaseModel):
+    job_id: str
+    total_tracks: int
+    cached_sources: int  # Tracks whose source audio is still in the artifact cache
+    cached_envelopes: int  # Tracks whose energy envelope is cached, so analysis is skipped too
+
+
 # Playlist schemas
 class PlaylistItemBase(BaseModel):
     """Base class for playlist items."""
@@ -0,0 +1,46 @@
+"""
+Encode time and size per codec for clips and montages.
+
+Usage (from backend/):
+    python -m benchmarks.codec_benchmark [audio_file]
+
+Without an audio file, 30 seconds of synthetic stereo audio is used.
+"""
+import io
+import sys
+import time
+import numpy as np
+from pydub import AudioSegment
+from api.schemas import AudioCodec
+from services.formats import export_kwargs, resolve_bitrate
+
+
+def synthetic_audio(seconds: float = 30.0, rate: int = 44100) -> AudioSegment:
+    t = np.arange(int(seconds * rate)) / rate
+    rng = np.random.default_rng(0)
+    left = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(len(t))
+    right = 0.3 * np.sin(2 * np.pi * 330 * t) + 0.05 * rng.standard_normal(len(t))
+    samples = (np.clip(np.stack([left, right], axis=1), -1, 1) * 32767).astype("<i2")
+    return AudioSegment(samples.tobytes(), sample_width=2, frame_rate=rate, channels=2)
+
+
+def main():
+    audio = AudioSegment.from_file(sys.argv[1]) if len(sys.argv) > 1 else synthetic_audio()
+    seconds = len(audio) / 1000
+
+    print(f"Source: {seconds:.1f}s, {audio.frame_rate} Hz, {audio.channels} ch")
+    print(f"{'codec':<6} {'kind':<8} {'bitrate':>8} {'encode s':>9} {'x realtime':>11} {'bytes/s':>9}")
+
+    for codec in AudioCodec:
+        for kind in ("clip", "montage"):
+            bitrate = resolve_bitrate(codec, None, kind)
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            audio.export(buffer, **export_kwargs(codec, bitrate))
+            elapsed = time.perf_counter() - start
+            size = buffer.getbuffer().nbytes
+            print(f"{codec.value:<6} {kind:<8} {bitrate:>8} {elapsed:>9.3f} {seconds / elapsed:>11.1f} {size / seconds:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+API cold start: time to import main.py in a fresh interpreter, and whether
+any heavy audio dependency got loaded on the way (they should only load on
+first use, or in compute workers).
+
+Usage (from backend/):
+    python -m benchmarks.import_benchmark [runs] [budget_seconds]
+
+Defaults to 5 runs and a 1.5 second budget for the median. Exits non-zero if
+a heavy module was imported or the median is over budget, so it can guard
+startup time in CI.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("librosa", "scipy", "numba", "pydub", "pyloudnorm", "yt_dlp")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+loaded = sorted({{name.split(".")[0] for name in sys.modules}} & set({HEAVY_MODULES!r}))
+print(json.dumps({{"seconds": elapsed, "heavy": loaded}}))
+"""
+
+
+def probe(importtime: bool = False) -> subprocess.CompletedProcess:
+    flags = ["-X", "importtime"] if importtime else []
+    return subprocess.run(
+        [sys.executable, *flags, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+
+def slowest_packages(importtime_log: str, count: int = 8):
+    """Top-level packages by time spent importing their own modules, from -X importtime output."""
+    totals = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            package = name.strip().split(".")[0]
+            totals[package] = totals.get(package, 0) + int(own)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
+
+    # The first run also warms the filesystem cache and records import times
+    first = probe(importtime=True)
+    results = [json.loads(first.stdout)]
+    results += [json.loads(probe().stdout) for _ in range(runs - 1)]
+
+    times = [result["seconds"] for result in results]
+    heavy = sorted({name for result in results for name in result["heavy"]})
+    median = statistics.median(times)
+
+    print(f"import main: median {median:.3f} s, min {min(times):.3f} s, max {max(times):.3f} s over {runs} run(s)")
+    print("slowest packages (first run):")
+    for package, microseconds in slowest_packages(first.stderr):
+        print(f"  {package:<24} {microseconds / 1e6:>7.3f} s")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if median > budget:
+        print(f"FAIL: median import time {median:.3f} s is over the {budget:.2f} s budget")
+        failed = True
+    if not failed:
+        print(f"OK: within the {budget:.2f} s budget, no heavy modules")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
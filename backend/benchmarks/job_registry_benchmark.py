@@ -0,0 +1,86 @@
+"""
+Memory held by historical jobs: JobStatus models vs compact JobRecords,
+with and without registry eviction.
+
+Usage (from backend/):
+    python -m benchmarks.job_registry_benchmark [job_count] [tracks_per_job]
+
+Defaults to 10000 finished jobs of 12 tracks, one failed track each.
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from api.schemas import JobStatus, Track
+from services.registry import JobRecord, JobRegistry
+
+
+def make_tracks(count: int):
+    return [Track(number=i + 1, title=f"Track title number {i + 1}", duration=200) for i in range(count)]
+
+
+def make_record(tracks) -> JobRecord:
+    record = JobRecord()
+    record.set_tracks(tracks)
+    for index in range(len(tracks)):
+        record.set_track_state(index, "complete")
+    record.set_track_state(len(tracks) - 1, "failed", "No results found")
+    record.add_error(f"Track {len(tracks)}: No results found")
+    record.completed_tracks = len(tracks) - 1
+    record.progress = 1.0
+    record.status = "completed"
+    record.stages = {
+        name: {"queued": 0, "active": 0, "done": len(tracks), "workers": 2}
+        for name in ("download", "analyze", "encode")
+    }
+    return record
+
+
+def measure(label: str, build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    held = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} {size / 1024 / 1024:>9.1f} MB {elapsed:>8.2f} s  ({len(held)} kept)")
+    return size
+
+
+def main():
+    job_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    track_count = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    tracks = make_tracks(track_count)
+
+    print(f"{job_count} finished jobs, {track_count} tracks each")
+    print(f"{'representation':<34} {'memory':>12} {'build':>10}")
+
+    def statuses():
+        return {str(i): make_record(tracks).to_status() for i in range(job_count)}
+
+    def records():
+        return {str(i): make_record(tracks) for i in range(job_count)}
+
+    def registry():
+        jobs = JobRegistry(ttl_seconds=3600, max_finished=500)
+        for i in range(job_count):
+            jobs[str(i)] = make_record(tracks)
+        return jobs
+
+    full = measure("JobStatus models (previous)", statuses)
+    compact = measure("JobRecord", records)
+    measure("JobRegistry (max 500 finished)", registry)
+    print(f"JobRecord uses {compact / full:.0%} of the JobStatus memory")
+
+    record = make_record(tracks)
+    calls = 1000
+    start = time.perf_counter()
+    for _ in range(calls):
+        record.to_status()
+    print(f"to_status(): {(time.perf_counter() - start) / calls * 1000:.3f} ms per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,135 @@ class Settings:
     CLEANUP_MAX_AGE_HOURS: int = int(os.getenv("CLEANUP_MAX_AGE_HOURS", "1"))
     CLEANUP_INTERVAL_MINUTES: int = int(os.getenv("CLEANUP_INTERVAL_MINUTES", "30"))
 
+    # Decode tracks into memory-mapped float32 files in the job's workspace instead of
+    # the Python heap; analysis and clip extraction then work on the maps
+    PCM_SCRATCH_ENABLED: bool = os.getenv("PCM_SCRATCH_ENABLED", "false").lower() == "true"
+    PCM_SCRATCH_SAMPLE_RATE: int = int(os.getenv("PCM_SCRATCH_SAMPLE_RATE", "44100"))
+
+    # Each job keeps its in-progress downloads and scratch audio in its own
+    # directory here, removed when the job ends. Can point at tmpfs (/dev/shm).
+    WORKSPACE_DIR: str = os.getenv("WORKSPACE_DIR", os.path.join(TEMP_DIR, "jobs"))
+    # Workspaces of unknown jobs untouched this long are removed on startup
+    WORKSPACE_ORPHAN_MINUTES: float = float(os.getenv("WORKSPACE_ORPHAN_MINUTES", "60"))
+
+    # Output encodings: mp3, aac or opus. Bitrates default per codec when unset.
+    CLIP_CODEC: str = os.getenv("CLIP_CODEC", "mp3").lower()
+    CLIP_BITRATE: Optional[str] = os.getenv("CLIP_BITRATE")
+    MONTAGE_CODEC: str = os.getenv("MONTAGE_CODEC", "mp3").lower()
+    MONTAGE_BITRATE: Optional[str] = os.getenv("MONTAGE_BITRATE")
+
+    # Loudness normalization: "track" brings every clip to TARGET_LUFS,
+    # "album" applies one gain to the whole album to keep relative dynamics
+    LOUDNESS_MODE: str = os.getenv("LOUDNESS_MODE", "track").lower()
+    TARGET_LUFS: float = float(os.getenv("TARGET_LUFS", "-14.0"))
+
+    # Bit depth of the waveform peak files stored next to clips and montages (8 or 16)
+    PEAKS_BITS: int = int(os.getenv("PEAKS_BITS", "8"))
+
+    # "reencode" decodes and re-encodes every clip; "frames" copies MP3 frames
+    # and only re-encodes the crossfade seams
+    MONTAGE_ASSEMBLY: str = os.getenv("MONTAGE_ASSEMBLY", "reencode").lower()
+
+    # Track pipeline: workers per stage and how many tracks may wait between
+    # stages (bounds how many decoded clips sit in memory)
+    DOWNLOAD_CONCURRENCY: int = int(os.getenv("DOWNLOAD_CONCURRENCY", "3"))
+    ANALYZE_CONCURRENCY: int = int(os.getenv("ANALYZE_CONCURRENCY", "2"))
+    ENCODE_CONCURRENCY: int = int(os.getenv("ENCODE_CONCURRENCY", "2"))
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+
+    # Global scheduler: jobs running at once, and stage slots shared by all
+    # running jobs (handed out by priority, then to the job holding fewest)
+    MAX_CONCURRENT_JOBS: int = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+    DOWNLOAD_SLOTS: int = int(os.getenv("DOWNLOAD_SLOTS", "6"))
+    ANALYZE_SLOTS: int = int(os.getenv("ANALYZE_SLOTS", str(os.cpu_count() or 2)))
+    ENCODE_SLOTS: int = int(os.getenv("ENCODE_SLOTS", str(os.cpu_count() or 2)))
+    # Assumed job length for start time estimates until real jobs have finished
+    JOB_DURATION_ESTIMATE_SECONDS: float = float(os.getenv("JOB_DURATION_ESTIMATE_SECONDS", "120"))
+
+    # Downloads and energy envelopes reused across jobs, keyed by recording
+    ARTIFACT_CACHE_ENABLED: bool = os.getenv("ARTIFACT_CACHE_ENABLED", "true").lower() == "true"
+    ARTIFACT_CACHE_DIR: str = os.getenv("ARTIFACT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".junt", "artifacts"))
+    ARTIFACT_CACHE_MAX_MB: int = int(os.getenv("ARTIFACT_CACHE_MAX_MB", "2048"))
+    ARTIFACT_CACHE_MAX_AGE_HOURS: float = float(os.getenv("ARTIFACT_CACHE_MAX_AGE_HOURS", "24"))
+
+    # Finished jobs kept in memory; older ones are still served from the job store
+    JOB_TTL_MINUTES: float = float(os.getenv("JOB_TTL_MINUTES", "60"))
+    MAX_FINISHED_JOBS: int = int(os.getenv("MAX_FINISHED_JOBS", "500"))
+    # How often expired jobs are evicted, and how long finished jobs stay in
+    # the job store (0 = forever)
+    JOB_PRUNE_INTERVAL_SECONDS: float = float(os.getenv("JOB_PRUNE_INTERVAL_SECONDS", "60"))
+    JOB_STORE_RETENTION_HOURS: float = float(os.getenv("JOB_STORE_RETENTION_HOURS", "168"))
+
+    # Admission control: new jobs get 429 + Retry-After while this many jobs are
+    # queued, TEMP_DIR has less free space, or the 1-minute load average per CPU
+    # is higher; plus unfinished jobs allowed per client (0 = no limit)
+    ADMISSION_MAX_QUEUED_JOBS: int = int(os.getenv("ADMISSION_MAX_QUEUED_JOBS", "20"))
+    ADMISSION_MIN_FREE_MB: int = int(os.getenv("ADMISSION_MIN_FREE_MB", "1024"))
+    ADMISSION_MAX_LOAD_PER_CPU: float = float(os.getenv("ADMISSION_MAX_LOAD_PER_CPU", "0"))
+    ADMISSION_RETRY_SECONDS: int = int(os.getenv("ADMISSION_RETRY_SECONDS", "30"))
+    MAX_JOBS_PER_CLIENT: int = int(os.getenv("MAX_JOBS_PER_CLIENT", "3"))
+    # Identify clients by the first X-Forwarded-For address (only behind a trusted proxy)
+    TRUST_FORWARDED_FOR: bool = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+    # Bulk submission: most items per batch, and album lookups in flight at once
+    MAX_BATCH_SIZE: int = int(os.getenv("MAX_BATCH_SIZE", "100"))
+    BATCH_METADATA_CONCURRENCY: int = int(os.getenv("BATCH_METADATA_CONCURRENCY", "4"))
+
+    # Speculative prefetch: opening an album's details starts downloading its
+    # first tracks into the artifact cache at the lowest priority; unused ones
+    # are deleted after the TTL
+    PREFETCH_ENABLED: bool = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+    PREFETCH_TRACKS: int = int(os.getenv("PREFETCH_TRACKS", "3"))
+    PREFETCH_TTL_MINUTES: float = float(os.getenv("PREFETCH_TTL_MINUTES", "10"))
+    PREFETCH_MAX_ALBUMS: int = int(os.getenv("PREFETCH_MAX_ALBUMS", "2"))
+
+    # Job and per-track state persisted so unfinished jobs resume after a restart
+    JOB_STORE_ENABLED: bool = os.getenv("JOB_STORE_ENABLED", "true").lower() == "true"
+    JOB_STORE_PATH: str = os.getenv("JOB_STORE_PATH", os.path.join(os.path.expanduser("~"), ".junt", "jobs.db"))
+
+    # WebSocket fan-out: messages a subscriber may have queued before it is
+    # dropped, and how long one send may take before the socket counts as stalled
+    WS_QUEUE_SIZE: int = int(os.getenv("WS_QUEUE_SIZE", "64"))
+    WS_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+
+    # Cancel an unfinished job once its last WebSocket subscriber has been gone
+    # this long (0 = never), and how long a cancel request waits for cleanup
+    AUTO_CANCEL_GRACE_SECONDS: float = float(os.getenv("AUTO_CANCEL_GRACE_SECONDS", "60"))
+    CANCEL_TIMEOUT_SECONDS: float = float(os.getenv("CANCEL_TIMEOUT_SECONDS", "10"))
+
+    # Jobs created with profile=true record a Chrome trace; these add process-wide
+    # cProfile / tracemalloc data to it (both slow the job down)
+    PROFILE_CPROFILE: bool = os.getenv("PROFILE_CPROFILE", "false").lower() == "true"
+    PROFILE_TRACEMALLOC: bool = os.getenv("PROFILE_TRACEMALLOC", "false").lower() == "true"
+    TRACE_DIR: str = os.getenv("TRACE_DIR", os.path.join(os.path.expanduser("~"), ".junt", "traces"))
+    # Saved traces kept, newest first; older ones are deleted when a trace is saved (0 = no limit)
+    TRACE_MAX_FILES: int = int(os.getenv("TRACE_MAX_FILES", "100"))
+    TRACE_MAX_AGE_HOURS: float = float(os.getenv("TRACE_MAX_AGE_HOURS", "168"))
+
+    # Distributed mode: the API queues jobs for separate worker processes
+    # (python worker.py) and relays their progress. The queue URL picks the
+    # backend; workers whose heartbeats stop for the lease lose their jobs.
+    JOB_QUEUE_ENABLED: bool = os.getenv("JOB_QUEUE_ENABLED", "false").lower() == "true"
+    JOB_QUEUE_URL: str = os.getenv("JOB_QUEUE_URL", "sqlite://" + os.path.join(os.path.expanduser("~"), ".junt", "queue.db"))
+    JOB_QUEUE_POLL_SECONDS: float = float(os.getenv("JOB_QUEUE_POLL_SECONDS", "0.5"))
+    WORKER_LEASE_SECONDS: float = float(os.getenv("WORKER_LEASE_SECONDS", "60"))
+    WORKER_ID: Optional[str] = os.getenv("WORKER_ID")
+
+    # Several API processes (uvicorn --workers N): job state is shared through
+    # the job store and hub messages through the event bus. A process that
+    # stops heartbeating for WORKER_LEASE_SECONDS has its jobs taken over.
+    SHARED_STATE_ENABLED: bool = os.getenv("SHARED_STATE_ENABLED", "false").lower() == "true"
+    EVENT_BUS_URL: str = os.getenv("EVENT_BUS_URL", "sqlite://" + os.path.join(os.path.expanduser("~"), ".junt", "events.db"))
+    EVENT_BUS_POLL_SECONDS: float = float(os.getenv("EVENT_BUS_POLL_SECONDS", "0.2"))
+
+    # Decode-heavy steps (librosa analysis, pydub clip extraction) in a pool of
+    # child processes instead of threads (0 = threads). Children are replaced
+    # after a number of tasks, and one that passes the RSS limit during a task
+    # is killed, failing only that track (Linux only; 0 = no limit).
+    COMPUTE_WORKERS: int = int(os.getenv("COMPUTE_WORKERS", "0"))
+    COMPUTE_MAX_TASKS_PER_CHILD: int = int(os.getenv("COMPUTE_MAX_TASKS_PER_CHILD", "25"))
+    COMPUTE_MAX_TASK_RSS_MB: int = int(os.getenv("COMPUTE_MAX_TASK_RSS_MB", "1536"))
+
     ALLOWED_ORIGINS: str = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:3000")
 
     SECRET_KEY: Optional[str] = os.getenv("SECRET_KEY")
@@ -0,0 +1,49 @@
+"""
+Junt command line. From backend/:
+
+    python -m junt batch albums.txt --duration medium --workers 4
+"""
+import argparse
+import sys
+from api.schemas import AudioCodec, DurationType
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m junt", description="Junt command-line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser(
+        "batch",
+        help="Render montages for many albums into the ~/.junt library",
+        description=(
+            "Render a montage for every album listed in a file, one MusicBrainz "
+            "release MBID or local album directory per line (blank lines and "
+            "lines starting with # are skipped), across a pool of processes."
+        )
+    )
+    batch.add_argument("file", help="File listing MBIDs and/or album directories")
+    batch.add_argument("--duration", choices=[d.value for d in DurationType], default=DurationType.MEDIUM.value)
+    batch.add_argument("--codec", choices=[c.value for c in AudioCodec], help="Clip codec (default: CLIP_CODEC)")
+    batch.add_argument("--bitrate", help="Clip bitrate, e.g. 192k (default: CLIP_BITRATE)")
+    batch.add_argument(
+        "--workers",
+        type=int,
+        help="Albums processed at once (default: CPU count divided by ANALYZE_CONCURRENCY + ENCODE_CONCURRENCY)"
+    )
+    batch.add_argument("--no-save", action="store_true", help="Render without adding the montages to the library")
+    batch.add_argument("--verbose", action="store_true", help="Show the workers' per-track output")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.command == "batch":
+        from junt.batch import run_batch
+        return run_batch(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
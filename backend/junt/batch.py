@@ -0,0 +1,279 @@
+"""
+Offline batch rendering: every album listed in a file (MusicBrainz release
+MBIDs or local album directories) is rendered by the same job pipeline the
+API uses, one album per worker process at a time, and saved to the ~/.junt
+library. Workers keep their jobs out of the API's job store. Ends with a
+throughput summary.
+"""
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import logging
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING, List, Optional
+from api.schemas import AlbumDetail, AudioCodec, JobPriority, Track
+
+if TYPE_CHECKING:
+    from services.jobs import JobManager
+
+AUDIO_EXTENSIONS = {".mp3", ".flac", ".m4a", ".aac", ".ogg", ".opus", ".wav"}
+
+# Each worker process runs its albums on one event loop, so the JobManager's
+# asyncio state stays on the loop it was first used with
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# The worker's own JobManager, created on first use
+_jobs: Optional["JobManager"] = None
+
+
+class LocalTrack(Track):
+    """A track of a local album directory, rendered from the file in place."""
+    source_path: str
+
+
+def read_sources(path: str) -> List[str]:
+    """Non-empty, non-comment lines of the input file."""
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def local_album(directory: str) -> AlbumDetail:
+    """
+    Album details for a directory of audio files, in file name order. Titles,
+    artist and album name come from the files' tags where present.
+    """
+    from pydub.utils import mediainfo
+
+    directory = os.path.abspath(directory)
+    names = sorted(
+        name for name in os.listdir(directory)
+        if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS
+    )
+    if not names:
+        raise ValueError(f"No audio files in {directory}")
+
+    artist = album_title = None
+    tracks = []
+    for number, name in enumerate(names, start=1):
+        path = os.path.join(directory, name)
+        info = mediainfo(path)
+        tags = {key.lower(): value for key, value in info.get("TAG", {}).items()}
+        artist = artist or tags.get("album_artist") or tags.get("artist")
+        album_title = album_title or tags.get("album")
+        duration = float(info.get("duration") or 0)
+        tracks.append(LocalTrack(
+            number=number,
+            title=tags.get("title") or os.path.splitext(name)[0],
+            duration=int(duration) or None,
+            source_path=path
+        ))
+
+    return AlbumDetail(
+        mbid="local-" + hashlib.sha1(directory.encode()).hexdigest()[:16],
+        title=album_title or os.path.basename(directory),
+        artist=artist or "Unknown Artist",
+        tracks=tracks
+    )
+
+
+def _cpu_seconds() -> float:
+    """CPU time of this process plus the child processes (ffmpeg) it has waited for."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _init_worker(verbose: bool):
+    global _loop
+    if not verbose:
+        # Per-track progress prints would interleave across workers
+        sys.stdout = open(os.devnull, "w")
+    logging.basicConfig(
+        level=logging.INFO if verbose else logging.WARNING,
+        format='%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s'
+    )
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+
+
+def _job_manager() -> "JobManager":
+    """
+    A JobManager without a job store: batch jobs live only in this process,
+    so a server sharing ~/.junt/jobs.db never lists or resumes them.
+    """
+    global _jobs
+    if _jobs is None:
+        from services.jobs import JobManager
+        from services.jobstore import JobStore
+        _jobs = JobManager(store=JobStore("", enabled=False))
+    return _jobs
+
+
+def render_album(source: str, duration: str, codec: Optional[str], bitrate: Optional[str]) -> dict:
+    """Pool task: render one album in this worker process."""
+    return _loop.run_until_complete(_render(source, duration, codec, bitrate))
+
+
+async def _render(source: str, duration: str, codec: Optional[str], bitrate: Optional[str]) -> dict:
+    from config.settings import settings
+    from services.processor import ProcessorService
+
+    jobs = _job_manager()
+    start = time.perf_counter()
+    start_cpu = _cpu_seconds()
+    codec = AudioCodec(codec or settings.CLIP_CODEC)
+    bitrate = ProcessorService.clip_bitrate(codec, bitrate)
+    result = {
+        "source": source,
+        "status": "failed",
+        "codec": codec.value,
+        "bitrate": bitrate,
+        "total_tracks": 0,
+        "tracks": [],
+        "errors": [],
+    }
+
+    try:
+        if os.path.isdir(source):
+            album = local_album(source)
+        else:
+            album = await jobs.metadata.get_album_details(source)
+            if not album:
+                raise ValueError("Album not found")
+        result["album"] = album.dict()
+        result["total_tracks"] = len(album.tracks)
+
+        job_id = jobs.create_job(album.mbid, duration, codec, bitrate, JobPriority.LOW, album=album)
+        task = jobs.tasks.get(job_id)
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+        status = jobs.get_job_status(job_id)
+        complete = {track.track_number for track in status.track_statuses if track.status == "complete"}
+        result.update(
+            job_id=job_id,
+            status=status.status,
+            errors=list(status.errors),
+            tracks=[
+                {
+                    "number": track.number,
+                    "title": track.title,
+                    "duration": track.duration or 0,
+                    "recording_id": track.recording_id
+                }
+                for track in album.tracks
+                if track.number in complete
+            ]
+        )
+    except Exception as e:
+        result["errors"].append(str(e))
+
+    result["seconds"] = time.perf_counter() - start
+    result["cpu_seconds"] = _cpu_seconds() - start_cpu
+    return result
+
+
+async def _save(result: dict):
+    from services import library
+
+    album = {key: value for key, value in result["album"].items() if key != "tracks"}
+    await library.save_montage(
+        job_id=result["job_id"],
+        album=album,
+        duration_type=result["duration"],
+        tracks=result["tracks"],
+        codec=result["codec"],
+        bitrate=result["bitrate"]
+    )
+
+
+def _describe(result: dict) -> str:
+    album = result.get("album")
+    name = f"{album['artist']} - {album['title']}" if album else result["source"]
+    line = f"{name}: {result['status']}, {len(result['tracks'])}/{result['total_tracks']} tracks in {result['seconds']:.1f}s"
+    if result["status"] != "completed" and result["errors"]:
+        line += f" ({result['errors'][-1]})"
+    return line
+
+
+def _summary(results: List[dict], wall_seconds: float) -> List[str]:
+    completed = sum(result["status"] == "completed" for result in results)
+    tracks = sum(len(result["tracks"]) for result in results)
+    total_tracks = sum(result["total_tracks"] for result in results)
+    cpu = sum(result["cpu_seconds"] for result in results)
+    return [
+        f"Albums: {completed} completed, {len(results) - completed} failed",
+        f"Tracks: {tracks} rendered of {total_tracks}",
+        f"Wall time: {wall_seconds:.1f}s",
+        f"Throughput: {tracks / (wall_seconds / 60) if wall_seconds else 0:.1f} tracks/min",
+        f"CPU: {cpu:.1f}s total, {cpu / tracks if tracks else 0:.1f} CPU-seconds per track",
+    ]
+
+
+def default_workers() -> int:
+    """
+    Worker processes that keep the CPUs busy without oversubscribing them.
+    Each album already runs up to ANALYZE_CONCURRENCY + ENCODE_CONCURRENCY
+    decodes and encodes at once (in its own compute pool and ffmpeg
+    processes), so one worker per CPU would run that many times too many.
+    """
+    from config.settings import settings
+
+    per_album = max(1, settings.ANALYZE_CONCURRENCY + settings.ENCODE_CONCURRENCY)
+    return max(1, (os.cpu_count() or 1) // per_album)
+
+
+def run_batch(args) -> int:
+    """Render every album in args.file. Returns the exit code: 0 if all completed."""
+    sources = read_sources(args.file)
+    if not sources:
+        print(f"No albums listed in {args.file}")
+        return 1
+
+    workers = max(1, min(args.workers or default_workers(), len(sources)))
+    print(f"Rendering {len(sources)} album(s) at {args.duration} with {workers} worker process(es)")
+
+    results = []
+    start = time.perf_counter()
+    # Spawned workers start clean instead of inheriting this process's state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(args.verbose,)) as pool:
+        futures = {
+            pool.submit(render_album, source, args.duration, args.codec, args.bitrate): source
+            for source in sources
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process died
+                result = {
+                    "source": futures[future],
+                    "status": "failed",
+                    "total_tracks": 0,
+                    "tracks": [],
+                    "errors": [str(e) or type(e).__name__],
+                    "seconds": 0.0,
+                    "cpu_seconds": 0.0,
+                }
+            result["duration"] = args.duration
+
+            if result["status"] == "completed" and not args.no_save:
+                try:
+                    asyncio.run(_save(result))
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["errors"].append(f"Failed to save: {e}")
+
+            results.append(result)
+            print(f"[{done}/{len(sources)}] {_describe(result)}", flush=True)
+
+    print()
+    for line in _summary(results, time.perf_counter() - start):
+        print(line)
+    return 0 if all(result["status"] == "completed" for result in results) else 1
@@ -1,8 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from api.routes import album, montage, websocket, library, playlist, cleanup
 from services.cleanup import cleanup_service
+from services.jobs import job_manager
+from services.jobqueue import open_queue
+from services.eventbus import open_bus, process_id
+from services.broadcast import hub
+from services.computepool import compute_pool
+from services import metrics
 from config.settings import settings
+import asyncio
 import os
 import logging
 
@@ -23,6 +31,24 @@ app = FastAPI(
 @app.on_event("startup")
 async def startup_event():
     """Start background services on application startup."""
+    if settings.SHARED_STATE_ENABLED:
+        hub.use_bus(
+            open_bus(settings.EVENT_BUS_URL, process_id()),
+            settings.EVENT_BUS_POLL_SECONDS,
+            settings.WORKER_LEASE_SECONDS
+        )
+        job_manager.use_shared_state()
+        logging.info(f"Shared-state mode: process {process_id()} on {settings.EVENT_BUS_URL}")
+
+    if settings.JOB_QUEUE_ENABLED:
+        job_manager.use_queue(open_queue(settings.JOB_QUEUE_URL, settings.WORKER_LEASE_SECONDS))
+        logging.info(f"Distributed mode: queueing jobs on {settings.JOB_QUEUE_URL}")
+
+    resumed = job_manager.resume_jobs()
+    if resumed:
+        logging.info(f"Resumed {resumed} unfinished job(s)")
+    job_manager.start_pruning()
+
     if settings.CLEANUP_ENABLED:
         cleanup_service.start_periodic_cleanup(interval_minutes=settings.CLEANUP_INTERVAL_MINUTES)
         logging.info(f"Cleanup service started: interval={settings.CLEANUP_INTERVAL_MINUTES}min, max_age={settings.CLEANUP_MAX_AGE_HOURS}h")
@@ -31,6 +57,15 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop background services on application shutdown."""
+    if job_manager.relay:
+        await job_manager.relay.stop()
+    if job_manager.adopter:
+        job_manager.adopter.cancel()
+    if job_manager.pruner:
+        job_manager.pruner.cancel()
+    await hub.close_bus()
+    compute_pool.shutdown()
+
     if settings.CLEANUP_ENABLED:
         await cleanup_service.stop_periodic_cleanup()
 
@@ -68,6 +103,19 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/compute")
+async def compute_stats():
+    """Memory and task counts of the compute pool's worker processes."""
+    return compute_pool.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage timings, job and cache counters, and queue gauges in Prometheus text format."""
+    metrics.temp_dir_bytes.set(await asyncio.to_thread(metrics.directory_bytes, settings.TEMP_DIR))
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,193 @@
+import math
+import os
+import shutil
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from config.settings import settings
+from services.jobs import JobManager, job_manager
+
+logger = logging.getLogger(__name__)
+
+
+class Rejection:
+    """Why a montage request was turned away and when to come back."""
+
+    def __init__(self, reason: str, message: str, retry_after: int, estimated_start: Optional[datetime] = None):
+        self.reason = reason  # "queue_full", "disk_space", "cpu_load" or "client_limit"
+        self.message = message
+        self.retry_after = max(1, retry_after)
+        self.estimated_start = estimated_start
+
+    def detail(self) -> dict:
+        return {
+            "message": self.message,
+            "reason": self.reason,
+            "retry_after": self.retry_after,
+            "estimated_start": self.estimated_start.isoformat() if self.estimated_start else None,
+        }
+
+
+class AdmissionController:
+    """
+    Decides whether a new montage job may be queued. Requests are refused
+    while the queue is too deep, TEMP_DIR is short of space or the CPUs are
+    overloaded, and when one client already has too many unfinished jobs.
+    A limit set to 0 is not checked.
+    """
+
+    def __init__(
+        self,
+        jobs: JobManager,
+        temp_dir: str,
+        max_queued_jobs: int = 20,
+        min_free_mb: int = 1024,
+        max_load_per_cpu: float = 0.0,
+        max_jobs_per_client: int = 0,
+        retry_seconds: int = 30
+    ):
+        self.jobs = jobs
+        self.temp_dir = temp_dir
+        self.max_queued_jobs = max_queued_jobs
+        self.min_free_mb = min_free_mb
+        self.max_load_per_cpu = max_load_per_cpu
+        self.max_jobs_per_client = max_jobs_per_client
+        self.retry_seconds = retry_seconds
+        self.client_jobs: Dict[str, Set[str]] = {}  # Client -> job IDs it started
+
+    def free_mb(self) -> Optional[float]:
+        try:
+            return shutil.disk_usage(self.temp_dir).free / 1024 / 1024
+        except OSError:
+            return None
+
+    @staticmethod
+    def load_per_cpu() -> Optional[float]:
+        try:
+            return os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):
+            return None  # Not available on this platform
+
+    def active_jobs(self, client: str) -> int:
+        """Unfinished jobs a client started, forgetting finished ones."""
+        job_ids = self.client_jobs.get(client)
+        if not job_ids:
+            return 0
+        for job_id in list(job_ids):
+            job = self.jobs.jobs.get(job_id)
+            if job is None or job.finished:
+                job_ids.discard(job_id)
+        if not job_ids:
+            del self.client_jobs[client]
+        return len(job_ids)
+
+    def check(self, client: Optional[str] = None, new_jobs: int = 1) -> Optional[Rejection]:
+        """
+        Args:
+            client: Caller identity for the per-client limit, or None to skip it
+            new_jobs: Jobs the request would add to the queue
+
+        Returns:
+            None if the request may proceed, otherwise the reason it can't
+        """
+        scheduler = self.jobs.scheduler
+        queued = self.jobs.queued_count()
+
+        if self.max_queued_jobs and queued + new_jobs > self.max_queued_jobs:
+            # Come back when enough queued jobs should have started
+            excess = queued + new_jobs - self.max_queued_jobs
+            delay = scheduler.start_delay(excess)
+            return Rejection(
+                "queue_full",
+                f"{queued} jobs are already queued",
+                math.ceil(delay) or self.retry_seconds,
+                datetime.now() + timedelta(seconds=scheduler.start_delay(queued + 1))
+            )
+
+        free_mb = self.free_mb()
+        if self.min_free_mb and free_mb is not None and free_mb < self.min_free_mb:
+            return Rejection(
+                "disk_space",
+                f"Only {free_mb:.0f}MB free for temporary files",
+                self.retry_seconds
+            )
+
+        load = self.load_per_cpu()
+        if self.max_load_per_cpu and load is not None and load > self.max_load_per_cpu:
+            return Rejection(
+                "cpu_load",
+                f"Server load is {load:.2f} per CPU",
+                self.retry_seconds
+            )
+
+        if client is not None and self.max_jobs_per_client:
+            active = self.active_jobs(client)
+            if active + new_jobs > self.max_jobs_per_client:
+                return Rejection(
+                    "client_limit",
+                    f"You already have {active} unfinished jobs (limit {self.max_jobs_per_client})",
+                    math.ceil(scheduler.average_job_seconds())
+                )
+
+        return None
+
+    def check_batch(self, client: Optional[str] = None) -> Optional[Rejection]:
+        """
+        Admit a batch on the server's current load: there must be room in
+        the queue for one more job, enough disk and CPU, and the client must
+        be under its job limit now. The batch's items then queue at their
+        priority without counting against either limit up front, since a
+        batch larger than a limit could never be admitted by retrying.
+
+        Returns:
+            None if the batch may proceed, otherwise the reason it can't
+        """
+        rejection = self.check(None, new_jobs=1)
+        if rejection or client is None or not self.max_jobs_per_client:
+            return rejection
+
+        active = self.active_jobs(client)
+        if active >= self.max_jobs_per_client:
+            return Rejection(
+                "client_limit",
+                f"You already have {active} unfinished jobs (limit {self.max_jobs_per_client})",
+                math.ceil(self.jobs.scheduler.average_job_seconds())
+            )
+        return None
+
+    def record(self, client: str, job_id: str):
+        """Count a job against a client's limit until it finishes."""
+        if len(self.client_jobs) > 256:
+            # Forget clients whose jobs have all finished
+            for other in list(self.client_jobs):
+                self.active_jobs(other)
+        self.client_jobs.setdefault(client, set()).add(job_id)
+
+    def status(self, client: Optional[str] = None) -> dict:
+        """Current admission inputs and limits, for clients pacing themselves."""
+        free_mb = self.free_mb()
+        load = self.load_per_cpu()
+        status = {
+            "queued_jobs": self.jobs.queued_count(),
+            "max_queued_jobs": self.max_queued_jobs,
+            "temp_free_mb": round(free_mb) if free_mb is not None else None,
+            "min_free_mb": self.min_free_mb,
+            "load_per_cpu": round(load, 2) if load is not None else None,
+            "max_load_per_cpu": self.max_load_per_cpu,
+            "max_jobs_per_client": self.max_jobs_per_client,
+        }
+        if client is not None:
+            status["client_jobs"] = self.active_jobs(client)
+        return status
+
+
+# Global admission controller instance
+admission = AdmissionController(
+    job_manager,
+    settings.TEMP_DIR,
+    max_queued_jobs=settings.ADMISSION_MAX_QUEUED_JOBS,
+    min_free_mb=settings.ADMISSION_MIN_FREE_MB,
+    max_load_per_cpu=settings.ADMISSION_MAX_LOAD_PER_CPU,
+    max_jobs_per_client=settings.MAX_JOBS_PER_CLIENT,
+    retry_seconds=settings.ADMISSION_RETRY_SECONDS
+)
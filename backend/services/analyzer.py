@@ -1,22 +1,153 @@
-import librosa
+import asyncio
 import numpy as np
-from scipy.ndimage import uniform_filter1d
-from typing import Tuple
+from typing import Optional, Tuple
+from services.computepool import compute_pool
+
+# librosa and scipy are imported inside the methods that use them: together
+# they take seconds to import, which processes that never analyze audio skip
 
 
 class AnalyzerService:
+    # Samples per memmap chunk when computing RMS without loading the whole track
+    RMS_CHUNK_SAMPLES = 1 << 20
+
     @staticmethod
-    async def find_peak_energy_window(audio_path: str, clip_duration: float) -> Tuple[float, float]:
+    def _best_window(
+        rms: np.ndarray,
+        sr: int,
+        hop_length: int,
+        margin: int,
+        total_samples: int,
+        clip_duration: float
+    ) -> Tuple[float, float]:
+        """Pick the clip window with the highest smoothed RMS energy."""
+        from scipy.ndimage import uniform_filter1d
+
+        # Smooth the energy curve
+        window_size = min(50, len(rms) // 4)
+        if window_size > 0:
+            rms_smooth = uniform_filter1d(rms, size=window_size)
+        else:
+            rms_smooth = rms
+
+        # Find window with highest average energy
+        window_frames = int(clip_duration * sr / hop_length)
+
+        if window_frames >= len(rms_smooth):
+            # Clip duration longer than available audio
+            start_time = margin / sr
+            end_time = min(start_time + clip_duration, total_samples / sr)
+            return start_time, end_time
+
+        max_energy = 0
+        best_start = 0
+
+        for i in range(len(rms_smooth) - window_frames):
+            window_energy = np.mean(rms_smooth[i:i + window_frames])
+            if window_energy > max_energy:
+                max_energy = window_energy
+                best_start = i
+
+        # Convert frame position to time
+        start_time = margin / sr + (best_start * hop_length / sr)
+        end_time = start_time + clip_duration
+
+        # Ensure we don't exceed file duration
+        total_duration = total_samples / sr
+        if end_time > total_duration:
+            end_time = total_duration
+            start_time = max(0, end_time - clip_duration)
+
+        return start_time, end_time
+
+    @staticmethod
+    def _chunked_rms(samples: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
         """
-        Find the most energetic section of an audio file.
+        RMS of the mono mix per frame, reading (samples, channels) in chunks so
+        a memory-mapped track is never copied whole onto the heap.
+        """
+        frame_count = max(0, (len(samples) - frame_length) // hop_length + 1)
+        rms = np.empty(frame_count, dtype=np.float32)
+        frames_per_chunk = max(1, AnalyzerService.RMS_CHUNK_SAMPLES // hop_length)
+
+        for first in range(0, frame_count, frames_per_chunk):
+            last = min(first + frames_per_chunk, frame_count)
+            chunk = samples[first * hop_length:(last - 1) * hop_length + frame_length]
+            mono = chunk.mean(axis=1) if chunk.ndim == 2 else chunk
+            frames = np.lib.stride_tricks.sliding_window_view(mono, frame_length)[::hop_length]
+            rms[first:last] = np.sqrt(np.mean(np.square(frames), axis=1))
+
+        return rms
+
+    @staticmethod
+    def window_from_envelope(envelope: dict, clip_duration: float) -> Tuple[float, float]:
+        """
+        Pick the clip window from a precomputed energy envelope. The same
+        envelope serves every clip duration.
+        """
+        return AnalyzerService._best_window(
+            envelope["rms"],
+            envelope["sr"],
+            envelope["hop_length"],
+            envelope["margin"],
+            envelope["total_samples"],
+            clip_duration
+        )
+
+    @staticmethod
+    async def compute_envelope_in_samples(samples: np.ndarray, sr: int) -> Optional[dict]:
+        """
+        RMS energy envelope of already-decoded audio, e.g. a memory-mapped
+        PcmScratch, without copying it.
+
+        Args:
+            samples: Samples shaped (samples, channels) or (samples,)
+            sr: Sample rate
+
+        Returns:
+            Dict with rms, sr, hop_length, margin and total_samples, or None if analysis fails
+        """
+        return await asyncio.to_thread(AnalyzerService._envelope_from_samples, samples, sr)
+
+    @staticmethod
+    def _envelope_from_samples(samples: np.ndarray, sr: int) -> Optional[dict]:
+        try:
+            # Skip first/last 10% (intros/outros)
+            margin = int(len(samples) * 0.1)
+            if margin * 2 >= len(samples):
+                margin = 0
+
+            core = samples[margin:len(samples) - margin]
+
+            # Same frame timing as compute_envelope at 22050 Hz
+            hop_length = max(1, int(round(512 * sr / 22050)))
+            frame_length = 4 * hop_length
+            rms = AnalyzerService._chunked_rms(core, frame_length, hop_length)
+
+            return {"rms": rms, "sr": sr, "hop_length": hop_length, "margin": margin, "total_samples": len(samples)}
+
+        except Exception as e:
+            print(f"Error analyzing decoded samples: {e}")
+            return None
+
+    @staticmethod
+    async def compute_envelope(audio_path: str) -> Optional[dict]:
+        """
+        RMS energy envelope of an audio file.
 
         Args:
             audio_path: Path to audio file
-            clip_duration: Desired clip duration in seconds
 
         Returns:
-            Tuple of (start_time, end_time) in seconds
+            Dict with rms, sr, hop_length, margin and total_samples, or None if analysis fails
         """
+        # Decoding and analysis are CPU-bound; keep them off the event loop
+        return await compute_pool.run(AnalyzerService._envelope_from_file, audio_path)
+
+    @staticmethod
+    def _envelope_from_file(audio_path: str) -> Optional[dict]:
+        import librosa
+
         try:
             # Load audio
             y, sr = librosa.load(audio_path, sr=22050, mono=True)
@@ -38,51 +169,63 @@ class AnalyzerService:
                 hop_length=hop_length
             )[0]
 
-            # Smooth the energy curve
-            window_size = min(50, len(rms) // 4)
-            if window_size > 0:
-                rms_smooth = uniform_filter1d(rms, size=window_size)
-            else:
-                rms_smooth = rms
-
-            # Find window with highest average energy
-            window_frames = int(clip_duration * sr / hop_length)
-
-            if window_frames >= len(rms_smooth):
-                # Clip duration longer than available audio
-                start_time = margin / sr
-                end_time = min(start_time + clip_duration, len(y) / sr)
-                return start_time, end_time
-
-            max_energy = 0
-            best_start = 0
-
-            for i in range(len(rms_smooth) - window_frames):
-                window_energy = np.mean(rms_smooth[i:i + window_frames])
-                if window_energy > max_energy:
-                    max_energy = window_energy
-                    best_start = i
-
-            # Convert frame position to time
-            start_time = margin / sr + (best_start * hop_length / sr)
-            end_time = start_time + clip_duration
-
-            # Ensure we don't exceed file duration
-            total_duration = len(y) / sr
-            if end_time > total_duration:
-                end_time = total_duration
-                start_time = max(0, end_time - clip_duration)
-
-            return start_time, end_time
+            return {"rms": rms, "sr": sr, "hop_length": hop_length, "margin": margin, "total_samples": len(y)}
 
         except Exception as e:
             print(f"Error analyzing {audio_path}: {e}")
-            # Fallback: use middle 30% of track
-            try:
-                duration = librosa.get_duration(path=audio_path)
-                start_time = duration * 0.35
-                end_time = min(start_time + clip_duration, duration * 0.65)
-                return start_time, end_time
-            except:
-                # Last resort fallback
-                return 30.0, 30.0 + clip_duration
+            return None
+
+    @staticmethod
+    async def find_peak_energy_window_in_samples(
+        samples: np.ndarray,
+        sr: int,
+        clip_duration: float
+    ) -> Tuple[float, float]:
+        """
+        Find the most energetic section of already-decoded audio, e.g. a
+        memory-mapped PcmScratch, without copying it.
+
+        Args:
+            samples: Samples shaped (samples, channels) or (samples,)
+            sr: Sample rate
+            clip_duration: Desired clip duration in seconds
+
+        Returns:
+            Tuple of (start_time, end_time) in seconds
+        """
+        envelope = await AnalyzerService.compute_envelope_in_samples(samples, sr)
+        if envelope is not None:
+            return AnalyzerService.window_from_envelope(envelope, clip_duration)
+
+        # Fallback: use middle 30% of track
+        duration = len(samples) / sr
+        start_time = duration * 0.35
+        end_time = min(start_time + clip_duration, duration * 0.65)
+        return start_time, end_time
+
+    @staticmethod
+    async def find_peak_energy_window(audio_path: str, clip_duration: float) -> Tuple[float, float]:
+        """
+        Find the most energetic section of an audio file.
+
+        Args:
+            audio_path: Path to audio file
+            clip_duration: Desired clip duration in seconds
+
+        Returns:
+            Tuple of (start_time, end_time) in seconds
+        """
+        envelope = await AnalyzerService.compute_envelope(audio_path)
+        if envelope is not None:
+            return AnalyzerService.window_from_envelope(envelope, clip_duration)
+
+        # Fallback: use middle 30% of track
+        try:
+            import librosa
+            duration = librosa.get_duration(path=audio_path)
+            start_time = duration * 0.35
+            end_time = min(start_time + clip_duration, duration * 0.65)
+            return start_time, end_time
+        except:
+            # Last resort fallback
+            return 30.0, 30.0 + clip_duration
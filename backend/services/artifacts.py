@@ -0,0 +1,294 @@
+import os
+import shutil
+import time
+import asyncio
+import hashlib
+import logging
+import numpy as np
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from api.schemas import Track
+from services.metrics import cache_requests_total, prefetch_total
+
+logger = logging.getLogger(__name__)
+
+
+class TrackArtifactCache:
+    """
+    Per-recording downloads and energy envelopes kept between jobs, so a
+    request that differs only in duration skips straight to clip extraction.
+
+    Files live in one flat directory named by recording key. Entries in use by
+    a running job are leased and never evicted; the rest are evicted by age and
+    then least-recently-used until the cache fits its size budget.
+
+    The directory may be shared by several processes (API workers, batch CLI
+    workers), so a lease is also recorded on disk as a ``<key>.<pid>.lock``
+    file that every process's prune respects. Locks left by processes that
+    died are removed by the next prune.
+    """
+
+    def __init__(self, cache_dir: str, max_mb: int = 2048, max_age_hours: float = 24, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.max_age_seconds = max_age_hours * 3600
+        self.enabled = enabled
+        self._pending: Dict[str, asyncio.Future] = {}  # Downloads in flight, by key
+        self._waiters: Dict[str, int] = {}  # Callers awaiting each pending download
+        self._speculative: Dict[str, float] = {}  # Prefetched keys no job has used yet -> fetch time
+        self._leases: Dict[str, int] = {}
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(artist: str, track: Track) -> str:
+        """MusicBrainz recording ID, or a hash of artist and title without one."""
+        if track.recording_id:
+            return track.recording_id
+        return hashlib.sha1(f"{artist}\n{track.title}".lower().encode()).hexdigest()
+
+    def download_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def envelope_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.env.npz")
+
+    async def fetch_download(
+        self,
+        key: str,
+        download: Callable[[], Awaitable[str]],
+        speculative: bool = False
+    ) -> str:
+        """
+        Return the cached source audio for a recording, downloading it once if
+        needed. Concurrent callers for the same key share one download. The
+        entry stays leased until release() is called.
+
+        Args:
+            key: Recording key from key_for
+            download: Coroutine function that downloads the track and returns its path
+            speculative: Prefetch ahead of any job; a download started this way
+                can be dropped with discard_speculative() if no job adopts it
+        """
+        if not self.enabled:
+            return await download()
+
+        if not speculative and self._speculative.pop(key, None) is not None:
+            prefetch_total.inc(result="adopted")
+
+        self._acquire_lease(key)
+        try:
+            path = self.download_path(key)
+            if os.path.exists(path):
+                os.utime(path)
+                logger.info(f"Reusing cached download for {key}")
+                cache_requests_total.inc(artifact="download", result="hit")
+                return path
+
+            pending = self._pending.get(key)
+            if pending is None:
+                cache_requests_total.inc(artifact="download", result="miss")
+                if speculative:
+                    self._speculative[key] = time.time()
+                pending = asyncio.ensure_future(self._store_download(key, download))
+                self._pending[key] = pending
+                pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            else:
+                cache_requests_total.inc(artifact="download", result="shared")
+
+            # Shielded so one cancelled job doesn't abort a download others
+            # wait on; the last waiter to give up cancels it
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if self._waiters.get(key) == 1:
+                    pending.cancel()
+                raise
+            finally:
+                self._waiters[key] -= 1
+                if not self._waiters[key]:
+                    del self._waiters[key]
+        except BaseException:
+            self._release_lease(key)
+            raise
+
+    async def _store_download(self, key: str, download: Callable[[], Awaitable[str]]) -> str:
+        source = await download()
+        path = self.download_path(key)
+        # Job workspaces may be on another filesystem (e.g. tmpfs)
+        shutil.move(source, path)
+        self.prune()
+        return path
+
+    def has_download(self, key: str) -> bool:
+        return self.enabled and os.path.exists(self.download_path(key))
+
+    def has_envelope(self, key: str) -> bool:
+        return self.enabled and os.path.exists(self.envelope_path(key))
+
+    def discard_speculative(self, keys: Iterable[str]) -> int:
+        """
+        Delete prefetched downloads that no job has used. Only the given keys
+        are touched, so this costs no directory scan.
+
+        Returns:
+            Number of downloads deleted
+        """
+        removed = 0
+        for key in keys:
+            if key not in self._speculative or key in self._leases or key in self._pending:
+                continue
+            if self._leased_elsewhere(key):
+                continue
+            del self._speculative[key]
+            try:
+                os.remove(self.download_path(key))
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Error discarding prefetched {key}: {e}")
+        if removed:
+            prefetch_total.inc(removed, result="discarded")
+            logger.info(f"Discarded {removed} unused prefetched download(s)")
+        return removed
+
+    def release(self, key: str, path: Optional[str]):
+        """Hand back a download from fetch_download; uncached files are deleted."""
+        if self.enabled:
+            self._release_lease(key)
+        elif path and os.path.exists(path):
+            os.remove(path)
+
+    def lock_path(self, key: str, pid: Optional[int] = None) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{pid or os.getpid()}.lock")
+
+    def _acquire_lease(self, key: str):
+        count = self._leases.get(key, 0)
+        self._leases[key] = count + 1
+        if count:
+            return
+        try:
+            with open(self.lock_path(key), "w"):
+                pass
+        except OSError as e:
+            logger.error(f"Error locking {key}: {e}")
+
+    def _release_lease(self, key: str):
+        count = self._leases.get(key, 0) - 1
+        if count > 0:
+            self._leases[key] = count
+            return
+        self._leases.pop(key, None)
+        try:
+            os.remove(self.lock_path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error unlocking {key}: {e}")
+        # Last use counts towards LRU order, even for a long lease
+        try:
+            os.utime(self.download_path(key))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _process_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass  # Exists, owned by another user
+        return True
+
+    def _leased_elsewhere(self, key: str) -> bool:
+        """Whether another live process holds a lease on a key."""
+        prefix = f"{key}."
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and name.endswith(".lock") and self._live_lock(name) not in (None, os.getpid()):
+                return True
+        return False
+
+    def _live_lock(self, name: str) -> Optional[int]:
+        """PID owning a lock file, or None (removing the lock) if that process is gone."""
+        try:
+            pid = int(name.split(".")[1])
+        except (IndexError, ValueError):
+            pid = 0
+        if pid > 0 and self._process_alive(pid):
+            return pid
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+            logger.info(f"Removed stale artifact lock {name}")
+        except OSError:
+            pass
+        return None
+
+    def load_envelope(self, key: str) -> Optional[dict]:
+        """Cached RMS envelope for a recording, as produced by AnalyzerService.compute_envelope."""
+        if not self.enabled:
+            return None
+        path = self.envelope_path(key)
+        try:
+            with np.load(path) as data:
+                envelope = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            cache_requests_total.inc(artifact="envelope", result="miss")
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable envelope {path}: {e}")
+            os.remove(path)
+            cache_requests_total.inc(artifact="envelope", result="miss")
+            return None
+
+        cache_requests_total.inc(artifact="envelope", result="hit")
+        os.utime(path)
+        envelope["rms"] = envelope["rms"].astype(np.float32)
+        for name in ("sr", "hop_length", "margin", "total_samples"):
+            envelope[name] = int(envelope[name])
+        return envelope
+
+    def store_envelope(self, key: str, envelope: dict):
+        if not self.enabled:
+            return
+        # np.savez appends .npz unless the name already ends with it
+        np.savez(self.envelope_path(key), **envelope)
+
+    def prune(self):
+        """Evict expired entries, then least recently used ones over the size budget."""
+        if not self.enabled or not os.path.isdir(self.cache_dir):
+            return
+
+        now = time.time()
+        names = os.listdir(self.cache_dir)
+        # Keys leased by any live process sharing the directory
+        locked = {
+            name.split(".", 1)[0]
+            for name in names
+            if name.endswith(".lock") and self._live_lock(name) is not None
+        }
+        entries = []
+        total = 0
+        for name in names:
+            if name.endswith(".lock"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            key = name.split(".", 1)[0]
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            if key in self._leases or key in self._pending or key in locked:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        for mtime, size, path in sorted(entries):
+            if now - mtime <= self.max_age_seconds and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                logger.error(f"Error evicting {path}: {e}")
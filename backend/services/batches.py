@@ -0,0 +1,171 @@
+import asyncio
+import uuid
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from api.schemas import (
+    AlbumDetail,
+    BatchItemStatus,
+    BatchStatus,
+    JobPriority,
+    MontageBatchItem,
+)
+from config.settings import settings
+from services.jobs import JobManager, job_manager
+from services.admission import AdmissionController, admission
+
+logger = logging.getLogger(__name__)
+
+# Job statuses that count as done for a batch
+DONE_STATES = ("completed", "failed", "cancelled")
+
+
+class MontageBatch:
+    """Items of one bulk submission and the jobs created for them."""
+
+    def __init__(
+        self,
+        batch_id: str,
+        items: List[MontageBatchItem],
+        priority: JobPriority,
+        client: Optional[str] = None
+    ):
+        self.batch_id = batch_id
+        self.items = items
+        self.priority = priority
+        self.client = client  # Whose per-client limit the jobs count against
+        self.job_ids: List[Optional[str]] = [None] * len(items)
+        self.errors: Dict[int, str] = {}  # Item index -> album lookup error
+        self.resolving = True
+
+
+class BatchManager:
+    """
+    Bulk montage submission. The batch's albums are looked up once each (items
+    sharing an album share the lookup) with a few lookups in flight, and each
+    job is created as soon as its album is known, with the details handed
+    over so it doesn't fetch them again. From there the jobs queue like any
+    other, under the global job and stage limits, and count against the
+    submitting client's job limit.
+    """
+
+    def __init__(
+        self,
+        jobs: JobManager,
+        admission: Optional[AdmissionController] = None,
+        metadata_concurrency: int = 4,
+        max_batches: int = 100
+    ):
+        self.jobs = jobs
+        self.admission = admission
+        self.metadata_concurrency = max(1, metadata_concurrency)
+        self.max_batches = max_batches
+        self.batches: "OrderedDict[str, MontageBatch]" = OrderedDict()
+        self.tasks: Dict[str, asyncio.Task] = {}  # Album lookups still running, per batch
+
+    def submit(
+        self,
+        items: List[MontageBatchItem],
+        priority: JobPriority = JobPriority.LOW,
+        client: Optional[str] = None
+    ) -> str:
+        """Start a batch in the background and return its ID."""
+        batch_id = str(uuid.uuid4())
+        batch = MontageBatch(batch_id, items, priority, client)
+        self.batches[batch_id] = batch
+        while len(self.batches) > self.max_batches:
+            self.batches.popitem(last=False)
+
+        task = self.tasks[batch_id] = asyncio.create_task(self._resolve(batch))
+        task.add_done_callback(lambda done: self._resolved(batch, done))
+        return batch_id
+
+    def _resolved(self, batch: MontageBatch, task: asyncio.Task):
+        self.tasks.pop(batch.batch_id, None)
+        if task.cancelled():
+            logger.warning(f"Batch {batch.batch_id}: album lookups cancelled")
+        elif task.exception() is not None:
+            logger.error(f"Batch {batch.batch_id}: album lookups failed", exc_info=task.exception())
+
+    async def _resolve(self, batch: MontageBatch):
+        semaphore = asyncio.Semaphore(self.metadata_concurrency)
+        lookups: Dict[str, asyncio.Task] = {}
+
+        async def lookup(mbid: str) -> Optional[AlbumDetail]:
+            async with semaphore:
+                return await self.jobs.metadata.get_album_details(mbid)
+
+        async def start(index: int, item: MontageBatchItem):
+            if item.mbid not in lookups:
+                lookups[item.mbid] = asyncio.ensure_future(lookup(item.mbid))
+            try:
+                album = await lookups[item.mbid]
+                if not album:
+                    raise Exception("Failed to fetch album details")
+                batch.job_ids[index] = self.jobs.create_job(
+                    item.mbid,
+                    item.duration,
+                    codec=item.codec,
+                    bitrate=item.bitrate,
+                    priority=batch.priority,
+                    album=album
+                )
+                if self.admission is not None and batch.client is not None:
+                    self.admission.record(batch.client, batch.job_ids[index])
+            except Exception as e:
+                logger.warning(f"Batch {batch.batch_id}: {item.mbid} not started: {e}")
+                batch.errors[index] = str(e)
+
+        try:
+            await asyncio.gather(*(start(index, item) for index, item in enumerate(batch.items)))
+        finally:
+            batch.resolving = False
+        logger.info(
+            f"Batch {batch.batch_id}: started {len(batch.items) - len(batch.errors)} job(s) "
+            f"from {len(lookups)} album lookup(s)"
+        )
+
+    def get_status(self, batch_id: str) -> Optional[BatchStatus]:
+        """Aggregate progress of a batch's jobs."""
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+
+        items = []
+        for index, item in enumerate(batch.items):
+            status = BatchItemStatus(mbid=item.mbid, duration=item.duration, status="resolving")
+            job_id = batch.job_ids[index]
+            if index in batch.errors:
+                status.status = "failed"
+                status.error = batch.errors[index]
+                status.progress = 1.0
+            elif job_id:
+                job = self.jobs.get_job_status(job_id)
+                status.job_id = job_id
+                status.status = job.status if job else "unknown"
+                status.progress = 1.0 if status.status in DONE_STATES else (job.progress if job else 0.0)
+            items.append(status)
+
+        counts = {state: sum(1 for item in items if item.status == state) for state in DONE_STATES}
+        done = sum(counts.values())
+        if batch.resolving:
+            overall = "resolving"
+        elif done < len(items):
+            overall = "processing"
+        else:
+            overall = "completed"
+
+        return BatchStatus(
+            batch_id=batch_id,
+            status=overall,
+            total_jobs=len(items),
+            completed_jobs=counts["completed"],
+            failed_jobs=counts["failed"],
+            cancelled_jobs=counts["cancelled"],
+            progress=sum(item.progress for item in items) / len(items) if items else 1.0,
+            items=items
+        )
+
+
+# Global batch manager instance
+batch_manager = BatchManager(job_manager, admission, metadata_concurrency=settings.BATCH_METADATA_CONCURRENCY)
@@ -0,0 +1,279 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set
+from config.settings import settings
+from services.eventbus import EventBus
+
+logger = logging.getLogger(__name__)
+
+# Topics besides per-job ones ("job:<job_id>")
+LIBRARY_TOPIC = "library"
+PLAYLISTS_TOPIC = "playlists"
+EVENT_TOPICS = (LIBRARY_TOPIC, PLAYLISTS_TOPIC)
+
+
+def job_topic(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+# Messages that describe current state; a newer one replaces an unsent older one
+COALESCED_TYPES = ("progress", "status")
+
+
+class Subscriber:
+    """
+    One connection's outbox. Publishing never waits on the connection: messages
+    go into a bounded queue drained by the subscriber's own task. A state
+    message for the same track as the newest unsent message of its topic is
+    merged into it (latest values win); anything queued in between, such as
+    a track_complete or done event, stops the merge so clients see the
+    topic's messages in order. A subscriber whose queue overflows or whose
+    send stalls is dropped.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict], Awaitable],
+        max_queue: int = 64,
+        send_timeout: float = 10.0,
+        on_close: Optional[Callable[["Subscriber"], None]] = None
+    ):
+        self.send = send
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self.topics: Set[str] = set()
+        self.queue: Deque[dict] = deque()
+        self.coalesced: Dict[Hashable, dict] = {}  # Coalescing key -> unsent message
+        self.newest: Dict[Optional[str], dict] = {}  # Topic -> its most recently queued unsent message
+        self.closed = False
+        self.dropped = 0  # Messages merged away
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._pump())
+
+    @staticmethod
+    def _coalesce_key(message: dict) -> Optional[Hashable]:
+        if message.get("type") not in COALESCED_TYPES:
+            return None
+        data = message.get("data") or {}
+        return (message.get("topic"), message["type"], data.get("current_track"))
+
+    def offer(self, message: dict):
+        """Queue a message without waiting. Drops the subscriber if it has fallen too far behind."""
+        if self.closed:
+            return
+
+        key = self._coalesce_key(message)
+        topic = message.get("topic")
+        pending = self.coalesced.get(key) if key is not None else None
+        if pending is not None and self.newest.get(topic) is pending:
+            # Still unsent and nothing queued after it: fold the newer state in
+            pending["data"].update(message.get("data") or {})
+            self.dropped += 1
+            return
+
+        if len(self.queue) >= self.max_queue:
+            logger.warning("Dropping subscriber: outbox full")
+            self.close()
+            return
+
+        if key is not None:
+            message = {**message, "data": dict(message.get("data") or {})}
+            self.coalesced[key] = message
+        self.newest[topic] = message
+        self.queue.append(message)
+        self._ready.set()
+
+    async def _pump(self):
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+
+                message = self.queue.popleft()
+                key = self._coalesce_key(message)
+                if key is not None and self.coalesced.get(key) is message:
+                    del self.coalesced[key]
+                if self.newest.get(message.get("topic")) is message:
+                    del self.newest[message.get("topic")]
+
+                await asyncio.wait_for(self.send(message), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping subscriber: send stalled for {self.send_timeout}s")
+            self.close()
+        except Exception as e:
+            logger.info(f"Dropping subscriber after send error: {e}")
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.coalesced.clear()
+        self.newest.clear()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        if self.on_close:
+            self.on_close(self)
+
+
+class BroadcastHub:
+    """
+    Fans messages out to subscribers by topic. A subscriber is one connection
+    and may be attached to any number of topics.
+
+    With an event bus (several processes serving the app), published
+    messages also go to the other processes' subscribers, and subscriber
+    counts are totals over all live processes.
+    """
+
+    def __init__(self, max_queue: int = 64, send_timeout: float = 10.0):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.topics: Dict[str, Set[Subscriber]] = {}
+        self.empty_listeners: List[Callable[[str], None]] = []
+        self.bus: Optional[EventBus] = None
+        self.liveness_seconds = 60.0  # Processes silent for longer don't count
+        self._relay_task: Optional[asyncio.Task] = None
+
+    def use_bus(self, bus: EventBus, poll_seconds: float = 0.5, liveness_seconds: float = 60.0):
+        """Share messages and subscriber counts with other processes. Needs a running event loop."""
+        self.bus = bus
+        self.liveness_seconds = liveness_seconds
+        bus.heartbeat()
+        self._relay_task = asyncio.create_task(self._relay(poll_seconds))
+
+    async def close_bus(self):
+        if self._relay_task is not None:
+            self._relay_task.cancel()
+            await asyncio.gather(self._relay_task, return_exceptions=True)
+            self._relay_task = None
+        if self.bus is not None:
+            self.bus.close()
+            self.bus = None
+
+    async def _relay(self, poll_seconds: float, batch_size: int = 500):
+        """Deliver other processes' messages to this process's subscribers."""
+        cursor = self.bus.latest()
+        while True:
+            messages = []
+            try:
+                self.bus.heartbeat()
+                messages = self.bus.read(cursor, batch_size)
+                for bus_message in messages:
+                    cursor = bus_message.seq
+                    self._deliver(bus_message.topic, bus_message.message)
+            except Exception as e:
+                logger.error(f"Error relaying bus messages: {e}")
+            if len(messages) < batch_size:
+                await asyncio.sleep(poll_seconds)
+
+    def _count_changed(self, topic: str):
+        if self.bus is not None:
+            try:
+                self.bus.set_subscribers(topic, len(self.topics.get(topic, ())))
+            except Exception as e:
+                logger.error(f"Error sharing subscriber count for {topic}: {e}")
+
+    def on_topic_empty(self, listener: Callable[[str], None]):
+        """Call listener(topic) whenever a topic loses its last subscriber."""
+        self.empty_listeners.append(listener)
+
+    def connect(
+        self,
+        send: Callable[[dict], Awaitable],
+        on_close: Optional[Callable[[Subscriber], None]] = None
+    ) -> Subscriber:
+        """
+        Create a subscriber that is not attached to any topic yet.
+
+        Args:
+            send: Coroutine function delivering one message, e.g. websocket.send_json
+            on_close: Called once when the subscriber closes, including when
+                it is dropped for being too slow
+        """
+        def closed(subscriber: Subscriber):
+            for topic in list(subscriber.topics):
+                self.detach(topic, subscriber)
+            if on_close:
+                on_close(subscriber)
+
+        return Subscriber(send, self.max_queue, self.send_timeout, on_close=closed)
+
+    def subscribe(
+        self,
+        topic: str,
+        send: Callable[[dict], Awaitable],
+        on_close: Optional[Callable[[Subscriber], None]] = None
+    ) -> Subscriber:
+        """Create a subscriber attached to a single topic."""
+        subscriber = self.connect(send, on_close=on_close)
+        self.attach(topic, subscriber)
+        return subscriber
+
+    def attach(self, topic: str, subscriber: Subscriber):
+        self.topics.setdefault(topic, set()).add(subscriber)
+        subscriber.topics.add(topic)
+        self._count_changed(topic)
+
+    def detach(self, topic: str, subscriber: Subscriber):
+        subscriber.topics.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if subscribers:
+            self._count_changed(topic)
+            return
+        del self.topics[topic]
+        self._count_changed(topic)
+        for listener in self.empty_listeners:
+            listener(topic)
+
+    def disconnect(self, subscriber: Subscriber):
+        """Detach a subscriber from every topic and stop its sender."""
+        subscriber.on_close = None
+        for topic in list(subscriber.topics):
+            self.detach(topic, subscriber)
+        subscriber.close()
+
+    def publish(self, topic: str, message: dict, share: bool = True):
+        """
+        Tag a message with its topic and hand it to every subscriber; never
+        blocks. share=False keeps it to this process's subscribers.
+        """
+        self._deliver(topic, message)
+        if share and self.bus is not None:
+            try:
+                self.bus.publish(topic, message)
+            except Exception as e:
+                logger.error(f"Error sharing message on {topic}: {e}")
+
+    def _deliver(self, topic: str, message: dict):
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            return
+        message = {"topic": topic, **message}
+        for subscriber in list(subscribers):
+            subscriber.offer(message)
+
+    def subscriber_count(self, topic: str) -> int:
+        if self.bus is not None:
+            return self.bus.subscriber_total(topic, self.liveness_seconds)
+        return len(self.topics.get(topic, ()))
+
+    def drop_topic(self, topic: str):
+        """Detach every subscriber from a topic, leaving their connections open."""
+        for subscriber in list(self.topics.pop(topic, ())):
+            subscriber.topics.discard(topic)
+        self._count_changed(topic)
+
+
+# Global hub shared by jobs, library and playlist events
+hub = BroadcastHub(settings.WS_QUEUE_SIZE, settings.WS_SEND_TIMEOUT_SECONDS)
@@ -0,0 +1,315 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config.settings import settings
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Imported once by the forkserver so recycled children start with them loaded;
+# the services import these lazily, so they're listed explicitly
+PRELOAD_MODULES = [
+    "librosa.core.audio",
+    "librosa.feature.spectral",
+    "pydub",
+    "services.analyzer",
+    "services.processor",
+]
+
+
+class ComputeMemoryExceeded(Exception):
+    """A task's worker process grew past the per-task RSS ceiling and was killed."""
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process, or None where /proc isn't available."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _child_pids(pid: int) -> List[int]:
+    """Direct children of a process, from /proc."""
+    children = []
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+        for tid in tasks:
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+        return children
+    except FileNotFoundError:
+        if not os.path.isdir(f"/proc/{pid}"):
+            return []
+    except (OSError, ValueError):
+        return []
+
+    # Kernel without /proc/<pid>/task/<tid>/children: match parent PIDs instead
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after its ")"
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            pass
+    return children
+
+
+def _descendant_pids(pid: int) -> List[int]:
+    """Children of a process, their children and so on."""
+    found = []
+    pending = [pid]
+    while pending:
+        children = _child_pids(pending.pop())
+        found.extend(children)
+        pending.extend(children)
+    return found
+
+
+def _tree_rss_bytes(pid: int) -> Optional[int]:
+    """
+    Resident set size of a process plus every process it started (the ffmpeg
+    decoders pydub and librosa run), or None where /proc isn't available.
+    """
+    rss = _rss_bytes(pid)
+    if rss is None:
+        return None
+    return rss + sum(_rss_bytes(child) or 0 for child in _descendant_pids(pid))
+
+
+def _worker_main(conn):
+    """Child process loop: run (function, args) tasks until told to stop."""
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        func, args = task
+        try:
+            result = (True, func(*args))
+        except Exception as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # Results or exceptions that don't pickle
+            conn.send((False, RuntimeError(f"{func.__qualname__} returned an unpicklable result: {e}")))
+
+
+class _Worker:
+    """One child process and the parent's end of its pipe."""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.busy = False
+        self.cancelled = False
+        self.peak_rss = 0
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def rss_bytes(self) -> Optional[int]:
+        """RSS of the worker together with its subprocesses."""
+        rss = _tree_rss_bytes(self.pid)
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def stop(self):
+        """Ask the child to exit after its current task, killing it if it doesn't."""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        self.kill()
+        self.conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            # Its subprocesses too, before they're reparented out of reach
+            for pid in _descendant_pids(self.pid):
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            self.process.kill()
+        self.process.join()
+
+
+class ComputePool:
+    """
+    Runs decode-heavy audio steps (librosa loads, pydub/ffmpeg clip
+    extraction) in child processes, so memory they leak or fragment goes
+    away with the child instead of accumulating in the server. A child is
+    replaced after max_tasks_per_child tasks, and one whose RSS (counting
+    the subprocesses it started, such as ffmpeg) passes max_task_rss_mb
+    while running a task is killed along with them; that task raises
+    ComputeMemoryExceeded and only its track fails. With no workers the
+    steps run in threads as before.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_tasks_per_child: int = 25,
+        max_task_rss_mb: int = 0,
+        poll_seconds: float = 0.1
+    ):
+        self.size = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_task_rss = max_task_rss_mb * MB
+        self.poll_seconds = poll_seconds
+        self.workers: List[_Worker] = []
+        self.recycled: Dict[str, int] = {"max_tasks": 0, "memory": 0, "cancelled": 0, "crashed": 0}
+        self._idle: Optional[asyncio.Queue] = None
+        self._context = None
+
+        metrics.compute_worker_rss_bytes.collect = lambda: {
+            (str(worker.pid),): rss for worker in self.workers
+            if (rss := worker.rss_bytes()) is not None
+        }
+        metrics.compute_workers_busy.collect = lambda: sum(worker.busy for worker in self.workers)
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run a module-level (picklable) function with picklable arguments.
+
+        Raises:
+            ComputeMemoryExceeded: If the task's worker passed the RSS ceiling
+        """
+        if not self.enabled:
+            return await asyncio.to_thread(func, *args)
+
+        worker = await self._acquire()
+        try:
+            return await asyncio.to_thread(self._call, worker, func, args)
+        except asyncio.CancelledError:
+            # The thread waiting on the child finishes once the child is gone
+            worker.cancelled = True
+            worker.kill()
+            raise
+        finally:
+            self._release(worker)
+
+    def _call(self, worker: _Worker, func: Callable, args: Tuple) -> Any:
+        worker.conn.send((func, args))
+        while not worker.conn.poll(self.poll_seconds):
+            rss = worker.rss_bytes()
+            if self.max_task_rss and rss is not None and rss > self.max_task_rss:
+                worker.kill()
+                raise ComputeMemoryExceeded(
+                    f"{func.__qualname__} used {rss / MB:.0f} MB, over the "
+                    f"{self.max_task_rss / MB:.0f} MB per-task limit"
+                )
+            if not worker.process.is_alive():
+                break
+        try:
+            ok, value = worker.conn.recv()
+        except (EOFError, OSError):
+            raise RuntimeError(f"Compute worker {worker.pid} exited while running {func.__qualname__}")
+        if not ok:
+            raise value
+        return value
+
+    async def _acquire(self) -> _Worker:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._spawn()
+        worker = await self._idle.get()
+        worker.busy = True
+        return worker
+
+    def _release(self, worker: _Worker):
+        worker.busy = False
+        worker.tasks += 1
+
+        # Exceptions raised by the task itself leave the child usable
+        if worker.cancelled:
+            reason = "cancelled"
+        elif not worker.process.is_alive():
+            reason = "memory" if worker.peak_rss > self.max_task_rss > 0 else "crashed"
+        elif self.max_tasks_per_child and worker.tasks >= self.max_tasks_per_child:
+            reason = "max_tasks"
+        else:
+            self._idle.put_nowait(worker)
+            return
+
+        self._retire(worker, reason)
+        self._spawn()
+
+    def _retire(self, worker: _Worker, reason: str):
+        self.workers.remove(worker)
+        self.recycled[reason] += 1
+        metrics.compute_recycles_total.inc(reason=reason)
+        logger.info(
+            f"Recycling compute worker {worker.pid} ({reason}) after {worker.tasks} task(s), "
+            f"peak RSS {worker.peak_rss / MB:.0f} MB"
+        )
+        if worker.process.is_alive():
+            asyncio.get_running_loop().run_in_executor(None, worker.stop)
+        else:
+            worker.kill()
+
+    def _spawn(self):
+        if self._context is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                self._context = multiprocessing.get_context("forkserver")
+                self._context.set_forkserver_preload(PRELOAD_MODULES)
+            else:
+                self._context = multiprocessing.get_context("spawn")
+        worker = _Worker(self._context)
+        self.workers.append(worker)
+        self._idle.put_nowait(worker)
+
+    def stats(self) -> dict:
+        """Per-worker memory and task counts, plus how many workers were recycled and why."""
+        return {
+            "workers": [
+                {
+                    "pid": worker.pid,
+                    "busy": worker.busy,
+                    "tasks": worker.tasks,
+                    "rss_mb": round((worker.rss_bytes() or 0) / MB, 1),
+                    "peak_rss_mb": round(worker.peak_rss / MB, 1),
+                }
+                for worker in self.workers
+            ],
+            "recycled": dict(self.recycled),
+        }
+
+    def shutdown(self):
+        """Stop all workers; the next task starts a fresh set."""
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+        self._idle = None
+
+
+# Global instance
+compute_pool = ComputePool(
+    settings.COMPUTE_WORKERS,
+    settings.COMPUTE_MAX_TASKS_PER_CHILD,
+    settings.COMPUTE_MAX_TASK_RSS_MB
+)
@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional
+
+# Stage counters are sent as [queued, active, done]
+STAGE_FIELDS = ("queued", "active", "done")
+
+
+def _track_entry(track_status: dict) -> list:
+    entry = [track_status["track_number"], track_status["status"]]
+    if track_status.get("error"):
+        entry.append(track_status["error"])
+    return entry
+
+
+def _stage_entry(stage: dict) -> List[int]:
+    return [stage.get(field, 0) for field in STAGE_FIELDS]
+
+
+class DeltaEncoder:
+    """
+    Per-connection encoder for the multiplexed WebSocket. The first message
+    for a job is a compact snapshot; later progress messages only carry what
+    changed since the last one this connection was sent. Events (track
+    completions, errors, done) and non-job topics pass through unchanged.
+
+    Delta keys: "tr" = [track_number, status, error?], "st" = {stage:
+    [queued, active, done]} for changed stages; other keys are JobStatus
+    fields that changed.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, dict] = {}  # Topic -> last state sent
+
+    def forget(self, topic: str):
+        self.jobs.pop(topic, None)
+
+    def encode(self, message: dict) -> Optional[dict]:
+        """Compact form of a hub message, or None if it carries nothing new."""
+        topic = message.get("topic") or ""
+        if not topic.startswith("job:"):
+            return message
+
+        kind = message.get("type")
+        data = message.get("data") or {}
+        if kind == "status":
+            return {"topic": topic, "type": "snapshot", "data": self._snapshot(topic, data)}
+        if kind == "progress":
+            delta = self._delta(topic, data)
+            return {"topic": topic, "type": "delta", "data": delta} if delta else None
+        return message
+
+    def _snapshot(self, topic: str, status: dict) -> dict:
+        tracks = status.get("track_statuses") or []
+        stages = {name: _stage_entry(stage) for name, stage in (status.get("stages") or {}).items()}
+        snapshot = {
+            key: value
+            for key, value in status.items()
+            if key not in ("track_statuses", "stages") and value not in (None, [], {})
+        }
+        snapshot["tracks"] = [_track_entry(track) + [track["track_title"]] for track in tracks]
+        if stages:
+            snapshot["st"] = stages
+
+        self.jobs[topic] = {
+            "fields": {key: value for key, value in status.items() if key not in ("track_statuses", "stages")},
+            "tracks": {track["track_number"]: _track_entry(track) for track in tracks},
+            "stages": stages,
+            "album": False,
+        }
+        return snapshot
+
+    def _delta(self, topic: str, data: dict) -> dict:
+        state = self.jobs.setdefault(topic, {"fields": {}, "tracks": {}, "stages": {}, "album": False})
+        delta = {}
+
+        for key, value in data.items():
+            if key == "track_status":
+                entry = _track_entry(value)
+                if state["tracks"].get(entry[0]) != entry:
+                    state["tracks"][entry[0]] = entry
+                    delta["tr"] = entry
+            elif key == "stages":
+                changed = {}
+                for name, stage in value.items():
+                    entry = _stage_entry(stage)
+                    if state["stages"].get(name) != entry:
+                        state["stages"][name] = entry
+                        changed[name] = entry
+                if changed:
+                    delta["st"] = changed
+            elif key == "album":
+                # Large and fixed for the job's lifetime; send it once
+                if not state["album"]:
+                    state["album"] = True
+                    delta["album"] = value
+            elif state["fields"].get(key) != value:
+                state["fields"][key] = value
+                delta[key] = value
+
+        return delta
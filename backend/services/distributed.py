@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set, TYPE_CHECKING
+from config.settings import settings
+from services.jobqueue import JobQueue, QueuedJob
+from services.workspace import sweep_workspaces
+
+if TYPE_CHECKING:
+    from services.jobs import JobManager
+
+logger = logging.getLogger(__name__)
+
+
+class QueueWorker:
+    """
+    Worker side of distributed mode. Claims jobs from the queue while the
+    local scheduler has room, runs them through the JobManager as if they
+    had been created here, and reports their messages back through the
+    queue. Claims are kept alive by heartbeats on every poll.
+    """
+
+    def __init__(self, jobs: "JobManager", queue: JobQueue, worker_id: str, poll_seconds: float = 0.5):
+        self.jobs = jobs
+        self.queue = queue
+        self.worker_id = worker_id
+        self.poll_seconds = poll_seconds
+        self.claimed: Dict[str, asyncio.Task] = {}  # Job ID -> task running it
+        self.cancelling: Set[str] = set()
+        self.stopping = False
+
+    async def run(self):
+        """Process jobs until cancelled, then hand unfinished ones back to the queue."""
+        # Workspaces of jobs no worker holds any more (this one crashed, say)
+        sweep_workspaces(settings.WORKSPACE_DIR, keep=self.queue.claimed_jobs())
+        self.jobs.report_to = self.queue
+        logger.info(f"Worker {self.worker_id} polling for jobs")
+
+        try:
+            while True:
+                try:
+                    self._poll()
+                except Exception as e:
+                    logger.error(f"Worker {self.worker_id} poll failed: {e}")
+                await asyncio.sleep(self.poll_seconds)
+        finally:
+            await self._stop()
+
+    def _poll(self):
+        running = list(self.claimed)
+        self.queue.heartbeat(self.worker_id, running)
+
+        for job_id in self.queue.cancel_requested(running):
+            if job_id not in self.cancelling:
+                self.cancelling.add(job_id)
+                asyncio.create_task(self.jobs.cancel_job(job_id))
+
+        free = self.jobs.scheduler.max_jobs - len(self.claimed)
+        for queued in self.queue.claim(self.worker_id, free):
+            self._start(queued)
+
+    def _start(self, queued: QueuedJob):
+        logger.info(f"Worker {self.worker_id} claimed job {queued.job_id}")
+        task = self.jobs.start_claimed(queued)
+        self.claimed[queued.job_id] = task
+        task.add_done_callback(lambda _: self._finished(queued.job_id))
+
+    def _finished(self, job_id: str):
+        self.claimed.pop(job_id, None)
+        self.cancelling.discard(job_id)
+        if not self.stopping:
+            self.queue.complete(job_id)
+
+    async def _stop(self):
+        self.stopping = True
+        # Interrupted jobs go back to the queue for another worker instead of
+        # reporting themselves cancelled
+        self.jobs.report_to = None
+        released = self.queue.release(self.worker_id)
+        tasks = list(self.claimed.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"Worker {self.worker_id} stopped; {released} job(s) returned to the queue")
+
+
+class QueueRelay:
+    """
+    API side of distributed mode. Reads the messages workers publish to the
+    queue and hands each to the JobManager, which updates its job records
+    and forwards them to this process's WebSocket subscribers.
+    """
+
+    def __init__(self, jobs: "JobManager", queue: JobQueue, poll_seconds: float = 0.5, batch_size: int = 500):
+        self.jobs = jobs
+        self.queue = queue
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.cursor = 0  # Last relayed event; 0 replays everything retained
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            events = []
+            try:
+                events = self.queue.events(self.cursor, self.batch_size)
+                for event in events:
+                    self.cursor = event.seq
+                    self.jobs.relay_event(event)
+            except Exception as e:
+                logger.error(f"Error relaying worker events: {e}")
+            if len(events) < self.batch_size:
+                await asyncio.sleep(self.poll_seconds)
@@ -1,6 +1,7 @@
-import yt_dlp
 import os
+import asyncio
 import logging
+import threading
 from typing import Optional
 
 logger = logging.getLogger(__name__)
@@ -11,7 +12,13 @@ class DownloaderService:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
 
-    async def download_track(self, artist: str, track_name: str, output_filename: str) -> str:
+    async def download_track(
+        self,
+        artist: str,
+        track_name: str,
+        output_filename: str,
+        output_dir: Optional[str] = None
+    ) -> str:
         """
         Download a track from YouTube.
 
@@ -19,6 +26,7 @@ class DownloaderService:
             artist: Artist name
             track_name: Track name
             output_filename: Output filename (without extension)
+            output_dir: Directory to download into instead of the service's own
 
         Returns:
             Path to downloaded file
@@ -26,8 +34,11 @@ class DownloaderService:
         Raises:
             Exception: If download fails
         """
+        # yt-dlp takes a noticeable part of a second to import; only workers pay for it
+        import yt_dlp
+
         search_query = f"{artist} {track_name} audio"
-        output_path = os.path.join(self.output_dir, output_filename)
+        output_path = os.path.join(output_dir or self.output_dir, output_filename)
 
         ydl_opts = {
             'format': 'bestaudio/best',
@@ -59,25 +70,47 @@ class DownloaderService:
             },
         }
 
-        try:
+        # yt-dlp calls these hooks between chunks; raising from one aborts
+        # the download if the awaiting task was cancelled meanwhile
+        cancelled = threading.Event()
+
+        def check_cancelled(_):
+            if cancelled.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Download cancelled")
+
+        ydl_opts['progress_hooks'] = [check_cancelled]
+        ydl_opts['postprocessor_hooks'] = [check_cancelled]
+
+        def download():
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(f"ytsearch1:{search_query}", download=True)
-
-                if info and 'entries' in info and len(info['entries']) > 0:
-                    final_path = f"{output_path}.mp3"
-
-                    if os.path.exists(final_path):
-                        logger.info(f"Downloaded: {search_query} -> {final_path}")
-                        return final_path
-                    else:
-                        error_msg = f"File not found after download: {final_path}"
-                        logger.error(error_msg)
-                        raise Exception(error_msg)
+                return ydl.extract_info(f"ytsearch1:{search_query}", download=True)
+
+        try:
+            # Run blocking download in thread pool to avoid blocking event loop
+            try:
+                info = await asyncio.to_thread(download)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+            if info and 'entries' in info and len(info['entries']) > 0:
+                final_path = f"{output_path}.mp3"
+
+                if os.path.exists(final_path):
+                    logger.info(f"Downloaded: {search_query} -> {final_path}")
+                    return final_path
                 else:
-                    error_msg = f"No results found for: {search_query}"
+                    error_msg = f"File not found after download: {final_path}"
                     logger.error(error_msg)
                     raise Exception(error_msg)
+            else:
+                error_msg = f"No results found for: {search_query}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
 
+        except asyncio.CancelledError:
+            logger.info(f"Cancelled download: {search_query}")
+            raise
         except Exception as e:
             logger.error(f"Error downloading {search_query}: {str(e)}", exc_info=True)
             raise
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+from typing import Callable, Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+def process_id() -> str:
+    """Identity of this process among others sharing state: host:pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class BusMessage:
+    __slots__ = ("seq", "topic", "message")
+
+    def __init__(self, seq: int, topic: str, message: dict):
+        self.seq = seq
+        self.topic = topic
+        self.message = message
+
+
+class EventBus:
+    """
+    Carries hub messages between processes serving the same app (e.g.
+    uvicorn --workers N), and shares what every process needs to know about
+    the others: which are alive and how many subscribers each has per topic.
+    Backends are registered in BUS_BACKENDS by URL scheme.
+    """
+
+    def __init__(self, origin: str):
+        self.origin = origin  # This process; its own messages are not read back
+
+    def publish(self, topic: str, message: dict):
+        raise NotImplementedError
+
+    def read(self, after: int, limit: int = 500) -> List[BusMessage]:
+        """Other processes' messages after sequence number `after`, oldest first."""
+        raise NotImplementedError
+
+    def latest(self) -> int:
+        """Sequence number to start reading from to get only new messages."""
+        raise NotImplementedError
+
+    def heartbeat(self):
+        """Mark this process alive."""
+        raise NotImplementedError
+
+    def live_processes(self, within_seconds: float) -> Set[str]:
+        """Processes that sent a heartbeat within the window."""
+        raise NotImplementedError
+
+    def set_subscribers(self, topic: str, count: int):
+        """Record this process's subscriber count for a topic."""
+        raise NotImplementedError
+
+    def subscriber_total(self, topic: str, within_seconds: float) -> int:
+        """Subscribers of a topic across live processes."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+BUS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_created ON messages (created_at);
+CREATE TABLE IF NOT EXISTS processes (
+    origin TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subscribers (
+    origin TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (origin, topic)
+);
+"""
+
+
+class SqliteEventBus(EventBus):
+    """
+    Reference bus in one SQLite file: a local pub/sub stand-in for processes
+    on the same machine. Readers poll the message table; messages older than
+    the retention are pruned on heartbeats.
+    """
+
+    def __init__(self, path: str, origin: str, retention_seconds: float = 600.0):
+        super().__init__(origin)
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self._pruned_at = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(BUS_SCHEMA)
+        # Counts left by an earlier process with the same ID
+        self.db.execute("DELETE FROM subscribers WHERE origin = ?", (origin,))
+
+    def publish(self, topic: str, message: dict):
+        self.db.execute(
+            "INSERT INTO messages (origin, topic, message, created_at) VALUES (?, ?, ?, ?)",
+            (self.origin, topic, json.dumps(message, default=str), time.time())
+        )
+
+    def read(self, after: int, limit: int = 500) -> List[BusMessage]:
+        rows = self.db.execute(
+            "SELECT seq, topic, message FROM messages WHERE seq > ? AND origin != ? ORDER BY seq LIMIT ?",
+            (after, self.origin, limit)
+        ).fetchall()
+        return [BusMessage(row["seq"], row["topic"], json.loads(row["message"])) for row in rows]
+
+    def latest(self) -> int:
+        return self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM messages").fetchone()[0]
+
+    def heartbeat(self):
+        now = time.time()
+        self.db.execute("INSERT OR REPLACE INTO processes VALUES (?, ?)", (self.origin, now))
+        if now - self._pruned_at > 60:
+            self._pruned_at = now
+            self.db.execute("DELETE FROM messages WHERE created_at < ?", (now - self.retention_seconds,))
+
+    def live_processes(self, within_seconds: float) -> Set[str]:
+        rows = self.db.execute("SELECT origin FROM processes WHERE seen_at >= ?", (time.time() - within_seconds,))
+        return {row["origin"] for row in rows}
+
+    def set_subscribers(self, topic: str, count: int):
+        if count:
+            self.db.execute("INSERT OR REPLACE INTO subscribers VALUES (?, ?, ?)", (self.origin, topic, count))
+        else:
+            self.db.execute("DELETE FROM subscribers WHERE origin = ? AND topic = ?", (self.origin, topic))
+
+    def subscriber_total(self, topic: str, within_seconds: float) -> int:
+        row = self.db.execute(
+            "SELECT COALESCE(SUM(s.count), 0) FROM subscribers s JOIN processes p ON p.origin = s.origin "
+            "WHERE s.topic = ? AND p.seen_at >= ?",
+            (topic, time.time() - within_seconds)
+        ).fetchone()
+        return row[0]
+
+    def close(self):
+        if self.db is not None:
+            self.db.execute("DELETE FROM subscribers WHERE origin = ?", (self.origin,))
+            self.db.close()
+            self.db = None
+
+
+# URL scheme -> factory taking the rest of the URL and this process's ID
+BUS_BACKENDS: Dict[str, Callable[[str, str], EventBus]] = {
+    "sqlite": lambda location, origin: SqliteEventBus(os.path.expanduser(location), origin),
+}
+
+
+def open_bus(url: str, origin: str) -> EventBus:
+    """Open an event bus from a URL such as "sqlite://~/.junt/events.db"."""
+    scheme, separator, location = url.partition("://")
+    if not separator or scheme not in BUS_BACKENDS:
+        raise ValueError(f"Unsupported event bus URL {url!r}; known schemes: {', '.join(BUS_BACKENDS)}")
+    return BUS_BACKENDS[scheme](location, origin)
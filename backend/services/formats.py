@@ -0,0 +1,76 @@
+import os
+from typing import Dict, Optional
+from api.schemas import AudioCodec
+
+
+# Output encodings for clips and montages.
+# "format" is the ffmpeg muxer, "codec" the ffmpeg encoder (None = muxer default).
+OUTPUT_FORMATS: Dict[AudioCodec, dict] = {
+    AudioCodec.MP3: {
+        "format": "mp3",
+        "codec": None,
+        "extension": "mp3",
+        "media_type": "audio/mpeg",
+        "clip_bitrate": "192k",
+        "montage_bitrate": "320k",
+    },
+    AudioCodec.AAC: {
+        "format": "ipod",
+        "codec": "aac",
+        "extension": "m4a",
+        "media_type": "audio/mp4",
+        "clip_bitrate": "160k",
+        "montage_bitrate": "256k",
+    },
+    AudioCodec.OPUS: {
+        "format": "opus",
+        "codec": "libopus",
+        "extension": "opus",
+        "media_type": "audio/ogg",
+        "clip_bitrate": "96k",
+        "montage_bitrate": "160k",
+    },
+}
+
+MEDIA_TYPES = {spec["extension"]: spec["media_type"] for spec in OUTPUT_FORMATS.values()}
+
+
+def get_output_format(codec: AudioCodec) -> dict:
+    """Get the encoding spec for a codec."""
+    return OUTPUT_FORMATS[AudioCodec(codec)]
+
+
+def resolve_bitrate(codec: AudioCodec, bitrate: Optional[str], kind: str = "clip") -> str:
+    """
+    Pick the bitrate for a clip or montage.
+
+    Args:
+        codec: Output codec
+        bitrate: Requested bitrate (e.g. "128k"), or None for the codec default
+        kind: "clip" or "montage"
+    """
+    return bitrate or get_output_format(codec)[f"{kind}_bitrate"]
+
+
+def export_kwargs(codec: AudioCodec, bitrate: str) -> dict:
+    """Keyword arguments for pydub's AudioSegment.export."""
+    spec = get_output_format(codec)
+    kwargs = {"format": spec["format"], "bitrate": bitrate}
+    if spec["codec"]:
+        kwargs["codec"] = spec["codec"]
+    return kwargs
+
+
+def codec_for_path(file_path: str) -> Optional[AudioCodec]:
+    """Get the codec of an output file from its extension."""
+    extension = os.path.splitext(file_path)[1].lstrip(".").lower()
+    for codec, spec in OUTPUT_FORMATS.items():
+        if spec["extension"] == extension:
+            return codec
+    return None
+
+
+def media_type_for_path(file_path: str) -> str:
+    """Get the HTTP media type for an audio file from its extension."""
+    extension = os.path.splitext(file_path)[1].lstrip(".").lower()
+    return MEDIA_TYPES.get(extension, "application/octet-stream")
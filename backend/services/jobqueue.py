@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from typing import Callable, Dict, List, Optional
+from api.schemas import AlbumDetail, JobPriority
+from services.scheduler import PRIORITY_RANK
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedJob:
+    """A montage job as handed from the API to a worker."""
+
+    def __init__(
+        self,
+        job_id: str,
+        mbid: str,
+        duration: str,
+        codec: str,
+        bitrate: str,
+        priority: JobPriority = JobPriority.NORMAL,
+        profile: bool = False,
+        album: Optional[AlbumDetail] = None
+    ):
+        self.job_id = job_id
+        self.mbid = mbid
+        self.duration = duration
+        self.codec = codec
+        self.bitrate = bitrate
+        self.priority = JobPriority(priority)
+        self.profile = profile
+        self.album = album  # Details the API already looked up, if any
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "mbid": self.mbid,
+            "duration": self.duration,
+            "codec": self.codec,
+            "bitrate": self.bitrate,
+            "priority": self.priority.value,
+            "profile": self.profile,
+            "album": self.album.dict() if self.album else None,
+        })
+
+    @classmethod
+    def from_json(cls, job_id: str, payload: str) -> "QueuedJob":
+        data = json.loads(payload)
+        album = data.pop("album")
+        return cls(job_id, album=AlbumDetail(**album) if album else None, **data)
+
+
+class QueueEvent:
+    """One message a worker published about a job, in publication order."""
+
+    __slots__ = ("seq", "job_id", "type", "data")
+
+    def __init__(self, seq: int, job_id: str, message_type: str, data: dict):
+        self.seq = seq
+        self.job_id = job_id
+        self.type = message_type
+        self.data = data
+
+
+class JobQueue:
+    """
+    Hands montage jobs from API processes to worker processes and carries the
+    workers' progress messages back. Workers claim jobs and keep their claim
+    alive with heartbeats; a job whose worker stops heartbeating goes back to
+    the queue. Backends are registered in QUEUE_BACKENDS by URL scheme.
+    """
+
+    def put(self, job: QueuedJob):
+        """Add a job for the next free worker."""
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[QueuedJob]:
+        """Take up to `limit` jobs, highest priority then oldest first."""
+        raise NotImplementedError
+
+    def heartbeat(self, worker_id: str, job_ids: List[str]):
+        """Extend the worker's claim on jobs it is still running."""
+        raise NotImplementedError
+
+    def complete(self, job_id: str):
+        """Remove a job the worker has finished with, however it ended."""
+        raise NotImplementedError
+
+    def release(self, worker_id: str) -> int:
+        """Put a stopping worker's claimed jobs back in the queue."""
+        raise NotImplementedError
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Returns:
+            "removed" if the job was still waiting and has been dropped,
+            "requested" if a worker has it and has been asked to stop,
+            None if the queue doesn't have it
+        """
+        raise NotImplementedError
+
+    def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        """Which of these claimed jobs have been asked to stop."""
+        raise NotImplementedError
+
+    def depth(self) -> int:
+        """Jobs waiting for a worker."""
+        raise NotImplementedError
+
+    def claimed_jobs(self) -> List[str]:
+        """IDs of jobs any worker currently holds."""
+        raise NotImplementedError
+
+    def publish(self, job_id: str, message_type: str, data: dict):
+        """Record a progress message for API processes to relay."""
+        raise NotImplementedError
+
+    def events(self, after: int, limit: int = 500) -> List[QueueEvent]:
+        """Messages published after sequence number `after`, oldest first."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    job_id TEXT PRIMARY KEY,
+    rank INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    worker_id TEXT,
+    heartbeat_at REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS queue_state ON queue (state, rank, created_at);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_created ON events (created_at);
+"""
+
+
+class SqliteJobQueue(JobQueue):
+    """
+    Reference queue backend in one SQLite file, for an API and workers on
+    the same machine (or a shared filesystem with working locks). Every
+    operation is a short transaction, so calls run inline.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 60.0, event_retention_seconds: float = 3600.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.event_retention_seconds = event_retention_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(QUEUE_SCHEMA)
+
+    def put(self, job: QueuedJob):
+        self.db.execute(
+            "INSERT OR REPLACE INTO queue (job_id, rank, payload, state, created_at) VALUES (?, ?, ?, 'pending', ?)",
+            (job.job_id, PRIORITY_RANK[job.priority], job.to_json(), time.time())
+        )
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[QueuedJob]:
+        if limit <= 0:
+            return []
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so two workers can't pick the same rows
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.db.execute(
+                "SELECT job_id, payload FROM queue "
+                "WHERE (state = 'pending' OR (state = 'claimed' AND heartbeat_at < ?)) AND cancel_requested = 0 "
+                "ORDER BY rank, created_at LIMIT ?",
+                (now - self.lease_seconds, limit)
+            ).fetchall()
+            self.db.executemany(
+                "UPDATE queue SET state = 'claimed', worker_id = ?, heartbeat_at = ? WHERE job_id = ?",
+                [(worker_id, now, row["job_id"]) for row in rows]
+            )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return [QueuedJob.from_json(row["job_id"], row["payload"]) for row in rows]
+
+    def heartbeat(self, worker_id: str, job_ids: List[str]):
+        self.db.executemany(
+            "UPDATE queue SET heartbeat_at = ? WHERE job_id = ? AND worker_id = ?",
+            [(time.time(), job_id, worker_id) for job_id in job_ids]
+        )
+
+    def complete(self, job_id: str):
+        self.db.execute("DELETE FROM queue WHERE job_id = ?", (job_id,))
+        # Nobody needs messages about jobs that finished long ago
+        self.db.execute("DELETE FROM events WHERE created_at < ?", (time.time() - self.event_retention_seconds,))
+
+    def release(self, worker_id: str) -> int:
+        cursor = self.db.execute(
+            "UPDATE queue SET state = 'pending', worker_id = NULL, heartbeat_at = NULL "
+            "WHERE state = 'claimed' AND worker_id = ?",
+            (worker_id,)
+        )
+        return cursor.rowcount
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        # A claim whose worker has stopped heartbeating counts as waiting
+        removed = self.db.execute(
+            "DELETE FROM queue WHERE job_id = ? AND (state = 'pending' OR heartbeat_at < ?)",
+            (job_id, time.time() - self.lease_seconds)
+        ).rowcount
+        if removed:
+            return "removed"
+        if self.db.execute("UPDATE queue SET cancel_requested = 1 WHERE job_id = ?", (job_id,)).rowcount:
+            return "requested"
+        return None
+
+    def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        if not job_ids:
+            return []
+        rows = self.db.execute(
+            f"SELECT job_id FROM queue WHERE cancel_requested = 1 AND job_id IN ({', '.join('?' * len(job_ids))})",
+            job_ids
+        ).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def depth(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM queue WHERE state = 'pending'").fetchone()[0]
+
+    def claimed_jobs(self) -> List[str]:
+        return [row["job_id"] for row in self.db.execute("SELECT job_id FROM queue WHERE state = 'claimed'")]
+
+    def publish(self, job_id: str, message_type: str, data: dict):
+        self.db.execute(
+            "INSERT INTO events (job_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, message_type, json.dumps(data, default=str), time.time())
+        )
+
+    def events(self, after: int, limit: int = 500) -> List[QueueEvent]:
+        rows = self.db.execute(
+            "SELECT * FROM events WHERE seq > ? ORDER BY seq LIMIT ?",
+            (after, limit)
+        ).fetchall()
+        return [QueueEvent(row["seq"], row["job_id"], row["type"], json.loads(row["data"])) for row in rows]
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+# URL scheme -> factory taking the rest of the URL and the lease length
+QUEUE_BACKENDS: Dict[str, Callable[..., JobQueue]] = {
+    "sqlite": lambda location, lease_seconds: SqliteJobQueue(os.path.expanduser(location), lease_seconds),
+}
+
+
+def open_queue(url: str, lease_seconds: float = 60.0) -> JobQueue:
+    """Open a queue from a URL such as "sqlite://~/.junt/queue.db"."""
+    scheme, separator, location = url.partition("://")
+    if not separator or scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Unsupported job queue URL {url!r}; known schemes: {', '.join(QUEUE_BACKENDS)}")
+    return QUEUE_BACKENDS[scheme](location, lease_seconds)
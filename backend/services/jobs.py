@@ -1,306 +1,1287 @@
 import asyncio
 import uuid
-import shutil
 import os
+import shutil
+import json
+import time
+import numpy as np
 from pathlib import Path
-from typing import Dict, Optional, Callable, Tuple
+from typing import Dict, List, Optional, Callable, Tuple
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from api.schemas import JobStatus, TrackStatus, DurationType, AlbumDetail
+from api.schemas import JobStatus, DurationType, AlbumDetail, AudioCodec, Track, JobPriority, StageStatus
+from config.settings import settings
+from services.formats import get_output_format
+from services.peaks import peaks_path_for
+from services.scratch import PcmScratch, decode_to_scratch
+from services.pipeline import PipelineStage, TrackPipeline
+from services.scheduler import JobScheduler
+from services.artifacts import TrackArtifactCache
+from services.prefetch import AlbumPrefetcher
+from services.jobstore import JobStore
+from services.registry import JobRecord, JobRegistry, FINISHED_STATES
+from services.broadcast import Subscriber, hub, job_topic
+from services import metrics
+from services.metrics import timed
+from services.tracing import JobTrace, prune_traces
+from services.workspace import JobWorkspace, sweep_workspaces
+from services.jobqueue import JobQueue, QueuedJob, QueueEvent
+from services.distributed import QueueRelay
+from services.eventbus import process_id
 from services.metadata import MetadataService
 from services.downloader import DownloaderService
 from services.analyzer import AnalyzerService
 from services.processor import ProcessorService
 
 
+# Track state a failure happened in -> stage label for the failure counter
+FAILED_IN = {"downloading": "download", "analyzing": "analyze", "encoding": "encode"}
+
+# Hub topic carrying cancel requests to the process running a job (shared-state mode)
+CONTROL_TOPIC = "jobs:control"
+
+
+class TrackWork:
+    """One track as it moves through the download/analyze/encode pipeline."""
+
+    def __init__(self, index: int, track: Track):
+        self.index = index  # Position in the job's track list
+        self.track = track
+        self.artifact_key: Optional[str] = None  # Recording key in the artifact cache
+        self.audio_path: Optional[str] = None
+        self.clip: Optional[Tuple[np.ndarray, int]] = None
+        self.scratch: Optional[PcmScratch] = None  # Memory-mapped PCM the clip is a view into
+        self.clip_seconds: Optional[float] = None
+        self.loudness: Optional[float] = None
+        self.file_path: Optional[str] = None
+        self.timings: Dict[str, float] = {}  # Seconds spent per step
+
+
+class JobContext:
+    """Per-job values every stage needs."""
+
+    def __init__(
+        self,
+        job_id: str,
+        album: AlbumDetail,
+        clip_percentage: float,
+        codec: AudioCodec,
+        bitrate: str,
+        junt_dir: Path,
+        workspace: JobWorkspace,
+        trace: Optional[JobTrace] = None
+    ):
+        self.job_id = job_id
+        self.album = album
+        self.clip_percentage = clip_percentage
+        self.codec = codec
+        self.bitrate = bitrate
+        self.junt_dir = junt_dir
+        self.workspace = workspace  # Intermediate files, removed when the job ends
+        self.works: List[TrackWork] = []  # Tracks sent through the pipeline
+        self.trace = trace  # Spans, for jobs created with profile=True
+
+
 class JobManager:
-    def __init__(self):
-        self.jobs: Dict[str, JobStatus] = {}
-        self.callbacks: Dict[str, list] = {}  # WebSocket callbacks
-        self.downloader = DownloaderService()
+    def __init__(self, store: Optional[JobStore] = None):
+        self.jobs = JobRegistry(
+            settings.JOB_TTL_MINUTES * 60,
+            settings.MAX_FINISHED_JOBS,
+            on_evict=self._forget_job
+        )
+        self.hub = hub  # WebSocket subscribers, by job topic
+        self.scratch: Dict[str, List[PcmScratch]] = {}  # Memory-mapped PCM per job
+        self.pipelines: Dict[str, TrackPipeline] = {}  # Running pipeline per job
+        self.inflight: Dict[tuple, str] = {}  # Request key -> unfinished job ID
+        self.requesters: Dict[str, int] = {}  # Requests attached to each unfinished job, beyond shared-state mode
+        self.tasks: Dict[str, asyncio.Task] = {}  # Running task per unfinished job
+        self.cancel_timers: Dict[str, asyncio.TimerHandle] = {}  # Pending auto-cancels
+        self.traces: Dict[str, JobTrace] = {}  # Profiled jobs still running
+        self.workspaces: Dict[str, JobWorkspace] = {}  # Running jobs' intermediate file directories
+        self.albums: Dict[str, AlbumDetail] = {}  # Album details supplied with create_job, until the job starts
+        self.queue: Optional[JobQueue] = None  # Distributed mode: workers take new jobs from here
+        self.relay: Optional[QueueRelay] = None  # Distributed mode: brings workers' messages back
+        self.report_to: Optional[JobQueue] = None  # Worker mode: where this process's job messages go
+        self.shared = False  # Shared-state mode: other processes serve the same jobs
+        self.owner_id = process_id()  # Recorded with jobs this process runs
+        self.adopter: Optional[asyncio.Task] = None  # Shared-state mode: takes over dead processes' jobs
+        self.pruner: Optional[asyncio.Task] = None  # Evicts expired finished jobs, see start_pruning
+        self.artifacts = TrackArtifactCache(
+            settings.ARTIFACT_CACHE_DIR,
+            max_mb=settings.ARTIFACT_CACHE_MAX_MB,
+            max_age_hours=settings.ARTIFACT_CACHE_MAX_AGE_HOURS,
+            enabled=settings.ARTIFACT_CACHE_ENABLED
+        )
+        # Callers that shouldn't share the server's job database pass their own
+        self.store = store or JobStore(settings.JOB_STORE_PATH, enabled=settings.JOB_STORE_ENABLED)
+        self.scheduler = JobScheduler(
+            settings.MAX_CONCURRENT_JOBS,
+            {
+                "download": settings.DOWNLOAD_SLOTS,
+                "analyze": settings.ANALYZE_SLOTS,
+                "encode": settings.ENCODE_SLOTS,
+            },
+            default_job_seconds=settings.JOB_DURATION_ESTIMATE_SECONDS
+        )
+        self.downloader = DownloaderService(settings.TEMP_DIR)
         self.analyzer = AnalyzerService()
         self.processor = ProcessorService()
         self.metadata = MetadataService()
+        self.prefetcher = AlbumPrefetcher(
+            self.artifacts,
+            self.downloader,
+            self.scheduler,
+            tracks=settings.PREFETCH_TRACKS,
+            ttl_seconds=settings.PREFETCH_TTL_MINUTES * 60,
+            max_albums=settings.PREFETCH_MAX_ALBUMS
+        )
+        self.hub.on_topic_empty(self._topic_emptied)
+
+        metrics.active_jobs.collect = lambda: len(self.scheduler.running)
+        metrics.queued_jobs.collect = self.queued_count
+        metrics.stage_queue_depth.collect = lambda: self._stage_totals("queued")
+        metrics.stage_active.collect = lambda: self._stage_totals("active")
+        metrics.workspace_bytes.collect = lambda: sum(
+            workspace.size_bytes() for workspace in list(self.workspaces.values())
+        )
+
+    def create_job(
+        self,
+        mbid: str,
+        duration: DurationType,
+        codec: Optional[AudioCodec] = None,
+        bitrate: Optional[str] = None,
+        priority: JobPriority = JobPriority.NORMAL,
+        profile: bool = False,
+        album: Optional[AlbumDetail] = None
+    ) -> str:
+        """
+        Create a new montage job; it starts once the scheduler admits it.
+        An identical request while a matching job is unfinished gets that
+        job's ID instead, so both callers follow the same progress stream;
+        the job then only stops when every such request is cancelled (see
+        cancel_request).
+        Profiled jobs always run on their own so their trace is complete.
+        Callers that already fetched the album's details can pass them in.
+        In distributed mode the job is queued for a worker instead.
+        """
+        codec = AudioCodec(codec or settings.CLIP_CODEC)
+        bitrate = ProcessorService.clip_bitrate(codec, bitrate)
+
+        request_key = (mbid, DurationType(duration), codec, bitrate)
+        existing = self.find_unfinished(mbid, duration, codec, bitrate)
+        if not profile and existing:
+            print(f"Attaching request for {mbid} to running job {existing}")
+            self._add_requester(existing)
+            return existing
 
-    def create_job(self, mbid: str, duration: DurationType) -> str:
-        """Create a new montage job."""
         job_id = str(uuid.uuid4())
+        self._register_job(job_id, mbid, duration, codec, bitrate, priority, album)
+        self.requesters[job_id] = 1
+
+        if self.queue is not None:
+            # A worker runs it; its messages come back through relay_event,
+            # starting with this state so every API process knows the job
+            self.inflight[request_key] = job_id
+            self.queue.publish(job_id, "state", self.jobs[job_id].to_status().dict())
+            self.queue.put(QueuedJob(
+                job_id,
+                mbid,
+                DurationType(duration).value,
+                codec.value,
+                bitrate,
+                priority,
+                profile=profile,
+                album=album
+            ))
+        else:
+            self._start_local(job_id, request_key, priority, profile, album, mbid, duration, codec, bitrate)
+
+        return job_id
 
-        self.jobs[job_id] = JobStatus(
-            status="queued",
-            progress=0.0,
-            current_track=None,
-            total_tracks=0,
-            completed_tracks=0,
-            track_statuses=[],
-            errors=[],
-            file_path=None
+    def start_claimed(self, queued: QueuedJob) -> asyncio.Task:
+        """Worker mode: run a job taken from the queue. Returns the job's task."""
+        codec = AudioCodec(queued.codec)
+        duration = DurationType(queued.duration)
+        request_key = (queued.mbid, duration, codec, queued.bitrate)
+        self._register_job(queued.job_id, queued.mbid, duration, codec, queued.bitrate, queued.priority, queued.album)
+        self._start_local(
+            queued.job_id,
+            request_key,
+            queued.priority,
+            queued.profile,
+            queued.album,
+            queued.mbid,
+            duration,
+            codec,
+            queued.bitrate
         )
+        return self.tasks[queued.job_id]
 
-        self.callbacks[job_id] = []
+    def _register_job(
+        self,
+        job_id: str,
+        mbid: str,
+        duration: DurationType,
+        codec: AudioCodec,
+        bitrate: str,
+        priority: JobPriority,
+        album: Optional[AlbumDetail]
+    ):
+        """Create the job's record and store row."""
+        self.jobs[job_id] = JobRecord(priority)
+        self.store.create_job(
+            job_id,
+            mbid,
+            DurationType(duration).value,
+            codec.value,
+            bitrate,
+            JobPriority(priority).value,
+            self.jobs[job_id].to_status(),
+            owner=self.owner_id
+        )
+        if album is not None:
+            self.store.save_album(job_id, album)
+
+    def _start_local(
+        self,
+        job_id: str,
+        request_key: tuple,
+        priority: JobPriority,
+        profile: bool,
+        album: Optional[AlbumDetail],
+        *args
+    ):
+        """Run a registered job in this process."""
+        if profile:
+            self.traces[job_id] = JobTrace(
+                job_id,
+                use_cprofile=settings.PROFILE_CPROFILE,
+                use_tracemalloc=settings.PROFILE_TRACEMALLOC
+            )
+        if album is not None:
+            self.albums[job_id] = album
+        self._start_job(job_id, request_key, priority, *args)
+
+    def find_unfinished(
+        self,
+        mbid: str,
+        duration: DurationType,
+        codec: Optional[AudioCodec] = None,
+        bitrate: Optional[str] = None
+    ) -> Optional[str]:
+        """ID of an unfinished job an identical request would attach to."""
+        codec = AudioCodec(codec or settings.CLIP_CODEC)
+        bitrate = ProcessorService.clip_bitrate(codec, bitrate)
+        existing = self.inflight.get((mbid, DurationType(duration), codec, bitrate))
+        if existing and existing in self.jobs and not self.jobs[existing].finished:
+            return existing
+        if self.shared:
+            # Maybe another process has it
+            return self.store.find_unfinished(mbid, DurationType(duration).value, codec.value, bitrate)
+        return None
+
+    def _start_job(
+        self,
+        job_id: str,
+        request_key: tuple,
+        priority: JobPriority,
+        mbid: str,
+        duration: DurationType,
+        codec: AudioCodec,
+        bitrate: str
+    ):
+        self.inflight[request_key] = job_id
 
         # Start processing in background
-        asyncio.create_task(self._process_job(job_id, mbid, duration))
+        self.tasks[job_id] = asyncio.create_task(
+            self._run_job(job_id, request_key, priority, mbid, duration, codec, bitrate)
+        )
 
-        return job_id
+    def resume_jobs(self) -> int:
+        """
+        Requeue jobs that were unfinished when the process last stopped. Tracks
+        already encoded are kept; the rest run again, reusing any downloads and
+        envelopes still in the artifact cache.
+
+        Returns:
+            Number of jobs resumed
+        """
+        resumed = 0
+        rows = self.store.unfinished_jobs()
+
+        if self.queue is not None:
+            # Workers own them; keep their last known state until relayed
+            # messages bring it up to date
+            for row in rows:
+                if row["job_id"] not in self.jobs:
+                    self.jobs[row["job_id"]] = JobRecord.from_status(JobStatus.parse_raw(row["status_json"]))
+                    request_key = (row["mbid"], DurationType(row["duration"]), AudioCodec(row["codec"]), row["bitrate"])
+                    self.inflight[request_key] = row["job_id"]
+            return 0
+
+        if self.shared:
+            # Only jobs whose process has died, each taken over by exactly one
+            # process; their workspaces are known to be abandoned
+            live = self.hub.bus.live_processes(settings.WORKER_LEASE_SECONDS)
+            rows = [
+                row for row in rows
+                if row["job_id"] not in self.jobs
+                and row["owner"] not in live
+                and self.store.claim_job(row["job_id"], self.owner_id, row["owner"])
+            ]
+            for row in rows:
+                JobWorkspace(settings.WORKSPACE_DIR, row["job_id"]).remove()
+        else:
+            # Workspaces of jobs that won't run again. The root may be shared
+            # with other processes (the batch CLI, say) whose jobs this store
+            # doesn't know, so only long-idle workspaces count as abandoned.
+            sweep_workspaces(
+                settings.WORKSPACE_DIR,
+                keep=[row["job_id"] for row in rows],
+                min_age_seconds=settings.WORKSPACE_ORPHAN_MINUTES * 60
+            )
+
+        for row in rows:
+            job_id = row["job_id"]
+            if job_id in self.jobs:
+                continue
+
+            try:
+                job = JobRecord.from_status(JobStatus.parse_raw(row["status_json"]))
+                job.status = "queued"
+                self.jobs[job_id] = job
+
+                codec = AudioCodec(row["codec"])
+                duration = DurationType(row["duration"])
+                priority = JobPriority(row["priority"])
+                request_key = (row["mbid"], duration, codec, row["bitrate"])
+                self._start_job(job_id, request_key, priority, row["mbid"], duration, codec, row["bitrate"])
+                resumed += 1
+                print(f"Resuming job {job_id} for {row['mbid']}")
+            except Exception as e:
+                print(f"Could not resume job {job_id}: {e}")
+
+        return resumed
+
+    def _persist(self, job_id: str):
+        """Write the job's current status to the job store."""
+        try:
+            status = self.jobs[job_id].to_status()
+            self.store.update_status(job_id, status)
+            if self.report_to is not None:
+                self.report_to.publish(job_id, "state", status.dict())
+        except Exception as e:
+            print(f"Error persisting job {job_id}: {e}")
+
+    def _finish_job(self, job_id: str, status: str):
+        """Set and persist a final status."""
+        self.jobs[job_id].status = status
+        self._persist(job_id)
+
+        metrics.jobs_total.inc(status=status)
+        started = self.scheduler.running.get(job_id)
+        if started is not None:
+            metrics.job_seconds.observe(time.monotonic() - started, status=status)
+
+    def use_queue(self, queue: JobQueue):
+        """
+        Switch to distributed mode: new jobs are queued for worker processes
+        (see worker.py) instead of running here, and the workers' messages
+        are relayed to this process's subscribers. Needs a running event loop.
+        """
+        self.queue = queue
+        self.relay = QueueRelay(self, queue, settings.JOB_QUEUE_POLL_SECONDS)
+        self.relay.start()
+
+    def use_shared_state(self):
+        """
+        Switch to shared-state mode, for several processes serving the app
+        (uvicorn --workers N). Each job runs in the process that created it.
+        Other processes read its state from the job store, which is then
+        updated on every track change, and get its messages over the hub's
+        event bus. Cancel requests reach the running process through
+        CONTROL_TOPIC, and jobs of a process that stopped heartbeating are
+        adopted by another. Needs a running event loop and hub.use_bus().
+        """
+        self.shared = True
+        self.hub.subscribe(CONTROL_TOPIC, self._on_control)
+        self.adopter = asyncio.create_task(self._adopt_orphans())
+
+    async def _on_control(self, message: dict):
+        data = message.get("data") or {}
+        if message.get("type") == "cancel" and data.get("job_id") in self.tasks:
+            # Don't hold up the control subscriber while the job unwinds
+            asyncio.create_task(self.cancel_job(data["job_id"]))
+
+    async def _adopt_orphans(self):
+        while True:
+            await asyncio.sleep(settings.WORKER_LEASE_SECONDS)
+            try:
+                adopted = self.resume_jobs()
+                if adopted:
+                    print(f"Adopted {adopted} job(s) from stopped processes")
+            except Exception as e:
+                print(f"Error adopting orphaned jobs: {e}")
+
+    def start_pruning(self):
+        """
+        Evict expired finished jobs every JOB_PRUNE_INTERVAL_SECONDS, from
+        memory (JOB_TTL_MINUTES) and from the job store
+        (JOB_STORE_RETENTION_HOURS), even while no new jobs arrive. Needs a
+        running event loop.
+        """
+        if settings.JOB_PRUNE_INTERVAL_SECONDS > 0:
+            self.pruner = asyncio.create_task(self._prune_periodically())
+
+    async def _prune_periodically(self):
+        while True:
+            await asyncio.sleep(settings.JOB_PRUNE_INTERVAL_SECONDS)
+            try:
+                self.prune()
+            except Exception as e:
+                print(f"Error pruning finished jobs: {e}")
+
+    def prune(self) -> Tuple[int, int]:
+        """
+        Evict expired finished jobs now.
+
+        Returns:
+            Jobs evicted from memory and jobs deleted from the job store
+        """
+        evicted = self.jobs.prune()
+        deleted = 0
+        if settings.JOB_STORE_RETENTION_HOURS > 0:
+            deleted = self.store.prune(settings.JOB_STORE_RETENTION_HOURS * 3600)
+        if evicted or deleted:
+            print(f"Pruned finished jobs: {evicted} from memory, {deleted} from the job store")
+        return evicted, deleted
+
+    def queued_count(self) -> int:
+        """Jobs waiting to start, here or (in distributed mode) for a worker."""
+        return self.queue.depth() if self.queue is not None else len(self.scheduler.waiting)
+
+    def relay_event(self, event: QueueEvent):
+        """
+        Distributed mode: apply one message from a worker. State snapshots
+        replace the job's record (and stored status); everything else goes
+        to the job's subscribers unchanged.
+        """
+        if event.type != "state":
+            # Every API process relays the queue itself, so don't share it again
+            self._publish(event.job_id, event.type, event.data, share=False)
+            return
+
+        status = JobStatus(**event.data)
+        previous = self.jobs.get(event.job_id)
+        self.jobs[event.job_id] = JobRecord.from_status(status)
+        self.store.update_status(event.job_id, status)
+        if status.status in FINISHED_STATES and not (previous and previous.finished):
+            self._forget_request(event.job_id)
+
+    def _forget_request(self, job_id: str):
+        """Stop attaching identical requests to a job that has finished."""
+        for request_key, inflight_id in list(self.inflight.items()):
+            if inflight_id == job_id:
+                del self.inflight[request_key]
+        self.requesters.pop(job_id, None)
+
+    def _add_requester(self, job_id: str):
+        if self.shared:
+            # Requests may attach in any process, so the job store keeps the count
+            self.store.add_requester(job_id)
+        else:
+            self.requesters[job_id] = self.requesters.get(job_id, 1) + 1
+
+    def _release_requester(self, job_id: str) -> int:
+        """Detach one request from a job. Returns how many are still attached."""
+        if self.shared:
+            return self.store.release_requester(job_id)
+        remaining = self.requesters.get(job_id, 1) - 1
+        self.requesters[job_id] = remaining
+        return remaining
+
+    def _forget_job(self, job_id: str):
+        """Drop per-job state when the registry evicts a finished job."""
+        self.hub.drop_topic(job_topic(job_id))
 
     def get_job_status(self, job_id: str) -> Optional[JobStatus]:
-        """Get current job status."""
-        return self.jobs.get(job_id)
+        """
+        Get current job status. Jobs evicted from memory are read back from
+        the job store.
+        """
+        job = self.jobs.get(job_id)
+        if not job:
+            return self.store.load_status(job_id)
+
+        status = job.to_status()
+        if job_id in self.pipelines:
+            status.stages = self._stage_models(self._stage_status(job_id))
 
-    def register_callback(self, job_id: str, callback: Callable):
-        """Register a WebSocket callback for job updates."""
-        if job_id in self.callbacks:
-            self.callbacks[job_id].append(callback)
+        if job.status == "queued":
+            status.queue_position, status.estimated_start = self._queue_info(job_id)
 
-    def unregister_callback(self, job_id: str, callback: Callable):
-        """Unregister a WebSocket callback."""
-        if job_id in self.callbacks:
+        workspace = self.workspaces.get(job_id)
+        if workspace:
+            status.workspace_bytes = workspace.size_bytes()
+        return status
+
+    def _queue_info(self, job_id: str) -> Tuple[Optional[int], Optional[str]]:
+        """Queue position and ISO estimated start time of a queued job."""
+        estimated_start = self.scheduler.estimated_start(job_id)
+        return (
+            self.scheduler.queue_position(job_id),
+            estimated_start.isoformat() if estimated_start else None
+        )
+
+    async def _run_job(self, job_id: str, request_key: tuple, priority: JobPriority, *args):
+        """Wait for the scheduler to admit the job, then process it."""
+        trace = self.traces.get(job_id)
+        try:
+            with self._span(trace, "queued", priority=JobPriority(priority).value):
+                await self.scheduler.admit(job_id, priority)
+            self._notify_queue_positions()
+            if trace:
+                trace.start()
             try:
-                self.callbacks[job_id].remove(callback)
-            except ValueError:
-                pass
-
-    async def _notify_callbacks(self, job_id: str, message_type: str, data: dict):
-        """Notify all registered callbacks for a job."""
-        if job_id in self.callbacks:
-            for callback in self.callbacks[job_id]:
-                try:
-                    await callback({"type": message_type, "data": data})
-                except Exception as e:
-                    print(f"Error notifying callback: {e}")
-
-    async def _process_single_track(
-        self,
-        job_id: str,
-        track: object,
-        track_index: int,
-        album: AlbumDetail,
-        clip_percentage: float
-    ) -> Tuple[int, Optional[str], Optional[str]]:
+                await self._process_job(job_id, *args)
+            finally:
+                self.scheduler.finish(job_id)
+        except asyncio.CancelledError:
+            # Cancelled while still queued; _process_job handles a running job
+            if not self.jobs[job_id].finished:
+                self._finish_job(job_id, "cancelled")
+                self._publish(job_id, "cancelled", {"message": "Job cancelled"})
+                self._notify_queue_positions()
+        finally:
+            workspace = self.workspaces.pop(job_id, None)
+            if workspace:
+                workspace.remove()
+            if trace:
+                self._save_trace(job_id, trace)
+            self.albums.pop(job_id, None)
+            self.tasks.pop(job_id, None)
+            timer = self.cancel_timers.pop(job_id, None)
+            if timer:
+                timer.cancel()
+            if self.inflight.get(request_key) == job_id:
+                del self.inflight[request_key]
+            self.requesters.pop(job_id, None)
+            # Subscribers have had the final message; the job may now be evicted
+            self.jobs.mark_finished(job_id)
+
+    @staticmethod
+    def _span(trace: Optional[JobTrace], name: str, track: int = 0, **args):
+        """Trace span if the job is profiled, otherwise a no-op."""
+        return trace.span(name, track, **args) if trace else nullcontext()
+
+    @contextmanager
+    def _step(self, context: "JobContext", work: "TrackWork", stage: str):
+        """Time one processing step of a track for metrics, status and the job trace."""
+        with timed(work.timings, stage), self._span(context.trace, stage, work.track.number):
+            yield
+
+    def trace_path(self, job_id: str) -> str:
+        return os.path.join(settings.TRACE_DIR, f"{job_id}.json")
+
+    def _save_trace(self, job_id: str, trace: JobTrace):
+        """Stop a profiled job's profilers and write its Chrome trace."""
+        try:
+            trace.stop()
+            trace.other["status"] = self.jobs[job_id].status
+            trace.save(self.trace_path(job_id))
+            prune_traces(settings.TRACE_DIR, settings.TRACE_MAX_FILES, settings.TRACE_MAX_AGE_HOURS)
+        except Exception as e:
+            print(f"Error saving trace for job {job_id}: {e}")
+        finally:
+            self.traces.pop(job_id, None)
+
+    def get_trace(self, job_id: str) -> Optional[dict]:
+        """Chrome trace of a profiled job: live while it runs, from disk afterwards."""
+        trace = self.traces.get(job_id)
+        if trace:
+            return trace.to_chrome()
+        path = self.trace_path(job_id)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return None
+
+    async def cancel_job(self, job_id: str) -> bool:
+        """
+        Cancel an unfinished job. Queued jobs leave the queue; running ones
+        stop their downloads, ffmpeg decodes and pipeline workers, and the
+        job's temp files and partial junt directory are deleted before this
+        returns. A job running in another process (a worker, or another API
+        process in shared-state mode) is cancelled there; this waits up to
+        CANCEL_TIMEOUT_SECONDS for it to report back.
+
+        Returns:
+            False if the job is unknown or already finished
+        """
+        task = self.tasks.get(job_id)
+        if task is None:
+            if self.queue is not None:
+                return await self._cancel_queued(job_id)
+            if self.shared:
+                return await self._cancel_elsewhere(job_id)
+            return False
+        if self.jobs[job_id].finished:
+            return False
+
+        print(f"Cancelling job {job_id}")
+        task.cancel()
+        # Let the job unwind; shield so a cancelled caller doesn't interrupt its cleanup
+        await asyncio.wait({asyncio.shield(task)}, timeout=settings.CANCEL_TIMEOUT_SECONDS)
+        return True
+
+    async def cancel_request(self, job_id: str) -> bool:
         """
-        Process a single track: download, analyze, extract, and normalize.
+        Withdraw one request for a job. Identical requests share a job (see
+        create_job), so it is only cancelled once the last of them is
+        withdrawn; until then it keeps running for the others.
 
         Returns:
-            Tuple of (track_number, clip_path, error_message)
-            If successful, error_message is None
+            False if the job is unknown or already finished
         """
+        if not self._unfinished(job_id):
+            return False
+        remaining = self._release_requester(job_id)
+        if remaining > 0:
+            print(f"Request for job {job_id} withdrawn; {remaining} still attached")
+            return True
+        return await self.cancel_job(job_id)
+
+    async def _cancel_queued(self, job_id: str) -> bool:
+        """Distributed mode: drop a job from the queue, or ask its worker to stop it."""
+        status = self.get_job_status(job_id)
+        if status is None or status.status in FINISHED_STATES:
+            return False
+
+        outcome = self.queue.cancel(job_id)
+        if outcome is None:
+            return False
+        if outcome == "removed":
+            print(f"Cancelled queued job {job_id}")
+            metrics.jobs_total.inc(status="cancelled")
+            # Every API process, this one included, hears of it through its relay
+            status.status = "cancelled"
+            self.queue.publish(job_id, "state", status.dict())
+            self.queue.publish(job_id, "cancelled", {"message": "Job cancelled"})
+        else:
+            print(f"Asked the worker running job {job_id} to cancel it")
+
+        await self._wait_finished(job_id, settings.JOB_QUEUE_POLL_SECONDS)
+        return True
+
+    async def _cancel_elsewhere(self, job_id: str) -> bool:
+        """Shared-state mode: ask the process running a job to cancel it."""
+        if not self._unfinished(job_id):
+            return False
+        print(f"Asking the process running job {job_id} to cancel it")
+        self.hub.publish(CONTROL_TOPIC, {"type": "cancel", "data": {"job_id": job_id}})
+        await self._wait_finished(job_id, settings.EVENT_BUS_POLL_SECONDS)
+        return True
+
+    async def _wait_finished(self, job_id: str, poll_seconds: float):
+        """Give another process up to CANCEL_TIMEOUT_SECONDS to wind a job down and report it."""
+        deadline = time.monotonic() + settings.CANCEL_TIMEOUT_SECONDS
+        while self._unfinished(job_id) and time.monotonic() < deadline:
+            await asyncio.sleep(poll_seconds)
+
+    def _unfinished(self, job_id: str) -> bool:
+        """Whether a job is still queued or running, wherever it runs."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return not job.finished
+        status = self.store.load_status(job_id) if self.shared else None
+        return status is not None and status.status not in FINISHED_STATES
+
+    def _topic_emptied(self, topic: str):
+        """Start the auto-cancel grace period when a job's last subscriber leaves."""
+        if not topic.startswith("job:") or settings.AUTO_CANCEL_GRACE_SECONDS <= 0:
+            return
+        job_id = topic[len("job:"):]
+        if not self._unfinished(job_id):
+            return
+
+        timer = self.cancel_timers.pop(job_id, None)
+        if timer:
+            timer.cancel()
+        self.cancel_timers[job_id] = asyncio.get_running_loop().call_later(
+            settings.AUTO_CANCEL_GRACE_SECONDS,
+            lambda: asyncio.ensure_future(self._auto_cancel(job_id))
+        )
+
+    async def _auto_cancel(self, job_id: str):
+        self.cancel_timers.pop(job_id, None)
+        if self.hub.subscriber_count(job_topic(job_id)):
+            return  # Someone reconnected during the grace period
+        if await self.cancel_job(job_id):
+            print(f"Auto-cancelled job {job_id}: no subscribers for {settings.AUTO_CANCEL_GRACE_SECONDS}s")
+
+    def _notify_queue_positions(self):
+        """Tell queued jobs' subscribers where they now stand."""
+        for waiter in list(self.scheduler.waiting):
+            queue_position, estimated_start = self._queue_info(waiter.job_id)
+            self._publish(waiter.job_id, "progress", {
+                "status": "queued",
+                "queue_position": queue_position,
+                "estimated_start": estimated_start
+            })
+
+    def subscribe(
+        self,
+        job_id: str,
+        send: Callable,
+        on_close: Optional[Callable] = None
+    ) -> Subscriber:
+        """
+        Subscribe a connection to job updates. Each subscriber gets its own
+        bounded outbox, so a slow connection never delays the job.
+        """
+        return self.hub.subscribe(job_topic(job_id), send, on_close=on_close)
+
+    def unsubscribe(self, job_id: str, subscriber: Subscriber):
+        """Stop sending job updates to a subscriber."""
+        self.hub.disconnect(subscriber)
+
+    def _publish(self, job_id: str, message_type: str, data: dict, share: bool = True):
+        """Queue a message for every subscriber of a job; never waits on them."""
+        self.hub.publish(job_topic(job_id), {"type": message_type, "data": data}, share=share)
+        if self.report_to is not None:
+            try:
+                self.report_to.publish(job_id, message_type, data)
+            except Exception as e:
+                print(f"Error reporting {message_type} for job {job_id}: {e}")
+
+    def _release_scratch(self, job_id: str):
+        """Unmap and delete a job's decoded PCM scratch files."""
+        for scratch in self.scratch.pop(job_id, []):
+            scratch.close()
+
+    def _release_track_scratch(self, job_id: str, work: "TrackWork"):
+        """Unmap and delete one track's scratch file once its clip is encoded or dropped."""
+        if work.scratch is None:
+            return
+        work.scratch.close()
+        scratches = self.scratch.get(job_id, [])
+        if work.scratch in scratches:
+            scratches.remove(work.scratch)
+        work.scratch = None
+
+    def _set_track_status(self, job_id: str, work: "TrackWork", status: str):
+        """Update a track's status and tell subscribers, with current stage load."""
         job = self.jobs[job_id]
-        track_status = job.track_statuses[track_index]
+        job.set_track_state(work.index, status)
+        job.current_track = work.track.number
+        if self.shared:
+            # Other processes read track states from the store
+            self._persist(job_id)
+        self._publish(job_id, "progress", {
+            "current_track": work.track.number,
+            "track_status": job.track_status(work.index).dict(),
+            "stages": self._stage_status(job_id)
+        })
+
+    @staticmethod
+    def _stage_models(stages: Dict[str, dict]) -> Dict[str, StageStatus]:
+        return {name: StageStatus(**status) for name, status in stages.items()}
+
+    def _stage_status(self, job_id: str) -> Dict[str, dict]:
+        pipeline = self.pipelines.get(job_id)
+        return pipeline.status() if pipeline else {}
+
+    def _stage_totals(self, field: str) -> Dict[tuple, int]:
+        """One stage counter summed over every running pipeline, for the metrics gauges."""
+        totals = {(stage,): 0 for stage in ("download", "analyze", "encode")}
+        for pipeline in list(self.pipelines.values()):
+            for stage, status in pipeline.status().items():
+                totals[(stage,)] = totals.get((stage,), 0) + status[field]
+        return totals
+
+    def _fail_track(self, context: "JobContext", work: "TrackWork", error: Exception) -> None:
+        """Record a track failure; returning None drops it from the pipeline."""
+        job = self.jobs[context.job_id]
+        error_msg = str(error)
+        metrics.track_failures_total.inc(stage=FAILED_IN.get(job.track_state(work.index), "other"))
+        job.set_track_state(work.index, "failed", error_msg)
+        job.add_error(f"Track {work.track.number}: {error_msg}")
+        work.clip = None
+        self._release_track_scratch(context.job_id, work)
+        self._release_download(work)
+        self.store.save_track(context.job_id, work.index, "failed")
+        self._persist(context.job_id)
+
+        self._publish(context.job_id, "error", {
+            "track_number": work.track.number,
+            "error": error_msg
+        })
 
+        print(f"Error processing track {work.track.number}: {error}")
+        return None
+
+    def _release_download(self, work: "TrackWork"):
+        """Hand the source audio back to the artifact cache once a track is done with it."""
+        if work.artifact_key:
+            self.artifacts.release(work.artifact_key, work.audio_path)
+            work.artifact_key = None
+        work.audio_path = None
+
+    async def _download_stage(self, context: "JobContext", work: "TrackWork") -> Optional["TrackWork"]:
+        """Pipeline stage: fetch the source audio, or reuse this recording's cached download."""
         try:
-            # Download track
-            track_status.status = "downloading"
-            await self._notify_callbacks(job_id, "progress", {
-                "current_track": track.number,
-                "track_status": track_status.dict()
-            })
+            source_path = getattr(work.track, "source_path", None)
+            if source_path:
+                # Local file (offline batch): used in place, so it's neither cached nor deleted
+                work.audio_path = source_path
+                self.store.save_track(context.job_id, work.index, "downloaded")
+                return work
 
-            output_filename = f"{job_id}_track_{track.number}"
-            audio_path = await self.downloader.download_track(
-                album.artist,
-                track.title,
-                output_filename
-            )
+            self._set_track_status(context.job_id, work, "downloading")
+            key = self.artifacts.key_for(context.album.artist, work.track)
+            with self._step(context, work, "download"):
+                work.audio_path = await self.artifacts.fetch_download(
+                    key,
+                    lambda: self.downloader.download_track(
+                        context.album.artist,
+                        work.track.title,
+                        f"track_{work.track.number}",
+                        output_dir=context.workspace.path
+                    )
+                )
+            work.artifact_key = key
+            self.store.save_track(context.job_id, work.index, "downloaded", artifact_key=key)
+            return work
+        except Exception as e:
+            return self._fail_track(context, work, e)
+
+    async def _analyze_stage(self, context: "JobContext", work: "TrackWork") -> Optional["TrackWork"]:
+        """Pipeline stage: find the peak energy window and cut the clip into memory."""
+        try:
+            self._set_track_status(context.job_id, work, "analyzing")
 
             # Calculate clip duration for this specific track
-            clip_duration = self.processor.calculate_clip_duration(track.duration, clip_percentage)
+            clip_duration = self.processor.calculate_clip_duration(work.track.duration, context.clip_percentage)
 
-            # Analyze for peak energy
-            track_status.status = "analyzing"
-            await self._notify_callbacks(job_id, "progress", {
-                "current_track": track.number,
-                "track_status": track_status.dict()
-            })
+            if settings.PCM_SCRATCH_ENABLED:
+                # Decode once into a memory-mapped file; analysis and the clip
+                # are views into it, released once the track's clip is encoded
+                with self._step(context, work, "analyze"):
+                    with self._span(context.trace, "decode", work.track.number):
+                        scratch = await decode_to_scratch(
+                            work.audio_path,
+                            context.workspace.file(f"pcm_{work.track.number}.f32"),
+                            rate=settings.PCM_SCRATCH_SAMPLE_RATE
+                        )
+                    self.scratch.setdefault(context.job_id, []).append(scratch)
+                    work.scratch = scratch
 
-            start_time, end_time = await self.analyzer.find_peak_energy_window(
-                audio_path,
-                clip_duration
-            )
+                    start_time, end_time = await self._find_window(
+                        work,
+                        clip_duration,
+                        lambda: self.analyzer.compute_envelope_in_samples(scratch.samples, scratch.rate),
+                        lambda: self.analyzer.find_peak_energy_window_in_samples(scratch.samples, scratch.rate, clip_duration)
+                    )
+                with self._step(context, work, "extract"):
+                    work.clip = self.processor.slice_clip_samples(
+                        scratch.samples,
+                        scratch.rate,
+                        start_time,
+                        end_time
+                    )
+            else:
+                with self._step(context, work, "analyze"):
+                    start_time, end_time = await self._find_window(
+                        work,
+                        clip_duration,
+                        lambda: self.analyzer.compute_envelope(work.audio_path),
+                        lambda: self.analyzer.find_peak_energy_window(work.audio_path, clip_duration)
+                    )
+                with self._step(context, work, "extract"):
+                    work.clip = await self.processor.extract_clip_samples(
+                        work.audio_path,
+                        start_time,
+                        end_time
+                    )
 
-            # Extract clip
-            clip_path = f"temp/{job_id}_clip_{track.number}.mp3"
-            await self.processor.extract_clip(
-                audio_path,
-                start_time,
-                end_time,
-                clip_path
-            )
+            work.clip_seconds = len(work.clip[0]) / work.clip[1]
 
-            # Normalize
-            await self.processor.normalize_audio(clip_path)
+            # Done with the source; the cache keeps it for other requests
+            self._release_download(work)
+            self.store.save_track(context.job_id, work.index, "analyzed", clip_seconds=work.clip_seconds)
+            return work
+        except Exception as e:
+            return self._fail_track(context, work, e)
 
-            # Mark as complete
-            track_status.status = "complete"
+    async def _find_window(
+        self,
+        work: "TrackWork",
+        clip_duration: float,
+        compute_envelope: Callable,
+        fallback: Callable
+    ) -> Tuple[float, float]:
+        """Clip window from the recording's cached envelope, computing and caching it if missing."""
+        envelope = self.artifacts.load_envelope(work.artifact_key) if work.artifact_key else None
+        if envelope is None:
+            envelope = await compute_envelope()
+            if envelope is None:
+                # Analysis failed; let the analyzer pick its fallback window
+                return await fallback()
+            if work.artifact_key:
+                self.artifacts.store_envelope(work.artifact_key, envelope)
 
-            # Cleanup downloaded file
-            self.downloader.cleanup(audio_path)
+        return self.analyzer.window_from_envelope(envelope, clip_duration)
+
+    async def _encode_stage(self, context: "JobContext", work: "TrackWork") -> Optional["TrackWork"]:
+        """
+        Pipeline stage: measure loudness and, in track mode, encode the clip
+        straight away. Album mode needs every clip's loudness first, so those
+        clips are encoded, and only then reported complete, in _process_job
+        once the pipeline drains.
+        """
+        try:
+            self._set_track_status(context.job_id, work, "encoding")
 
-            print(f"Track {track.number} processed successfully")
-            return (track.number, clip_path, None)
+            with self._step(context, work, "normalize"):
+                work.loudness = (await asyncio.to_thread(self.processor.measure_loudness, [work.clip]))[0]
 
+            if settings.LOUDNESS_MODE != "album":
+                gain_db = self.processor.compute_gains(
+                    [work.loudness],
+                    [work.clip_seconds],
+                    target_lufs=settings.TARGET_LUFS
+                )[0]
+                await self._encode_track(context, work, gain_db)
+                self._complete_track(context, work)
+            return work
         except Exception as e:
-            error_msg = str(e)
-            track_status.status = "failed"
-            track_status.error = error_msg
+            return self._fail_track(context, work, e)
 
-            await self._notify_callbacks(job_id, "error", {
-                "track_number": track.number,
-                "error": error_msg
-            })
+    async def _encode_track(self, context: "JobContext", work: "TrackWork", gain_db: float):
+        """Encode a clip into the junt directory and release its samples and scratch."""
+        samples, rate = work.clip
 
-            print(f"Error processing track {track.number}: {e}")
-            return (track.number, None, error_msg)
+        # Create permanent filename: track_01.mp3, track_02.mp3, etc.
+        extension = get_output_format(context.codec)["extension"]
+        permanent_path = context.junt_dir / f"track_{work.track.number:02d}.{extension}"
+
+        try:
+            with self._step(context, work, "encode"):
+                await self.processor.encode_clip(
+                    samples,
+                    rate,
+                    str(permanent_path),
+                    gain_db=gain_db,
+                    codec=context.codec,
+                    bitrate=context.bitrate,
+                    peaks_path=peaks_path_for(str(permanent_path))
+                )
+        finally:
+            # The clip is a view into the scratch map: drop both before unmapping
+            del samples
+            work.clip = None
+            self._release_track_scratch(context.job_id, work)
+
+        work.file_path = str(permanent_path)
+        self.store.save_track(
+            context.job_id,
+            work.index,
+            "encoded",
+            file_path=work.file_path,
+            loudness=work.loudness,
+            clip_seconds=work.clip_seconds
+        )
 
-    async def _process_job(self, job_id: str, mbid: str, duration: DurationType):
+    async def _encode_album(self, context: "JobContext", finished: List["TrackWork"]) -> List["TrackWork"]:
+        """
+        Album loudness mode: encode every measured clip with one gain for the
+        whole album. Each track is completed or failed by its own encode.
+
+        Returns:
+            The tracks that are encoded
+        """
+        gains = self.processor.compute_gains(
+            [work.loudness for work in finished],
+            [work.clip_seconds for work in finished],
+            target_lufs=settings.TARGET_LUFS,
+            mode="album"
+        )
+
+        async def encode(work: TrackWork, gain_db: float):
+            async with self.scheduler.slot("encode", context.job_id):
+                await self._encode_track(context, work, gain_db)
+
+        # Clips restored from before a restart are already encoded
+        pending = [(work, gain_db) for work, gain_db in zip(finished, gains) if work.file_path is None]
+        results = await asyncio.gather(
+            *(encode(work, gain_db) for work, gain_db in pending),
+            return_exceptions=True
+        )
+
+        failed = set()
+        for (work, _), result in zip(pending, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, BaseException):
+                self._fail_track(context, work, result)
+                failed.add(work.index)
+            else:
+                self._complete_track(context, work)
+        return [work for work in finished if work.index not in failed]
+
+    async def _assemble_montage(
+        self,
+        context: "JobContext",
+        finished: List["TrackWork"],
+        crossfade: float
+    ) -> Optional[str]:
+        """
+        Join the job's encoded clips into a single montage in the junt
+        directory. The clips are the job's main output, so a failure here
+        is recorded as an error rather than failing the job.
+
+        Returns:
+            Path to the montage, or None if it couldn't be assembled
+        """
+        clip_paths = [work.file_path for work in finished if work.file_path]
+        if not clip_paths:
+            return None
+
+        codec = AudioCodec(settings.MONTAGE_CODEC)
+        output_path = context.junt_dir / f"montage.{get_output_format(codec)['extension']}"
+        try:
+            async with self.scheduler.slot("encode", context.job_id):
+                with self._span(context.trace, "montage", clips=len(clip_paths)):
+                    await self.processor.create_montage(clip_paths, str(output_path), crossfade, codec=codec)
+            return str(output_path)
+        except Exception as e:
+            self.jobs[context.job_id].add_error(f"Montage: {e}")
+            print(f"Error assembling montage for job {context.job_id}: {e}")
+            return None
+
+    def _complete_track(self, context: "JobContext", work: "TrackWork"):
+        job = self.jobs[context.job_id]
+        job.set_track_state(work.index, "complete")
+        job.completed_tracks += 1
+        job.progress = job.completed_tracks / job.total_tracks
+
+        self._publish(context.job_id, "track_complete", {
+            "track_number": work.track.number,
+            "track_title": work.track.title,
+            "completed": job.completed_tracks,
+            "total": job.total_tracks,
+            "progress": job.progress
+        })
+
+        self._persist(context.job_id)
+        print(f"Track {work.track.number} processed successfully")
+
+    def _restore_tracks(self, job_id: str, album: AlbumDetail) -> Tuple[List["TrackWork"], List["TrackWork"]]:
+        """
+        Split a job's tracks into ones already finished before a restart
+        (encoded clip still on disk) and ones that still need the pipeline.
+        Tracks that failed before stay failed. For a new job every track
+        is remaining.
+
+        Returns:
+            Tuple of (finished, remaining) work items
+        """
+        job = self.jobs[job_id]
+        stored = self.store.load_tracks(job_id)
+        finished, remaining = [], []
+
+        for index, track in enumerate(album.tracks):
+            work = TrackWork(index, track)
+            row = stored.get(index)
+
+            if row and row["stage"] == "encoded" and row["file_path"] and os.path.exists(row["file_path"]):
+                work.file_path = row["file_path"]
+                work.loudness = row["loudness"]
+                work.clip_seconds = row["clip_seconds"]
+                job.set_track_state(index, "complete")
+                finished.append(work)
+            elif row and row["stage"] == "failed":
+                job.set_track_state(index, "failed")
+            else:
+                job.set_track_timings(index, work.timings)
+                remaining.append(work)
+
+        job.completed_tracks = len(finished)
+        job.progress = job.completed_tracks / job.total_tracks if job.total_tracks else 0.0
+        return finished, remaining
+
+    def _scheduled(self, stage: str, context: "JobContext", handler: Callable) -> Callable:
+        """Wrap a stage handler so each track holds a global scheduler slot."""
+        async def run(work: TrackWork) -> Optional[TrackWork]:
+            async with self.scheduler.slot(stage, context.job_id):
+                return await handler(context, work)
+        return run
+
+    def _build_pipeline(self, context: "JobContext") -> TrackPipeline:
+        """
+        Download, analyze and encode stages, each with its own worker pool.
+        Workers also need one of the scheduler's slots, shared across jobs.
+        """
+        return TrackPipeline([
+            PipelineStage(
+                "download",
+                self._scheduled("download", context, self._download_stage),
+                concurrency=settings.DOWNLOAD_CONCURRENCY,
+                queue_size=settings.PIPELINE_QUEUE_SIZE
+            ),
+            PipelineStage(
+                "analyze",
+                self._scheduled("analyze", context, self._analyze_stage),
+                concurrency=settings.ANALYZE_CONCURRENCY,
+                queue_size=settings.PIPELINE_QUEUE_SIZE
+            ),
+            PipelineStage(
+                "encode",
+                self._scheduled("encode", context, self._encode_stage),
+                concurrency=settings.ENCODE_CONCURRENCY,
+                queue_size=settings.PIPELINE_QUEUE_SIZE
+            ),
+        ])
+
+    async def _process_job(
+        self,
+        job_id: str,
+        mbid: str,
+        duration: DurationType,
+        codec: AudioCodec,
+        bitrate: str
+    ):
         """Process a montage creation job."""
         job = self.jobs[job_id]
+        trace = self.traces.get(job_id)
+        junt_dir = None
+        context = None
 
         try:
             job.status = "processing"
-            await self._notify_callbacks(job_id, "progress", {"status": "processing"})
+            self._persist(job_id)
+            self._publish(job_id, "progress", {"status": "processing"})
 
-            # Get album details
-            album = await self.metadata.get_album_details(mbid)
+            # Get album details (supplied by the caller, or already stored
+            # when resuming after a restart)
+            album = self.albums.pop(job_id, None) or self.store.load_album(job_id)
             if not album:
-                raise Exception("Failed to fetch album details")
+                with self._span(trace, "album details", mbid=mbid):
+                    album = await self.metadata.get_album_details(mbid)
+                if not album:
+                    raise Exception("Failed to fetch album details")
+                self.store.save_album(job_id, album)
+
+            if trace:
+                for track in album.tracks:
+                    trace.name_track(track.number, track.title)
 
             # Initialize track statuses
-            job.total_tracks = len(album.tracks)
-            job.track_statuses = [
-                TrackStatus(
-                    track_number=track.number,
-                    track_title=track.title,
-                    status="pending",
-                    error=None
-                )
-                for track in album.tracks
-            ]
+            job.set_tracks(album.tracks)
 
-            await self._notify_callbacks(job_id, "progress", {
+            self._publish(job_id, "progress", {
                 "total_tracks": job.total_tracks,
                 "album": album.dict()
             })
 
             # Get clip percentage settings
-            clip_percentage, _ = self.processor.get_clip_percentage(duration)
-
-            # Processing settings
-            BATCH_SIZE = 3  # Process this many tracks in parallel
-
-            # Track clips by number to maintain order
-            clips_by_track_number = {}
-
-            # Process tracks in parallel batches
-            for batch_start in range(0, len(album.tracks), BATCH_SIZE):
-                batch_end = min(batch_start + BATCH_SIZE, len(album.tracks))
-                batch_tracks = album.tracks[batch_start:batch_end]
-
-                # Process this batch in parallel
-                batch_tasks = [
-                    self._process_single_track(
-                        job_id,
-                        track,
-                        batch_start + i,
-                        album,
-                        clip_percentage
-                    )
-                    for i, track in enumerate(batch_tracks)
-                ]
-
-                # Wait for all tracks in this batch to complete
-                batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-
-                # Process results
-                for result in batch_results:
-                    if isinstance(result, Exception):
-                        print(f"Batch task failed with exception: {result}")
-                        continue
-
-                    track_number, clip_path, error_msg = result
-
-                    if error_msg:
-                        # Error already logged in _process_single_track
-                        job.errors.append(f"Track {track_number}: {error_msg}")
-                    else:
-                        # Successfully processed
-                        clips_by_track_number[track_number] = clip_path
-                        job.completed_tracks += 1
-                        job.progress = job.completed_tracks / job.total_tracks
-
-                        # Find track info for notification
-                        track_info = next((t for t in album.tracks if t.number == track_number), None)
-
-                        await self._notify_callbacks(job_id, "track_complete", {
-                            "track_number": track_number,
-                            "track_title": track_info.title if track_info else f"Track {track_number}",
-                            "completed": job.completed_tracks,
-                            "total": job.total_tracks,
-                            "progress": job.progress
-                        })
+            clip_percentage, crossfade = self.processor.get_clip_percentage(duration)
 
-            # Check if we have any clips
-            if not clips_by_track_number:
-                raise Exception("All tracks failed to process")
-
-            # Create permanent directory for this junt
+            # Create permanent directory for this junt; clips are encoded
+            # into it as soon as they leave the pipeline
             from services.library import get_montages_dir
             junt_dir = get_montages_dir() / job_id
             junt_dir.mkdir(exist_ok=True)
 
-            # Move clips to permanent storage and build track data
-            tracks_data = []
-            sorted_track_numbers = sorted(clips_by_track_number.keys())
+            workspace = self.workspaces[job_id] = JobWorkspace(settings.WORKSPACE_DIR, job_id).create()
+            context = JobContext(job_id, album, clip_percentage, codec, bitrate, junt_dir, workspace, trace)
+            finished, remaining = self._restore_tracks(job_id, album)
+            context.works = remaining
+            self._persist(job_id)
 
-            for track_number in sorted_track_numbers:
-                temp_clip_path = clips_by_track_number[track_number]
+            pipeline = self._build_pipeline(context)
+            self.pipelines[job_id] = pipeline
+
+            try:
+                with self._span(trace, "pipeline", tracks=len(remaining)):
+                    finished += await pipeline.run(remaining)
+            finally:
+                job.stages = pipeline.status()
+                self.pipelines.pop(job_id, None)
+
+            # Check if we have any clips
+            if not finished:
+                raise Exception("All tracks failed to process")
 
-                # Create permanent filename: track_01.mp3, track_02.mp3, etc.
-                permanent_filename = f"track_{track_number:02d}.mp3"
-                permanent_path = junt_dir / permanent_filename
+            finished.sort(key=lambda work: work.track.number)
 
-                # Move clip to permanent storage
-                shutil.move(temp_clip_path, permanent_path)
+            if settings.LOUDNESS_MODE == "album":
+                with self._span(trace, "album encode"):
+                    finished = await self._encode_album(context, finished)
+                if not finished:
+                    raise Exception("All tracks failed to process")
 
-                # Find track info
-                track_info = next((t for t in album.tracks if t.number == track_number), None)
+            self._release_scratch(job_id)
 
-                # Build track data
-                tracks_data.append({
-                    "number": track_number,
-                    "title": track_info.title if track_info else f"Track {track_number}",
-                    "duration": track_info.duration if track_info else 0,
-                    "file_path": str(permanent_path)
-                })
+            # One file of the whole album, served by /download
+            job.file_path = await self._assemble_montage(context, finished, crossfade)
+
+            # Build track data
+            tracks_data = [
+                {
+                    "number": work.track.number,
+                    "title": work.track.title,
+                    "duration": work.track.duration or 0,
+                    "recording_id": work.track.recording_id,  # Lets a saved montage be re-rendered
+                    "file_path": work.file_path
+                }
+                for work in finished
+            ]
 
             # Mark job as complete
-            job.status = "completed"
             job.progress = 1.0
+            self._finish_job(job_id, "completed")
 
-            await self._notify_callbacks(job_id, "done", {
+            self._publish(job_id, "done", {
                 "junt_id": job_id,
                 "tracks": tracks_data,
+                "codec": codec.value,
+                "bitrate": bitrate,
                 "total_tracks": job.completed_tracks,
-                "errors": job.errors
+                "errors": list(job.errors or ())
             })
 
+        except asyncio.CancelledError:
+            self._finish_job(job_id, "cancelled")
+            self._publish(job_id, "cancelled", {"message": "Job cancelled"})
+            print(f"Job {job_id} cancelled")
+            self._discard_job_files(job_id, junt_dir, context)
+            raise
+
         except Exception as e:
-            job.status = "failed"
-            job.errors.append(f"Job failed: {str(e)}")
+            job.add_error(f"Job failed: {str(e)}")
+            self._finish_job(job_id, "failed")
 
-            await self._notify_callbacks(job_id, "error", {
+            self._publish(job_id, "error", {
                 "message": str(e)
             })
 
             print(f"Job {job_id} failed: {e}")
 
-            temp_dir = Path("temp")
-            for pattern in [f"{job_id}_track_*.mp3", f"{job_id}_clip_*.mp3"]:
-                for temp_file in temp_dir.glob(pattern):
-                    try:
-                        temp_file.unlink()
-                        print(f"Cleaned up temp file after job failure: {temp_file.name}")
-                    except Exception as cleanup_error:
-                        print(f"Error cleaning up {temp_file.name}: {cleanup_error}")
+            self._discard_job_files(job_id, junt_dir, context)
+
+    def _discard_job_files(self, job_id: str, junt_dir: Optional[Path], context: Optional["JobContext"]):
+        """Delete a failed or cancelled job's output; its workspace goes when _run_job ends."""
+        self._release_scratch(job_id)
+
+        # Downloads still leased by tracks that never reached the analyzer
+        if context is not None:
+            for work in context.works:
+                self._release_download(work)
+
+        if junt_dir is not None:
+            shutil.rmtree(junt_dir, ignore_errors=True)
 
 
 # Global job manager instance
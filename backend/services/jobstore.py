@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from api.schemas import JobStatus, AlbumDetail
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    mbid TEXT NOT NULL,
+    duration TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    bitrate TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    status_json TEXT NOT NULL,
+    album_json TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    owner TEXT,
+    requesters INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS tracks (
+    job_id TEXT NOT NULL,
+    track_index INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    artifact_key TEXT,
+    file_path TEXT,
+    loudness REAL,
+    clip_seconds REAL,
+    PRIMARY KEY (job_id, track_index)
+);
+"""
+
+# Job statuses that should be picked up again after a restart
+UNFINISHED = ("queued", "processing")
+
+
+class JobStore:
+    """
+    Job and per-track state in an embedded SQLite database, so unfinished jobs
+    can resume after a restart. Writes are small and infrequent (one per stage
+    transition), so they run inline.
+    """
+
+    def __init__(self, path: str, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.db: Optional[sqlite3.Connection] = None
+        if enabled:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.db.row_factory = sqlite3.Row
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+            columns = {row["name"] for row in self.db.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                self.db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "requesters" not in columns:
+                self.db.execute("ALTER TABLE jobs ADD COLUMN requesters INTEGER NOT NULL DEFAULT 1")
+
+    def create_job(
+        self,
+        job_id: str,
+        mbid: str,
+        duration: str,
+        codec: str,
+        bitrate: str,
+        priority: str,
+        status: JobStatus,
+        owner: Optional[str] = None
+    ):
+        if not self.enabled:
+            return
+        now = datetime.now().isoformat()
+        self.db.execute(
+            "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, ?, ?, ?, 1)",
+            (job_id, mbid, duration, codec, bitrate, priority, status.status, status.json(), now, now, owner)
+        )
+
+    def claim_job(self, job_id: str, owner: str, previous_owner: Optional[str]) -> bool:
+        """Take over an unfinished job if it still belongs to previous_owner; only one caller wins."""
+        if not self.enabled:
+            return False
+        cursor = self.db.execute(
+            "UPDATE jobs SET owner = ? WHERE job_id = ? AND owner IS ?",
+            (owner, job_id, previous_owner)
+        )
+        return cursor.rowcount == 1
+
+    def find_unfinished(self, mbid: str, duration: str, codec: str, bitrate: str) -> Optional[str]:
+        """Newest queued or running job for an identical request, whichever process created it."""
+        if not self.enabled:
+            return None
+        row = self.db.execute(
+            f"SELECT job_id FROM jobs WHERE mbid = ? AND duration = ? AND codec = ? AND bitrate = ? "
+            f"AND status IN ({', '.join('?' * len(UNFINISHED))}) ORDER BY created_at DESC LIMIT 1",
+            (mbid, duration, codec, bitrate, *UNFINISHED)
+        ).fetchone()
+        return row["job_id"] if row else None
+
+    def add_requester(self, job_id: str):
+        """Count another request attached to a job."""
+        if not self.enabled:
+            return
+        self.db.execute("UPDATE jobs SET requesters = requesters + 1 WHERE job_id = ?", (job_id,))
+
+    def release_requester(self, job_id: str) -> int:
+        """Detach one request from a job. Returns how many are still attached."""
+        if not self.enabled:
+            return 0
+        row = self.db.execute(
+            "UPDATE jobs SET requesters = MAX(requesters - 1, 0) WHERE job_id = ? RETURNING requesters",
+            (job_id,)
+        ).fetchone()
+        return row["requesters"] if row else 0
+
+    def update_status(self, job_id: str, status: JobStatus):
+        if not self.enabled:
+            return
+        self.db.execute(
+            "UPDATE jobs SET status = ?, status_json = ?, updated_at = ? WHERE job_id = ?",
+            (status.status, status.json(), datetime.now().isoformat(), job_id)
+        )
+
+    def save_album(self, job_id: str, album: AlbumDetail):
+        if not self.enabled:
+            return
+        self.db.execute("UPDATE jobs SET album_json = ? WHERE job_id = ?", (album.json(), job_id))
+
+    def save_track(
+        self,
+        job_id: str,
+        track_index: int,
+        stage: str,
+        artifact_key: Optional[str] = None,
+        file_path: Optional[str] = None,
+        loudness: Optional[float] = None,
+        clip_seconds: Optional[float] = None
+    ):
+        """Record the last stage a track completed ("downloaded", "analyzed", "encoded" or "failed")."""
+        if not self.enabled:
+            return
+        self.db.execute(
+            "INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (job_id, track_index) DO UPDATE SET "
+            "stage = excluded.stage, "
+            "artifact_key = COALESCE(excluded.artifact_key, artifact_key), "
+            "file_path = COALESCE(excluded.file_path, file_path), "
+            "loudness = COALESCE(excluded.loudness, loudness), "
+            "clip_seconds = COALESCE(excluded.clip_seconds, clip_seconds)",
+            (job_id, track_index, stage, artifact_key, file_path, loudness, clip_seconds)
+        )
+
+    def load_album(self, job_id: str) -> Optional[AlbumDetail]:
+        if not self.enabled:
+            return None
+        row = self.db.execute("SELECT album_json FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return AlbumDetail.parse_raw(row["album_json"]) if row and row["album_json"] else None
+
+    def load_tracks(self, job_id: str) -> Dict[int, dict]:
+        """Stored track rows keyed by track index."""
+        if not self.enabled:
+            return {}
+        rows = self.db.execute("SELECT * FROM tracks WHERE job_id = ?", (job_id,)).fetchall()
+        return {row["track_index"]: dict(row) for row in rows}
+
+    def load_status(self, job_id: str) -> Optional[JobStatus]:
+        if not self.enabled:
+            return None
+        row = self.db.execute("SELECT status_json FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return JobStatus.parse_raw(row["status_json"]) if row else None
+
+    def unfinished_jobs(self) -> List[dict]:
+        """Jobs that were queued or running when the process stopped, oldest first."""
+        if not self.enabled:
+            return []
+        rows = self.db.execute(
+            f"SELECT * FROM jobs WHERE status IN ({', '.join('?' * len(UNFINISHED))}) ORDER BY created_at",
+            UNFINISHED
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def prune(self, max_age_seconds: float) -> int:
+        """
+        Delete finished jobs, and their tracks, last updated longer ago than max_age_seconds.
+
+        Returns:
+            Number of jobs deleted
+        """
+        if not self.enabled:
+            return 0
+        cutoff = (datetime.now() - timedelta(seconds=max_age_seconds)).isoformat()
+        expired = f"SELECT job_id FROM jobs WHERE status NOT IN ({', '.join('?' * len(UNFINISHED))}) AND updated_at < ?"
+        self.db.execute(f"DELETE FROM tracks WHERE job_id IN ({expired})", (*UNFINISHED, cutoff))
+        cursor = self.db.execute(f"DELETE FROM jobs WHERE job_id IN ({expired})", (*UNFINISHED, cutoff))
+        return cursor.rowcount
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -5,6 +5,10 @@ import uuid
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
+from api.schemas import AudioCodec, AlbumDetail, Track
+from services.formats import get_output_format, codec_for_path
+from services.peaks import peaks_path_for
+from services.broadcast import hub, LIBRARY_TOPIC
 
 
 def get_library_dir() -> Path:
@@ -47,14 +51,29 @@ def write_library(library: Dict) -> None:
         json.dump(library, f, indent=2)
 
 
-async def save_montage(job_id: str, album: dict, duration_type: str, tracks: List[dict]) -> dict:
+async def save_montage(
+    job_id: str,
+    album: dict,
+    duration_type: str,
+    tracks: List[dict],
+    codec: Optional[str] = None,
+    bitrate: Optional[str] = None
+) -> dict:
     """
     Save a completed montage to the library.
     The junt directory with track files should already exist at ~/.junt/montages/{job_id}/
+    If codec is not given it is inferred from the track files.
+    Saving a job again (identical requests share one job) returns the
+    existing entry, so the directory is never listed twice.
     """
     # Use job_id as montage_id (since the directory is already created with job_id)
     montage_id = job_id
 
+    library = read_library()
+    for montage in library["montages"]:
+        if montage["id"] == montage_id:
+            return montage
+
     # Get montages directory
     montages_dir = get_montages_dir()
     junt_dir = montages_dir / montage_id
@@ -63,6 +82,12 @@ async def save_montage(job_id: str, album: dict, duration_type: str, tracks: Lis
     if not junt_dir.exists():
         raise FileNotFoundError(f"Junt directory not found: {junt_dir}")
 
+    if not codec:
+        known_paths = [t["file_path"] for t in tracks if t.get("file_path")]
+        codec = codec_for_path(known_paths[0]) if known_paths else None
+    codec = AudioCodec(codec or AudioCodec.MP3)
+    extension = get_output_format(codec)["extension"]
+
     # Ensure all tracks have file_path set
     tracks_with_paths = []
     for track in tracks:
@@ -71,7 +96,7 @@ async def save_montage(job_id: str, album: dict, duration_type: str, tracks: Lis
         if not track_copy.get("file_path"):
             track_number = track_copy.get("number")
             if track_number:
-                track_filename = f"track_{track_number:02d}.mp3"
+                track_filename = f"track_{track_number:02d}.{extension}"
                 track_copy["file_path"] = str(junt_dir / track_filename)
         tracks_with_paths.append(track_copy)
 
@@ -87,13 +112,15 @@ async def save_montage(job_id: str, album: dict, duration_type: str, tracks: Lis
         },
         "duration_type": duration_type,
         "tracks": tracks_with_paths,  # Store full track details with file paths
+        "codec": codec.value,
+        "bitrate": bitrate,
         "created_at": datetime.utcnow().isoformat()
     }
 
     # Add to library
-    library = read_library()
     library["montages"].append(montage_doc)
     write_library(library)
+    hub.publish(LIBRARY_TOPIC, {"type": "montage_saved", "data": {"id": montage_id}})
 
     return montage_doc
 
@@ -147,6 +174,30 @@ async def get_montage(montage_id: str) -> dict:
     raise ValueError("Montage not found")
 
 
+def montage_album(montage: dict) -> Optional[AlbumDetail]:
+    """
+    Album details for rendering a saved montage again, without a MusicBrainz
+    lookup. None if any saved track lacks its recording ID, since cached
+    downloads and envelopes are keyed by it.
+    """
+    tracks = montage.get("tracks", [])
+    if not tracks or not all(track.get("recording_id") for track in tracks):
+        return None
+
+    return AlbumDetail(
+        **montage["album"],
+        tracks=[
+            Track(
+                number=track["number"],
+                title=track["title"],
+                duration=track.get("duration"),
+                recording_id=track["recording_id"]
+            )
+            for track in tracks
+        ]
+    )
+
+
 async def delete_montage(montage_id: str) -> bool:
     """Delete a montage from library and filesystem."""
     library = read_library()
@@ -171,6 +222,7 @@ async def delete_montage(montage_id: str) -> bool:
     # Remove from library
     library["montages"] = [m for m in montages if m.get("id") != montage_id]
     write_library(library)
+    hub.publish(LIBRARY_TOPIC, {"type": "montage_deleted", "data": {"id": montage_id}})
 
     return True
 
@@ -190,3 +242,18 @@ async def get_track_file(montage_id: str, track_number: int) -> Optional[str]:
             raise FileNotFoundError(f"Track file not found: {file_path}")
 
     raise ValueError(f"Track {track_number} not found in montage {montage_id}")
+
+
+async def get_track_peaks_file(montage_id: str, track_number: int) -> str:
+    """Get the waveform peaks file stored next to a track in a montage."""
+    montage = await get_montage(montage_id)
+
+    for track in montage.get("tracks", []):
+        if track.get("number") == track_number:
+            file_path = track.get("file_path")
+            peaks_path = peaks_path_for(file_path) if file_path else None
+            if peaks_path and os.path.exists(peaks_path):
+                return peaks_path
+            raise FileNotFoundError(f"Peaks not found for track {track_number}")
+
+    raise ValueError(f"Track {track_number} not found in montage {montage_id}")
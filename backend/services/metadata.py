@@ -161,7 +161,8 @@ class MetadataService:
                     tracks.append(Track(
                         number=track_number,
                         title=recording.get('title', 'Unknown Track'),
-                        duration=duration
+                        duration=duration,
+                        recording_id=recording.get('id')
                     ))
                     track_number += 1
 
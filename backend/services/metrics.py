@@ -0,0 +1,227 @@
+import math
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds (seconds) for stage timing histograms
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base for metrics keyed by a fixed tuple of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """(suffix, formatted labels, value) for every series."""
+        return iter(())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield "", _format_labels(self.label_names, key), value
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down. Either set explicitly, or read at scrape
+    time from a collect function returning a number or {label tuple: number}.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        collect: Optional[Callable] = None
+    ):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    def samples(self):
+        values = self.values
+        if self.collect is not None:
+            collected = self.collect()
+            values = collected if isinstance(collected, dict) else {(): collected}
+        for key, value in values.items():
+            yield "", _format_labels(self.label_names, key), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = STAGE_BUCKETS
+    ):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.series: Dict[Tuple[str, ...], list] = {}  # Labels -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for key, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield "_bucket", _format_labels(self.label_names, key, le), cumulative
+            labels = _format_labels(self.label_names, key)
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+class MetricsRegistry:
+    """All metrics of the process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def _add(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = (), collect: Optional[Callable] = None) -> Gauge:
+        return self._add(Gauge(name, help_text, labels, collect))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = STAGE_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def directory_bytes(path: str) -> int:
+    """Total size of the files under a directory; blocking, run it off the event loop."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # Deleted while walking
+    return total
+
+
+registry = MetricsRegistry()
+
+track_stage_seconds = registry.histogram(
+    "junt_track_stage_seconds",
+    "Time one track spent in each processing step",
+    ("stage",)
+)
+job_seconds = registry.histogram(
+    "junt_job_seconds",
+    "Time from a job starting to run until it finished",
+    ("status",),
+    buckets=(5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0)
+)
+jobs_total = registry.counter("junt_jobs_total", "Jobs finished, by final status", ("status",))
+track_failures_total = registry.counter("junt_track_failures_total", "Tracks that failed, by the stage they failed in", ("stage",))
+cache_requests_total = registry.counter(
+    "junt_artifact_cache_requests_total",
+    "Artifact cache lookups by artifact and result (hit, shared, miss)",
+    ("artifact", "result")
+)
+prefetch_total = registry.counter(
+    "junt_prefetch_downloads_total",
+    "Speculatively prefetched downloads by outcome (fetched, adopted by a job, discarded unused)",
+    ("result",)
+)
+active_jobs = registry.gauge("junt_active_jobs", "Jobs currently running")
+queued_jobs = registry.gauge("junt_queued_jobs", "Jobs waiting for the scheduler")
+stage_queue_depth = registry.gauge("junt_stage_queue_depth", "Tracks waiting in front of each pipeline stage, over all jobs", ("stage",))
+stage_active = registry.gauge("junt_stage_active", "Tracks being worked on in each pipeline stage, over all jobs", ("stage",))
+temp_dir_bytes = registry.gauge("junt_temp_dir_bytes", "Bytes used under TEMP_DIR, including job workspaces")
+workspace_bytes = registry.gauge("junt_workspace_bytes", "Bytes used by running jobs' workspaces")
+compute_worker_rss_bytes = registry.gauge("junt_compute_worker_rss_bytes", "Resident memory of each compute pool worker process and its subprocesses", ("pid",))
+compute_workers_busy = registry.gauge("junt_compute_workers_busy", "Compute pool workers running a task")
+compute_recycles_total = registry.counter(
+    "junt_compute_recycles_total",
+    "Compute pool workers replaced, by reason (max_tasks, memory, cancelled, crashed)",
+    ("reason",)
+)
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """
+    Time a block into the stage histogram and a track's timings dict. Blocks
+    that raise (failures, cancellation) aren't recorded.
+    """
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    timings[stage] = timings.get(stage, 0.0) + elapsed
+    track_stage_seconds.observe(elapsed, stage=stage)
@@ -0,0 +1,581 @@
+import io
+import struct
+import logging
+import numpy as np
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# MPEG audio Layer III tables
+BITRATES_MPEG1 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+BITRATES_MPEG2 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+
+# Samples every mp3 decoder outputs before the first real sample (528 + 1)
+DECODER_DELAY = 529
+
+# Encoder delay of LAME, used as a first guess when planning a seam encode
+LAME_ENCODER_DELAY = 576
+
+# Frames decoded ahead of a seam so the bit reservoir is filled
+WARMUP_FRAMES = 2
+
+XING_FLAG_FRAMES = 0x01
+XING_FLAG_BYTES = 0x02
+XING_FLAG_TOC = 0x04
+XING_FLAG_QUALITY = 0x08
+
+
+def _crc16(data: bytes) -> int:
+    """CRC-16/ARC, as used by the LAME info tag."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+# Largest main_data_begin a Layer III frame can express (MPEG-1: 9 bits)
+MAX_RESERVOIR = 511
+
+
+class Mp3Frame:
+    __slots__ = ("offset", "length", "bitrate", "main_data_begin", "data_offset")
+
+    def __init__(self, offset: int, length: int, bitrate: int, main_data_begin: int, data_offset: int):
+        self.offset = offset
+        self.length = length
+        self.bitrate = bitrate
+        self.main_data_begin = main_data_begin
+        self.data_offset = data_offset  # start of main data, after header/CRC/side info
+
+    @property
+    def data_length(self) -> int:
+        return self.offset + self.length - self.data_offset
+
+
+class Mp3Stream:
+    """
+    A parsed MPEG Layer III file: its audio frames plus the gapless
+    information (encoder delay/padding) from the Xing/Info + LAME tag.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.frames: List[Mp3Frame] = []
+        self.sample_rate = 0
+        self.channels = 0
+        self.version = 0
+        self.samples_per_frame = 0
+        self.tag_frame: Optional[Mp3Frame] = None
+        self.xing_offset: Optional[int] = None
+        self.lame_offset: Optional[int] = None
+        self.enc_delay: Optional[int] = None
+        self.enc_padding: Optional[int] = None
+        self._parse()
+
+    @staticmethod
+    def _parse_header(data: bytes, pos: int) -> Optional[dict]:
+        if pos + 4 > len(data):
+            return None
+        b0, b1, b2, b3 = data[pos:pos + 4]
+        if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+            return None
+
+        version = (b1 >> 3) & 0x03
+        layer = (b1 >> 1) & 0x03
+        bitrate_index = b2 >> 4
+        sample_rate_index = (b2 >> 2) & 0x03
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+            # Reserved version, not Layer III, free-format or invalid values
+            return None
+
+        mpeg1 = version == 3
+        bitrate = (BITRATES_MPEG1 if mpeg1 else BITRATES_MPEG2)[bitrate_index]
+        sample_rate = SAMPLE_RATES[version][sample_rate_index]
+        padding = (b2 >> 1) & 0x01
+        mono = (b3 >> 6) == 3
+
+        if mpeg1:
+            length = 144000 * bitrate // sample_rate + padding
+            side_info = 17 if mono else 32
+        else:
+            length = 72000 * bitrate // sample_rate + padding
+            side_info = 9 if mono else 17
+
+        return {
+            "version": version,
+            "bitrate": bitrate,
+            "sample_rate": sample_rate,
+            "channels": 1 if mono else 2,
+            "length": length,
+            "side_info_offset": 4 if b1 & 0x01 else 6,  # CRC follows the header when protected
+            "side_info": side_info,
+            "samples": 1152 if mpeg1 else 576,
+        }
+
+    def _skip_id3v2(self) -> int:
+        data = self.data
+        if len(data) >= 10 and data[:3] == b"ID3":
+            size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+            footer = 10 if data[5] & 0x10 else 0
+            return 10 + size + footer
+        return 0
+
+    def _parse(self):
+        data = self.data
+        end = len(data)
+        if end >= 128 and data[end - 128:end - 125] == b"TAG":
+            end -= 128
+
+        pos = self._skip_id3v2()
+        while pos + 4 <= end:
+            header = self._parse_header(data, pos)
+            if header is None or pos + header["length"] > end:
+                # Lost sync; scan forward for the next plausible header
+                pos += 1
+                continue
+
+            if not self.frames and self.tag_frame is None:
+                self.version = header["version"]
+                self.sample_rate = header["sample_rate"]
+                self.channels = header["channels"]
+                self.samples_per_frame = header["samples"]
+            elif header["sample_rate"] != self.sample_rate or header["version"] != self.version:
+                # Garbage that happens to look like a header
+                pos += 1
+                continue
+
+            side_info_start = pos + header["side_info_offset"]
+            if header["version"] == 3:
+                main_data_begin = (data[side_info_start] << 1) | (data[side_info_start + 1] >> 7)
+            else:
+                main_data_begin = data[side_info_start]
+
+            frame = Mp3Frame(
+                pos,
+                header["length"],
+                header["bitrate"],
+                main_data_begin,
+                side_info_start + header["side_info"]
+            )
+
+            if not self.frames and self.tag_frame is None and self._read_info_tag(frame, header):
+                self.tag_frame = frame
+            else:
+                self.frames.append(frame)
+
+            pos += header["length"]
+
+        if not self.frames:
+            raise ValueError("No MPEG Layer III frames found")
+
+    def _read_info_tag(self, frame: Mp3Frame, header: dict) -> bool:
+        data = self.data
+        xing = frame.data_offset
+        if data[xing:xing + 4] not in (b"Xing", b"Info"):
+            return False
+
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        lame = xing + 8
+        lame += 4 if flags & XING_FLAG_FRAMES else 0
+        lame += 4 if flags & XING_FLAG_BYTES else 0
+        lame += 100 if flags & XING_FLAG_TOC else 0
+        lame += 4 if flags & XING_FLAG_QUALITY else 0
+
+        self.xing_offset = xing
+        if lame + 36 <= frame.offset + frame.length and all(32 <= c < 127 for c in data[lame:lame + 4]):
+            self.lame_offset = lame
+            packed = data[lame + 21:lame + 24]
+            self.enc_delay = (packed[0] << 4) | (packed[1] >> 4)
+            self.enc_padding = ((packed[1] & 0x0F) << 8) | packed[2]
+        return True
+
+    @property
+    def has_gapless_info(self) -> bool:
+        return self.enc_delay is not None
+
+    @property
+    def delay(self) -> int:
+        """Samples of decoder output preceding the first real sample."""
+        return (self.enc_delay or 0) + DECODER_DELAY
+
+    @property
+    def length(self) -> int:
+        """Number of real (gapless) samples in the stream."""
+        total = len(self.frames) * self.samples_per_frame
+        return total - (self.enc_delay or 0) - (self.enc_padding or 0)
+
+    def frame_bytes(self, start: int, stop: int) -> bytes:
+        return b"".join(
+            self.data[f.offset:f.offset + f.length] for f in self.frames[start:stop]
+        )
+
+    def reservoir_tail(self, index: int) -> bytes:
+        """
+        Main data that frames from ``index`` on borrow from earlier frames
+        through the bit reservoir.
+        """
+        needed = 0
+        span = 0
+        for frame in self.frames[index:]:
+            needed = max(needed, frame.main_data_begin - span)
+            span += frame.data_length
+            if span >= MAX_RESERVOIR:
+                break
+
+        parts = []
+        for frame in reversed(self.frames[:index]):
+            if needed <= 0:
+                break
+            take = min(needed, frame.data_length)
+            end = frame.offset + frame.length
+            parts.append(self.data[end - take:end])
+            needed -= take
+        return bytes(max(needed, 0)) + b"".join(reversed(parts))
+
+    def main_data_length(self, frame: Mp3Frame) -> int:
+        """Bytes of main data the frame itself uses (sum of part2_3_length)."""
+        mpeg1 = self.version == 3
+        mono = self.channels == 1
+        side_len = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+        side_info = int.from_bytes(self.data[frame.data_offset - side_len:frame.data_offset], "big")
+        total_bits = side_len * 8
+
+        def read(pos: int, width: int) -> int:
+            return (side_info >> (total_bits - pos - width)) & ((1 << width) - 1)
+
+        bits = 0
+        if mpeg1:
+            pos = 9 + (5 if mono else 3) + 4 * self.channels
+            for _ in range(2 * self.channels):
+                bits += read(pos, 12)
+                pos += 59
+        else:
+            pos = 8 + (1 if mono else 2)
+            for _ in range(self.channels):
+                bits += read(pos, 12)
+                pos += 63
+        return (bits + 7) // 8
+
+    def with_reservoir(self, frame: Mp3Frame, tail: bytes) -> Optional[bytes]:
+        """
+        Rebuild a reservoir-free frame at the highest bitrate with ``tail``
+        stored after its own main data, so the next frame can borrow it.
+
+        Returns None if the tail doesn't fit.
+        """
+        header = bytearray(self.data[frame.offset:frame.offset + 4])
+        if not header[1] & 0x01 or frame.main_data_begin != 0:
+            return None
+
+        header[2] = (14 << 4) | (header[2] & 0x0D)  # top bitrate index, no padding slot
+        length = self._parse_header(bytes(header), 0)["length"]
+        side_info = self.data[frame.offset + 4:frame.data_offset]
+        own = self.main_data_length(frame)
+        free = length - len(header) - len(side_info) - own
+        if len(tail) > free:
+            return None
+
+        main_data = self.data[frame.data_offset:frame.data_offset + own]
+        return bytes(header) + side_info + main_data + bytes(free - len(tail)) + tail
+
+    def decode(self, start: int, stop: int) -> np.ndarray:
+        """
+        Decode gapless samples [start, stop) as float32 (samples, channels).
+
+        Only the frames covering the range (plus a few warm-up frames for the
+        bit reservoir) are decoded. Samples outside the stream are zero.
+        """
+        spf = self.samples_per_frame
+        out = np.zeros((max(stop - start, 0), self.channels), dtype=np.float32)
+        lo, hi = max(start, 0), min(stop, self.length)
+        if hi <= lo:
+            return out
+
+        first_position = lo + self.delay
+        first_frame = max(first_position // spf - WARMUP_FRAMES, 0)
+        last_frame = min(-(-(hi + self.delay) // spf), len(self.frames))
+
+        from pydub import AudioSegment
+
+        segment = AudioSegment.from_file(
+            io.BytesIO(self.frame_bytes(first_frame, last_frame)),
+            format="mp3"
+        )
+        pcm = np.array(segment.get_array_of_samples(), dtype=np.float32)
+        pcm = pcm.reshape(-1, segment.channels) / float(1 << (8 * segment.sample_width - 1))
+        if segment.channels != self.channels:
+            pcm = np.repeat(pcm.mean(axis=1, keepdims=True), self.channels, axis=1)
+
+        skip = first_position - first_frame * spf
+        pcm = pcm[skip:skip + (hi - lo)]
+        out[lo - start:lo - start + len(pcm)] = pcm
+        return out
+
+
+def _encode_seam(
+    pcm: np.ndarray,
+    sample_rate: int,
+    bitrate: int
+) -> Mp3Stream:
+    """Encode PCM without the bit reservoir so every frame is self-contained."""
+    from pydub import AudioSegment
+
+    samples = (np.clip(pcm, -1.0, 1.0) * 32767).astype("<i2")
+    segment = AudioSegment(
+        data=samples.tobytes(),
+        sample_width=2,
+        frame_rate=sample_rate,
+        channels=pcm.shape[1]
+    )
+    buffer = io.BytesIO()
+    segment.export(buffer, format="mp3", bitrate=f"{bitrate}k", parameters=["-reservoir", "0"])
+    seam = Mp3Stream(buffer.getvalue())
+    if not seam.has_gapless_info:
+        raise ValueError("Seam encoder did not report its encoder delay")
+    return seam
+
+
+def _seam_prefix(encoder_delay: int, spf: int) -> int:
+    """Priming length that puts the seam start on an encoded frame boundary."""
+    prefix = 2 * spf
+    return prefix + (-(prefix + encoder_delay + DECODER_DELAY)) % spf
+
+
+def _crossfade_samples(wanted: int, base: int, limit: int, spf: int) -> int:
+    """
+    Pick the crossfade length closest to ``wanted`` that keeps the next
+    clip's frames aligned with the output frame grid (within half a frame).
+    """
+    residue = base % spf
+    candidate = residue + round((wanted - residue) / spf) * spf
+    if candidate <= 0:
+        candidate += spf
+    if candidate > limit:
+        candidate -= spf
+    if candidate <= 0:
+        raise ValueError("Clips too short for a frame-aligned crossfade")
+    return candidate
+
+
+def _build_info_tag(first: Mp3Stream, audio: bytes, frame_count: int, frame_sizes: List[int], padding: int) -> bytes:
+    """Rewrite the first clip's Xing/Info + LAME tag for the spliced stream."""
+    tag = first.tag_frame
+    frame = bytearray(first.data[tag.offset:tag.offset + tag.length])
+    xing = first.xing_offset - tag.offset
+    total_bytes = len(frame) + len(audio)
+
+    if len(set(frame_sizes)) > 1:
+        frame[xing:xing + 4] = b"Xing"
+
+    flags = struct.unpack(">I", frame[xing + 4:xing + 8])[0]
+    pos = xing + 8
+    if flags & XING_FLAG_FRAMES:
+        frame[pos:pos + 4] = struct.pack(">I", frame_count)
+        pos += 4
+    if flags & XING_FLAG_BYTES:
+        frame[pos:pos + 4] = struct.pack(">I", total_bytes)
+        pos += 4
+    if flags & XING_FLAG_TOC:
+        offsets = np.concatenate(([0], np.cumsum(frame_sizes))) + len(frame)
+        for i in range(100):
+            frame[pos + i] = min(255, int(offsets[i * frame_count // 100]) * 256 // total_bytes)
+
+    if first.lame_offset is not None:
+        lame = first.lame_offset - tag.offset
+        delay = first.enc_delay
+        frame[lame + 21:lame + 24] = bytes([
+            delay >> 4,
+            ((delay & 0x0F) << 4) | (padding >> 8),
+            padding & 0xFF
+        ])
+        frame[lame + 28:lame + 32] = struct.pack(">I", total_bytes)
+        frame[lame + 32:lame + 34] = struct.pack(">H", _crc16(audio))
+        frame[lame + 34:lame + 36] = struct.pack(">H", _crc16(bytes(frame[:lame + 34])))
+
+    return bytes(frame)
+
+
+def _render_seam(
+    outgoing: Mp3Stream,
+    incoming: Mp3Stream,
+    outgoing_offset: int,
+    incoming_offset: int,
+    fade: int,
+    lead: int,
+    seam_start: int,
+    seam_end: int,
+    bitrate: Optional[int] = None
+) -> Tuple[Mp3Stream, List[Mp3Frame]]:
+    """
+    Crossfade the two clips in PCM and encode output frames
+    [seam_start, seam_end), aligned to the output frame grid, at the
+    clips' bitrate unless another is given.
+    """
+    spf = outgoing.samples_per_frame
+    bitrate = bitrate or max(outgoing.frames[0].bitrate, incoming.frames[0].bitrate)
+    encoder_delay = LAME_ENCODER_DELAY
+
+    for _ in range(2):
+        prefix = _seam_prefix(encoder_delay, spf)
+        region_start = seam_start * spf - lead - prefix
+        region_stop = seam_end * spf - lead + 2 * spf
+
+        tail = outgoing.decode(region_start - outgoing_offset, outgoing.length)
+        head = incoming.decode(0, region_stop - incoming_offset)
+        tail[len(tail) - fade:] *= np.linspace(1.0, 0.0, fade, dtype=np.float32)[:, None]
+        head[:fade] *= np.linspace(0.0, 1.0, fade, dtype=np.float32)[:, None]
+
+        pcm = np.zeros((region_stop - region_start, outgoing.channels), dtype=np.float32)
+        pcm[:len(tail)] += tail
+        pcm[incoming_offset - region_start:] += head
+
+        seam = _encode_seam(pcm, outgoing.sample_rate, bitrate)
+        if seam.enc_delay == encoder_delay:
+            break
+        # Encoder delay differed from the guess; re-plan the priming once
+        encoder_delay = seam.enc_delay
+    else:
+        raise ValueError("Seam encoder delay is unstable")
+
+    skip = (prefix + seam.delay) // spf
+    if skip + seam_end - seam_start > len(seam.frames):
+        raise ValueError("Seam encode produced too few frames")
+    return seam, seam.frames[skip:skip + seam_end - seam_start]
+
+
+def _lean_bitrate(stream: Mp3Stream, bitrate: int) -> int:
+    """
+    Bitrate for a seam frame that must carry a full reservoir tail: at most
+    half the clips' rate, so rebuilt at the top bitrate it has room for
+    MAX_RESERVOIR bytes even when the clips are already at the top rate.
+    """
+    table = BITRATES_MPEG1 if stream.version == 3 else BITRATES_MPEG2
+    return max(rate for rate in table[1:] if rate <= bitrate // 2 or rate == table[1])
+
+
+def splice_with_crossfades(
+    clip_paths: List[str],
+    output_path: str,
+    crossfade_duration: float,
+    bitrate: Optional[int] = None
+) -> str:
+    """
+    Concatenate MP3 clips by copying their frames unchanged and re-encoding
+    only the frames around each crossfade.
+
+    Each crossfade is nudged by less than half a frame so the following
+    clip's frames land on the output frame grid. Seam frames are encoded
+    without the bit reservoir; the last one is rebuilt at a higher bitrate
+    to carry the reservoir bytes the first copied frame after it expects.
+    When the clips' own rate leaves no room for them (e.g. 320 kbps clips),
+    that one frame comes from a leaner encode of the same seam.
+    Gapless delay/padding is carried over into the output's LAME tag.
+
+    Args:
+        bitrate: Required bitrate in kbps; the copied frames keep the clips'
+            own bitrate, so clips encoded at any other rate are refused
+
+    Raises:
+        ValueError: If the clips can't be spliced at the frame level
+            (missing gapless info, mismatched formats or bitrate, clips too short)
+    """
+    streams = []
+    for path in clip_paths:
+        with open(path, "rb") as f:
+            streams.append(Mp3Stream(f.read()))
+
+    first = streams[0]
+    spf = first.samples_per_frame
+    for stream in streams:
+        if not stream.has_gapless_info:
+            raise ValueError("Clip has no LAME tag with encoder delay/padding")
+        if (stream.sample_rate, stream.version, stream.channels) != (first.sample_rate, first.version, first.channels):
+            raise ValueError("Clips differ in sample rate, MPEG version or channel count")
+        if bitrate and any(frame.bitrate != bitrate for frame in stream.frames):
+            raise ValueError(f"Clip is not encoded at the requested {bitrate} kbps")
+
+    lead = first.delay  # decoder samples before the first real output sample
+    wanted = int(crossfade_duration * first.sample_rate)
+    spare_frames = 4    # extra seam frames to find room for the reservoir tail
+
+    chunks: List[bytes] = []
+
+    def copy_frames(stream: Mp3Stream, start: int, stop: int):
+        if stop < start:
+            raise ValueError("Crossfade seams overlap; clip too short")
+        chunks.extend(stream.data[f.offset:f.offset + f.length] for f in stream.frames[start:stop])
+
+    current = first
+    offset = 0   # output sample where the current clip starts
+    shift = 0    # output frame index minus current clip frame index
+    cursor = 0   # next frame of the current clip to copy
+
+    for following in streams[1:]:
+        limit = min(current.length, following.length)
+        fade = _crossfade_samples(wanted, offset + current.length + lead - following.delay, limit, spf)
+        next_offset = offset + current.length - fade
+        next_shift = (next_offset + lead - following.delay) // spf
+
+        # Output frames [seam_start, seam_end) get re-encoded
+        seam_start = (next_offset + lead) // spf
+        seam_end = -(-(next_offset + fade + lead) // spf)
+        seam_limit = min(seam_end + spare_frames, len(following.frames) + next_shift)
+        if seam_end > seam_limit:
+            raise ValueError("Clip too short to splice after a crossfade")
+
+        copy_frames(current, cursor, seam_start - shift)
+        seam, seam_frames = _render_seam(
+            current, following, offset, next_offset, fade, lead, seam_start, seam_limit
+        )
+
+        # End the seam where its last frame can hold the reservoir bytes
+        # that the next copied frame borrows
+        lean = None
+        for end in range(seam_end, seam_limit + 1):
+            last_frame = seam_frames[end - seam_start - 1]
+            if end - next_shift == len(following.frames):
+                last = seam.data[last_frame.offset:last_frame.offset + last_frame.length]
+                break
+            tail = following.reservoir_tail(end - next_shift)
+            last = seam.with_reservoir(last_frame, tail)
+            if last is None:
+                if lean is None:
+                    lean = _render_seam(
+                        current, following, offset, next_offset, fade, lead, seam_start, seam_limit,
+                        bitrate=_lean_bitrate(seam, seam_frames[0].bitrate)
+                    )
+                lean_stream, lean_frames = lean
+                last = lean_stream.with_reservoir(lean_frames[end - seam_start - 1], tail)
+            if last is not None:
+                break
+        else:
+            raise ValueError("No room for the bit reservoir after a seam")
+
+        chunks.extend(seam.data[f.offset:f.offset + f.length] for f in seam_frames[:end - seam_start - 1])
+        chunks.append(last)
+
+        current, offset, shift, cursor = following, next_offset, next_shift, end - next_shift
+
+    copy_frames(current, cursor, len(current.frames))
+
+    audio = b"".join(chunks)
+    frame_sizes = [len(chunk) for chunk in chunks]
+    total_samples = offset + current.length
+    padding = len(chunks) * spf - first.enc_delay - total_samples
+    if not 0 <= padding < 4096:
+        raise ValueError(f"Spliced stream has invalid padding: {padding}")
+
+    with open(output_path, "wb") as f:
+        if first.tag_frame is not None:
+            f.write(_build_info_tag(first, audio, len(chunks), frame_sizes, padding))
+        f.write(audio)
+
+    logger.info(f"Spliced {len(clip_paths)} clips at frame level -> {output_path}")
+    return output_path
@@ -0,0 +1,160 @@
+import os
+import struct
+import numpy as np
+from typing import List, Sequence
+
+# Peaks file layout (little-endian):
+#   header:  magic "JPKS", version u8, bits u8 (8 or 16), reserved u16,
+#            sample_rate u32, length u32 (samples), level count u16
+#   levels:  samples_per_bucket u32, bucket count u32   (one per level)
+#   data:    interleaved min/max as int8 or int16        (one block per level)
+PEAKS_MAGIC = b"JPKS"
+PEAKS_VERSION = 1
+PEAKS_EXTENSION = ".peaks"
+HEADER = struct.Struct("<4sBBHIIH")
+LEVEL = struct.Struct("<II")
+
+# Samples per bucket for each resolution, finest first (each a multiple of the first)
+DEFAULT_LEVELS = (256, 1024, 4096)
+
+
+def peaks_path_for(audio_path: str) -> str:
+    """Path of the peaks file stored next to an audio file."""
+    return os.path.splitext(audio_path)[0] + PEAKS_EXTENSION
+
+
+def _reduce(values: np.ndarray, size: int, reducer) -> np.ndarray:
+    buckets = -(-len(values) // size)
+    padded = np.pad(values, (0, buckets * size - len(values)), mode="edge")
+    return reducer(padded.reshape(buckets, size), axis=1)
+
+
+def compute_peaks(
+    samples: np.ndarray,
+    rate: int,
+    bits: int = 8,
+    levels: Sequence[int] = DEFAULT_LEVELS
+) -> dict:
+    """
+    Compute multi-resolution min/max peaks from decoded PCM.
+
+    Args:
+        samples: Float samples shaped (samples, channels) or (samples,)
+        rate: Sample rate
+        bits: 8 or 16 bit peak values
+        levels: Samples per bucket for each resolution, finest first
+
+    Returns:
+        Dict with sample_rate, length, bits and levels as
+        (samples_per_bucket, mins, maxs) tuples
+    """
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    dtype = np.int8 if bits == 8 else np.int16
+    scale = np.iinfo(dtype).max
+
+    result = {"sample_rate": rate, "length": len(samples), "bits": bits, "levels": []}
+    if len(samples) == 0:
+        return result
+
+    # Finest level straight from the samples, coarser levels from the finest
+    finest = levels[0]
+    mins = _reduce(samples.min(axis=1), finest, np.min)
+    maxs = _reduce(samples.max(axis=1), finest, np.max)
+
+    for samples_per_bucket in levels:
+        factor = samples_per_bucket // finest
+        level_mins = _reduce(mins, factor, np.min) if factor > 1 else mins
+        level_maxs = _reduce(maxs, factor, np.max) if factor > 1 else maxs
+        result["levels"].append((
+            samples_per_bucket,
+            np.clip(np.round(level_mins * scale), -scale, scale).astype(dtype),
+            np.clip(np.round(level_maxs * scale), -scale, scale).astype(dtype),
+        ))
+    return result
+
+
+def concat_peaks(peaks_list: List[dict], crossfade_samples: int) -> dict:
+    """
+    Combine clip peaks into montage peaks, overlapping consecutive clips by
+    the crossfade. Overlapping buckets keep the wider min/max.
+
+    Raises:
+        ValueError: If the clips' sample rates, bit depths or levels differ
+    """
+    first = peaks_list[0]
+    for peaks in peaks_list:
+        layout = [level[0] for level in peaks["levels"]]
+        if (peaks["sample_rate"], peaks["bits"], layout) != (
+            first["sample_rate"], first["bits"], [level[0] for level in first["levels"]]
+        ):
+            raise ValueError("Clip peaks differ in sample rate, bit depth or levels")
+
+    starts = []
+    position = 0
+    for i, peaks in enumerate(peaks_list):
+        if i:
+            position -= min(crossfade_samples, peaks["length"], peaks_list[i - 1]["length"])
+        starts.append(position)
+        position += peaks["length"]
+
+    result = {"sample_rate": first["sample_rate"], "length": position, "bits": first["bits"], "levels": []}
+    for index, (samples_per_bucket, _, _) in enumerate(first["levels"]):
+        buckets = -(-position // samples_per_bucket)
+        mins = np.zeros(buckets, dtype=first["levels"][index][1].dtype)
+        maxs = np.zeros(buckets, dtype=mins.dtype)
+        for start, peaks in zip(starts, peaks_list):
+            _, clip_mins, clip_maxs = peaks["levels"][index]
+            begin = start // samples_per_bucket
+            end = min(begin + len(clip_mins), buckets)
+            mins[begin:end] = np.minimum(mins[begin:end], clip_mins[:end - begin])
+            maxs[begin:end] = np.maximum(maxs[begin:end], clip_maxs[:end - begin])
+        result["levels"].append((samples_per_bucket, mins, maxs))
+    return result
+
+
+def write_peaks(path: str, peaks: dict) -> str:
+    """Write peaks to a compact binary file."""
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(
+            PEAKS_MAGIC,
+            PEAKS_VERSION,
+            peaks["bits"],
+            0,
+            peaks["sample_rate"],
+            peaks["length"],
+            len(peaks["levels"])
+        ))
+        for samples_per_bucket, mins, _ in peaks["levels"]:
+            f.write(LEVEL.pack(samples_per_bucket, len(mins)))
+        for _, mins, maxs in peaks["levels"]:
+            interleaved = np.empty(len(mins) * 2, dtype=mins.dtype.newbyteorder("<"))
+            interleaved[0::2] = mins
+            interleaved[1::2] = maxs
+            f.write(interleaved.tobytes())
+    return path
+
+
+def read_peaks(path: str) -> dict:
+    """Read a peaks file written by write_peaks."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    magic, version, bits, _, rate, length, level_count = HEADER.unpack_from(data, 0)
+    if magic != PEAKS_MAGIC or version != PEAKS_VERSION:
+        raise ValueError(f"Not a peaks file: {path}")
+
+    dtype = np.dtype("<i1" if bits == 8 else "<i2")
+    offset = HEADER.size
+    layout = []
+    for _ in range(level_count):
+        layout.append(LEVEL.unpack_from(data, offset))
+        offset += LEVEL.size
+
+    levels = []
+    for samples_per_bucket, buckets in layout:
+        values = np.frombuffer(data, dtype=dtype, count=buckets * 2, offset=offset)
+        levels.append((samples_per_bucket, values[0::2], values[1::2]))
+        offset += buckets * 2 * dtype.itemsize
+
+    return {"sample_rate": rate, "length": length, "bits": bits, "levels": levels}
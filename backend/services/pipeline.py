@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tells a stage worker there is no more work
+_STOP = object()
+
+
+class PipelineStage:
+    """A pipeline step with its own bounded input queue and worker pool."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[Optional[Any]]],
+        concurrency: int = 1,
+        queue_size: int = 0
+    ):
+        """
+        Args:
+            name: Stage name, used in status reports
+            handler: Coroutine taking an item and returning the item for the
+                next stage, or None to drop it (e.g. after a failure)
+            concurrency: Number of workers for this stage
+            queue_size: Max items waiting for this stage (0 = unbounded)
+        """
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(0, queue_size))
+        self.active = 0
+        self.done = 0
+
+    def status(self) -> Dict[str, int]:
+        return {
+            # Stop markers aren't work
+            "queued": sum(1 for item in self.queue._queue if item is not _STOP),
+            "active": self.active,
+            "done": self.done,
+            "workers": self.concurrency,
+        }
+
+
+class TrackPipeline:
+    """
+    Runs items through a chain of stages. Each item moves on as soon as its
+    stage finishes it, so a slow item never holds back the others. Bounded
+    queues make a stage block when the next one falls behind.
+    """
+
+    def __init__(self, stages: List[PipelineStage]):
+        self.stages = stages
+        self.results: List[Any] = []
+
+    async def _worker(self, index: int):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            item = await stage.queue.get()
+            if item is _STOP:
+                return
+
+            stage.active += 1
+            try:
+                result = await stage.handler(item)
+            except Exception as e:
+                logger.error(f"Pipeline stage {stage.name} failed: {e}", exc_info=True)
+                result = None
+            finally:
+                stage.active -= 1
+                stage.done += 1
+
+            if result is None:
+                continue
+            if next_stage is not None:
+                await next_stage.queue.put(result)
+            else:
+                self.results.append(result)
+
+    async def run(self, items: Iterable[Any]) -> List[Any]:
+        """
+        Feed items through every stage and wait until all are finished.
+
+        Returns:
+            Items that made it through the last stage, in completion order
+        """
+        workers = [
+            [asyncio.create_task(self._worker(i)) for _ in range(stage.concurrency)]
+            for i, stage in enumerate(self.stages)
+        ]
+
+        try:
+            for item in items:
+                await self.stages[0].queue.put(item)
+
+            # Stop each stage once everything upstream has drained into it
+            for stage, stage_workers in zip(self.stages, workers):
+                for _ in stage_workers:
+                    await stage.queue.put(_STOP)
+                await asyncio.gather(*stage_workers)
+        finally:
+            # Also reached when the job is cancelled: stop every worker and
+            # wait until their handlers have unwound (slots released etc.)
+            tasks = [task for stage_workers in workers for task in stage_workers]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return self.results
+
+    def status(self) -> Dict[str, Dict[str, int]]:
+        """Queue depth, busy workers and finished items per stage."""
+        return {stage.name: stage.status() for stage in self.stages}
@@ -2,6 +2,12 @@ import uuid
 from datetime import datetime
 from typing import List, Dict, Optional
 from services.library import read_library, write_library, get_montage
+from services.broadcast import hub, PLAYLISTS_TOPIC
+
+
+def _announce(event: str, playlist_id: str):
+    """Tell playlist subscribers on the multiplexed WebSocket what changed."""
+    hub.publish(PLAYLISTS_TOPIC, {"type": event, "data": {"id": playlist_id}})
 
 
 def get_playlists(page: int = 1, page_size: int = 50, skip: int = None, limit: int = None) -> dict:
@@ -59,6 +65,7 @@ async def create_playlist(name: str, description: Optional[str] = None) -> Dict:
 
     library["playlists"].append(playlist)
     write_library(library)
+    _announce("playlist_created", playlist_id)
 
     return playlist
 
@@ -94,6 +101,7 @@ async def update_playlist(
             playlist["updated_at"] = datetime.utcnow().isoformat()
             library["playlists"][i] = playlist
             write_library(library)
+            _announce("playlist_updated", playlist_id)
             return playlist
 
     raise ValueError("Playlist not found")
@@ -112,6 +120,7 @@ async def delete_playlist(playlist_id: str) -> bool:
 
     library["playlists"] = updated_playlists
     write_library(library)
+    _announce("playlist_deleted", playlist_id)
 
     return True
 
@@ -146,6 +155,7 @@ async def add_track_to_playlist(
             playlist["updated_at"] = datetime.utcnow().isoformat()
             library["playlists"][i] = playlist
             write_library(library)
+            _announce("playlist_updated", playlist_id)
 
             return playlist
 
@@ -174,6 +184,7 @@ async def add_junt_to_playlist(playlist_id: str, junt_id: str) -> Dict:
             playlist["updated_at"] = datetime.utcnow().isoformat()
             library["playlists"][i] = playlist
             write_library(library)
+            _announce("playlist_updated", playlist_id)
 
             return playlist
 
@@ -196,6 +207,7 @@ async def remove_item_from_playlist(playlist_id: str, item_id: str) -> Dict:
             playlist["updated_at"] = datetime.utcnow().isoformat()
             library["playlists"][i] = playlist
             write_library(library)
+            _announce("playlist_updated", playlist_id)
 
             return playlist
 
@@ -221,6 +233,7 @@ async def reorder_playlist_items(playlist_id: str, item_ids: List[str]) -> Dict:
             playlist["updated_at"] = datetime.utcnow().isoformat()
             library["playlists"][i] = playlist
             write_library(library)
+            _announce("playlist_updated", playlist_id)
 
             return playlist
 
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Dict, List
+from api.schemas import AlbumDetail, Track
+from services.artifacts import TrackArtifactCache
+from services.downloader import DownloaderService
+from services.metrics import prefetch_total
+from services.scheduler import JobScheduler, PREFETCH_RANK
+
+logger = logging.getLogger(__name__)
+
+
+class AlbumPrefetcher:
+    """
+    Starts downloading an album's first tracks into the artifact cache as
+    soon as its details are viewed, since a montage request usually follows.
+    Downloads hold the scheduler's download slots at the lowest rank, so
+    they never delay a real job. A job for the album adopts them through the
+    cache (or joins one still in flight); any nobody adopted are deleted
+    once the TTL runs out.
+    """
+
+    def __init__(
+        self,
+        artifacts: TrackArtifactCache,
+        downloader: DownloaderService,
+        scheduler: JobScheduler,
+        tracks: int = 3,
+        ttl_seconds: float = 600,
+        max_albums: int = 2
+    ):
+        self.artifacts = artifacts
+        self.downloader = downloader
+        self.scheduler = scheduler
+        self.tracks = tracks
+        self.ttl_seconds = ttl_seconds
+        self.max_albums = max_albums
+        self.active: Dict[str, asyncio.Task] = {}  # Album mbid -> prefetch task
+
+    def prefetch_album(self, album: AlbumDetail) -> bool:
+        """
+        Start prefetching in the background unless it would compete with real
+        work. Never waits.
+
+        Returns:
+            True if a prefetch was started
+        """
+        if not self.artifacts.enabled or self.tracks <= 0:
+            return False
+        if album.mbid in self.active or len(self.active) >= self.max_albums:
+            return False
+        if self.scheduler.waiting:
+            return False  # Jobs are queueing; don't add load
+
+        task = asyncio.create_task(self._prefetch(album))
+        self.active[album.mbid] = task
+        task.add_done_callback(lambda _: self.active.pop(album.mbid, None))
+        return True
+
+    async def _prefetch(self, album: AlbumDetail):
+        owner = f"prefetch:{album.mbid}"
+        self.scheduler.priorities[owner] = PREFETCH_RANK
+        fetched: List[str] = []
+        try:
+            await asyncio.gather(*(
+                self._fetch_track(owner, album.artist, track, fetched)
+                for track in album.tracks[:self.tracks]
+            ))
+        finally:
+            self.scheduler.priorities.pop(owner, None)
+
+        if fetched:
+            logger.info(f"Prefetched {len(fetched)} track(s) of {album.mbid}")
+            asyncio.get_running_loop().call_later(
+                self.ttl_seconds,
+                self.artifacts.discard_speculative,
+                fetched
+            )
+
+    async def _fetch_track(self, owner: str, artist: str, track: Track, fetched: List[str]):
+        key = self.artifacts.key_for(artist, track)
+        try:
+            async with self.scheduler.slot("download", owner):
+                path = await self.artifacts.fetch_download(
+                    key,
+                    lambda: self.downloader.download_track(artist, track.title, f"prefetch_{key}"),
+                    speculative=True
+                )
+            self.artifacts.release(key, path)
+            fetched.append(key)
+            prefetch_total.inc(result="fetched")
+        except Exception as e:
+            logger.info(f"Prefetch of {artist} - {track.title} failed: {e}")
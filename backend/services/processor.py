@@ -1,11 +1,40 @@
-from pydub import AudioSegment
-import pyloudnorm as pyln
 import numpy as np
-import librosa
-import soundfile as sf
 import os
-from typing import List, Tuple
-from api.schemas import DurationType
+import math
+import asyncio
+from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
+from api.schemas import DurationType, AudioCodec
+from config.settings import settings
+from services.computepool import compute_pool
+from services.formats import export_kwargs, resolve_bitrate
+from services.mp3frames import splice_with_crossfades
+from services.peaks import compute_peaks, concat_peaks, peaks_path_for, read_peaks, write_peaks
+
+# pydub, pyloudnorm (scipy) and librosa load on first use, so importing this
+# module stays cheap for the API
+if TYPE_CHECKING:
+    import pyloudnorm
+    from pydub import AudioSegment
+
+
+def segment_to_array(segment: "AudioSegment") -> np.ndarray:
+    """Convert a pydub segment to float32 samples shaped (samples, channels)."""
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    scale = float(1 << (8 * segment.sample_width - 1))
+    return samples.reshape(-1, segment.channels) / scale
+
+
+def array_to_segment(samples: np.ndarray, rate: int) -> "AudioSegment":
+    """Convert float samples shaped (samples, channels) to a 16-bit pydub segment."""
+    from pydub import AudioSegment
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    return AudioSegment(
+        data=pcm.tobytes(),
+        sample_width=2,
+        frame_rate=rate,
+        channels=pcm.shape[1]
+    )
 
 
 class ProcessorService:
@@ -17,6 +46,28 @@ class ProcessorService:
         DurationType.LONG: (0.30, 0.75),   # 30% of track
     }
 
+    # Loudness meters are reused across clips, one per sample rate
+    _meters: Dict[int, "pyloudnorm.Meter"] = {}
+
+    @staticmethod
+    def clip_bitrate(codec: AudioCodec, bitrate: Optional[str] = None) -> str:
+        """
+        Bitrate for a job's clips: the requested one, then CLIP_BITRATE, then
+        the codec default. Frame-level assembly copies clip frames into the
+        montage as they are, so with MONTAGE_ASSEMBLY=frames and MP3 on both
+        sides the default is the montage's bitrate instead.
+        """
+        codec = AudioCodec(codec)
+        bitrate = bitrate or settings.CLIP_BITRATE
+        if (
+            not bitrate
+            and settings.MONTAGE_ASSEMBLY == "frames"
+            and codec == AudioCodec.MP3
+            and AudioCodec(settings.MONTAGE_CODEC) == AudioCodec.MP3
+        ):
+            return resolve_bitrate(codec, settings.MONTAGE_BITRATE, "montage")
+        return resolve_bitrate(codec, bitrate)
+
     @staticmethod
     def get_clip_percentage(duration_type: DurationType) -> Tuple[float, float]:
         """Get clip percentage and crossfade for a duration type."""
@@ -48,7 +99,9 @@ class ProcessorService:
         audio_path: str,
         start_time: float,
         end_time: float,
-        output_path: str
+        output_path: str,
+        codec: AudioCodec = AudioCodec.MP3,
+        bitrate: Optional[str] = None
     ) -> str:
         """
         Extract a clip from an audio file.
@@ -58,10 +111,14 @@ class ProcessorService:
             start_time: Start time in seconds
             end_time: End time in seconds
             output_path: Output file path
+            codec: Output codec
+            bitrate: Output bitrate (defaults per codec)
 
         Returns:
             Path to extracted clip
         """
+        from pydub import AudioSegment
+
         try:
             audio = AudioSegment.from_file(audio_path)
 
@@ -72,8 +129,7 @@ class ProcessorService:
             # Extract clip
             clip = audio[start_ms:end_ms]
 
-            # Export as high-quality MP3
-            clip.export(output_path, format="mp3", bitrate="192k")
+            clip.export(output_path, **export_kwargs(codec, resolve_bitrate(codec, bitrate)))
 
             return output_path
 
@@ -82,17 +138,27 @@ class ProcessorService:
             raise
 
     @staticmethod
-    async def normalize_audio(audio_path: str, target_lufs: float = -14.0) -> str:
+    async def normalize_audio(
+        audio_path: str,
+        target_lufs: float = -14.0,
+        codec: AudioCodec = AudioCodec.MP3,
+        bitrate: Optional[str] = None
+    ) -> str:
         """
         Normalize audio to target LUFS (streaming standard is -14 LUFS).
 
         Args:
             audio_path: Path to audio file
             target_lufs: Target loudness in LUFS
+            codec: Codec to re-encode with
+            bitrate: Bitrate to re-encode with (defaults per codec)
 
         Returns:
             Path to normalized audio (overwrites original)
         """
+        import librosa
+        import pyloudnorm as pyln
+
         try:
             # Load audio
             data, rate = librosa.load(audio_path, sr=None, mono=False)
@@ -102,14 +168,16 @@ class ProcessorService:
                 data = np.array([data, data])
 
             # Measure loudness
-            meter = pyln.Meter(rate)
-            loudness = meter.integrated_loudness(data.T)
+            loudness = ProcessorService.get_meter(rate).integrated_loudness(data.T)
 
             # Normalize
             normalized = pyln.normalize.loudness(data.T, loudness, target_lufs)
 
-            # Save
-            sf.write(audio_path, normalized, rate)
+            # Save in the clip's own codec
+            array_to_segment(normalized, rate).export(
+                audio_path,
+                **export_kwargs(codec, resolve_bitrate(codec, bitrate))
+            )
 
             return audio_path
 
@@ -119,10 +187,216 @@ class ProcessorService:
             return audio_path
 
     @staticmethod
-    async def create_montage(
+    def get_meter(rate: int) -> "pyloudnorm.Meter":
+        """Get the shared loudness meter for a sample rate."""
+        meter = ProcessorService._meters.get(rate)
+        if meter is None:
+            import pyloudnorm as pyln
+            meter = ProcessorService._meters[rate] = pyln.Meter(rate)
+        return meter
+
+    @staticmethod
+    async def extract_clip_samples(
+        audio_path: str,
+        start_time: float,
+        end_time: float
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Extract a clip into memory instead of encoding it.
+
+        Returns:
+            Tuple of (samples shaped (samples, channels) as float32, sample_rate)
+        """
+        try:
+            return await compute_pool.run(ProcessorService._extract_samples, audio_path, start_time, end_time)
+
+        except Exception as e:
+            print(f"Error extracting clip from {audio_path}: {e}")
+            raise
+
+    @staticmethod
+    def _extract_samples(audio_path: str, start_time: float, end_time: float) -> Tuple[np.ndarray, int]:
+        from pydub import AudioSegment
+
+        audio = AudioSegment.from_file(audio_path)
+        clip = audio[int(start_time * 1000):int(end_time * 1000)]
+        return segment_to_array(clip), clip.frame_rate
+
+    @staticmethod
+    def slice_clip_samples(
+        samples: np.ndarray,
+        rate: int,
+        start_time: float,
+        end_time: float
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Cut a clip out of already-decoded samples (e.g. a memory-mapped
+        PcmScratch) without copying them.
+
+        Returns:
+            Tuple of (samples view shaped (samples, channels), sample_rate)
+        """
+        return samples[int(start_time * rate):int(end_time * rate)], rate
+
+    @staticmethod
+    def measure_loudness(clips: List[Tuple[np.ndarray, int]]) -> List[Optional[float]]:
+        """
+        Measure the integrated loudness of a batch of in-memory clips.
+
+        Args:
+            clips: List of (samples, sample_rate)
+
+        Returns:
+            Loudness in LUFS per clip, or None where it couldn't be measured
+            (e.g. clips shorter than one 400ms gating block, or silence)
+        """
+        results = []
+        for samples, rate in clips:
+            try:
+                loudness = ProcessorService.get_meter(rate).integrated_loudness(samples)
+                results.append(float(loudness) if math.isfinite(loudness) else None)
+            except Exception as e:
+                print(f"Error measuring loudness: {e}")
+                results.append(None)
+        return results
+
+    @staticmethod
+    def compute_gains(
+        loudness: List[Optional[float]],
+        durations: List[float],
+        target_lufs: float = -14.0,
+        mode: str = "track"
+    ) -> List[float]:
+        """
+        Compute the gain in dB to apply to each clip.
+
+        Args:
+            loudness: Measured loudness per clip (None = leave unchanged)
+            durations: Clip durations in seconds, used to weight album loudness
+            target_lufs: Target loudness in LUFS
+            mode: "track" brings every clip to the target; "album" applies one
+                gain to all clips so their relative loudness is preserved
+
+        Returns:
+            Gain in dB per clip
+        """
+        if mode != "album":
+            return [target_lufs - value if value is not None else 0.0 for value in loudness]
+
+        measured = [(value, duration) for value, duration in zip(loudness, durations) if value is not None]
+        if not measured:
+            return [0.0] * len(loudness)
+
+        # Loudness of the clips played back to back: duration-weighted mean power
+        total_duration = sum(duration for _, duration in measured)
+        mean_power = sum(duration * 10 ** (value / 10) for value, duration in measured) / total_duration
+        album_loudness = 10 * math.log10(mean_power)
+        return [target_lufs - album_loudness] * len(loudness)
+
+    @staticmethod
+    async def encode_clip(
+        samples: np.ndarray,
+        rate: int,
+        output_path: str,
+        gain_db: float = 0.0,
+        codec: AudioCodec = AudioCodec.MP3,
+        bitrate: Optional[str] = None,
+        peaks_path: Optional[str] = None
+    ) -> str:
+        """
+        Apply a gain to an in-memory clip and encode it once.
+
+        Args:
+            samples: Float samples shaped (samples, channels)
+            rate: Sample rate
+            output_path: Output file path
+            gain_db: Gain to apply in dB
+            codec: Output codec
+            bitrate: Output bitrate (defaults per codec)
+            peaks_path: Where to write waveform peaks for the encoded clip, if anywhere
+
+        Returns:
+            Path to encoded clip
+        """
+        def encode():
+            gained = samples * np.float32(10 ** (gain_db / 20)) if gain_db else samples
+
+            array_to_segment(gained, rate).export(
+                output_path,
+                **export_kwargs(codec, resolve_bitrate(codec, bitrate))
+            )
+
+            if peaks_path:
+                write_peaks(peaks_path, compute_peaks(gained, rate, bits=settings.PEAKS_BITS))
+
+        try:
+            await asyncio.to_thread(encode)
+            return output_path
+
+        except Exception as e:
+            print(f"Error encoding clip {output_path}: {e}")
+            raise
+
+    @staticmethod
+    async def _splice_frames(
         clip_paths: List[str],
         output_path: str,
+        crossfade_duration: float,
+        assembly: Optional[str],
+        bitrate: str
+    ) -> bool:
+        """
+        Try frame-level assembly, which copies the clips' MP3 frames and only
+        re-encodes the crossfade seams. Clips at a bitrate other than the
+        montage's are left to the re-encode.
+
+        Returns:
+            True if the montage was written, False if it should be re-encoded
+        """
+        if (assembly or settings.MONTAGE_ASSEMBLY) != "frames":
+            return False
+        if not all(path.lower().endswith(".mp3") for path in clip_paths):
+            return False
+
+        try:
+            kbps = int(bitrate.lower().rstrip("k"))
+            await asyncio.to_thread(splice_with_crossfades, clip_paths, output_path, crossfade_duration, kbps)
+            return True
+        except Exception as e:
+            # Unsuitable, unreadable or truncated clips; the re-encode handles them
+            print(f"Frame-level assembly not possible, re-encoding instead: {e}")
+            return False
+
+    @staticmethod
+    def _write_montage_peaks(
+        output_path: str,
+        montage: Optional["AudioSegment"],
+        clip_paths: List[str],
         crossfade_duration: float
+    ):
+        """
+        Write waveform peaks next to a montage, from its PCM when it was
+        decoded, otherwise by joining the clips' own peak files.
+        """
+        try:
+            if montage is not None:
+                peaks = compute_peaks(segment_to_array(montage), montage.frame_rate, bits=settings.PEAKS_BITS)
+            else:
+                clip_peaks = [read_peaks(peaks_path_for(path)) for path in clip_paths]
+                crossfade_samples = int(crossfade_duration * clip_peaks[0]["sample_rate"])
+                peaks = concat_peaks(clip_peaks, crossfade_samples)
+            write_peaks(peaks_path_for(output_path), peaks)
+        except Exception as e:
+            print(f"Error writing montage peaks for {output_path}: {e}")
+
+    @staticmethod
+    async def create_montage(
+        clip_paths: List[str],
+        output_path: str,
+        crossfade_duration: float,
+        assembly: Optional[str] = None,
+        codec: Optional[AudioCodec] = None,
+        bitrate: Optional[str] = None
     ) -> str:
         """
         Combine clips into a montage with crossfades.
@@ -131,14 +405,30 @@ class ProcessorService:
             clip_paths: List of clip file paths
             output_path: Output file path
             crossfade_duration: Crossfade duration in seconds
+            assembly: "frames" to splice MP3 frames, "reencode" to decode and
+                re-encode everything (defaults to settings.MONTAGE_ASSEMBLY)
+            codec: Output codec (defaults to settings.MONTAGE_CODEC)
+            bitrate: Output bitrate (defaults to settings.MONTAGE_BITRATE, then per codec)
 
         Returns:
             Path to created montage
         """
+        from pydub import AudioSegment
+
         try:
             if not clip_paths:
                 raise ValueError("No clips provided")
 
+            codec = AudioCodec(codec or settings.MONTAGE_CODEC)
+            bitrate = resolve_bitrate(codec, bitrate or settings.MONTAGE_BITRATE, "montage")
+
+            if codec == AudioCodec.MP3 and await ProcessorService._splice_frames(
+                clip_paths, output_path, crossfade_duration, assembly, bitrate
+            ):
+                ProcessorService._write_montage_peaks(output_path, None, clip_paths, crossfade_duration)
+                print(f"Created montage: {output_path} ({len(clip_paths)} clips, frame-level)")
+                return output_path
+
             # Load first clip
             montage = AudioSegment.from_file(clip_paths[0])
 
@@ -149,8 +439,8 @@ class ProcessorService:
                 clip = AudioSegment.from_file(clip_path)
                 montage = montage.append(clip, crossfade=crossfade_ms)
 
-            # Export final montage as high-quality MP3
-            montage.export(output_path, format="mp3", bitrate="320k")
+            montage.export(output_path, **export_kwargs(codec, bitrate))
+            ProcessorService._write_montage_peaks(output_path, montage, clip_paths, crossfade_duration)
 
             print(f"Created montage: {output_path} ({len(clip_paths)} clips)")
             return output_path
@@ -163,7 +453,10 @@ class ProcessorService:
     async def create_progressive_montage(
         clip_paths: List[str],
         output_path: str,
-        crossfade_duration: float
+        crossfade_duration: float,
+        assembly: Optional[str] = None,
+        codec: Optional[AudioCodec] = None,
+        bitrate: Optional[str] = None
     ) -> str:
         """
         Create or update a progressive montage as new clips become available.
@@ -174,14 +467,29 @@ class ProcessorService:
             clip_paths: List of all clip file paths available so far
             output_path: Output file path (will be overwritten)
             crossfade_duration: Crossfade duration in seconds
+            assembly: "frames" or "reencode" (defaults to settings.MONTAGE_ASSEMBLY)
+            codec: Output codec (defaults to settings.MONTAGE_CODEC)
+            bitrate: Output bitrate (defaults to settings.MONTAGE_BITRATE, then per codec)
 
         Returns:
             Path to created/updated montage
         """
+        from pydub import AudioSegment
+
         try:
             if not clip_paths:
                 raise ValueError("No clips provided")
 
+            codec = AudioCodec(codec or settings.MONTAGE_CODEC)
+            bitrate = resolve_bitrate(codec, bitrate or settings.MONTAGE_BITRATE, "montage")
+
+            if codec == AudioCodec.MP3 and await ProcessorService._splice_frames(
+                clip_paths, output_path, crossfade_duration, assembly, bitrate
+            ):
+                ProcessorService._write_montage_peaks(output_path, None, clip_paths, crossfade_duration)
+                print(f"Updated progressive montage: {output_path} ({len(clip_paths)} clips, frame-level)")
+                return output_path
+
             # Build montage from all available clips
             montage = AudioSegment.from_file(clip_paths[0])
 
@@ -191,8 +499,9 @@ class ProcessorService:
                 clip = AudioSegment.from_file(clip_path)
                 montage = montage.append(clip, crossfade=crossfade_ms)
 
-            # Export as high-quality MP3 (overwrites previous version)
-            montage.export(output_path, format="mp3", bitrate="320k")
+            # Overwrites previous version
+            montage.export(output_path, **export_kwargs(codec, bitrate))
+            ProcessorService._write_montage_peaks(output_path, montage, clip_paths, crossfade_duration)
 
             print(f"Updated progressive montage: {output_path} ({len(clip_paths)} clips)")
             return output_path
@@ -0,0 +1,199 @@
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+from api.schemas import JobStatus, TrackStatus, StageStatus, JobPriority, Track
+
+# Track states, stored one byte per track
+TRACK_STATES = ("pending", "downloading", "analyzing", "encoding", "complete", "failed")
+_STATE_CODES = {state: code for code, state in enumerate(TRACK_STATES)}
+
+# Job states after which a job can be evicted
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class JobRecord:
+    """
+    In-memory state of one job. Per-track state is packed into arrays and
+    only expanded into the JobStatus / TrackStatus models by to_status().
+    """
+
+    __slots__ = (
+        "status",
+        "priority",
+        "progress",
+        "current_track",
+        "completed_tracks",
+        "track_numbers",
+        "track_titles",
+        "track_states",
+        "track_errors",
+        "track_timings",
+        "errors",
+        "file_path",
+        "stages",
+    )
+
+    def __init__(self, priority: JobPriority = JobPriority.NORMAL):
+        self.status = "queued"
+        self.priority = JobPriority(priority)
+        self.progress = 0.0
+        self.current_track: Optional[int] = None
+        self.completed_tracks = 0
+        self.track_numbers = array("H")
+        self.track_titles: Tuple[str, ...] = ()
+        self.track_states = bytearray()
+        self.track_errors: Optional[Dict[int, str]] = None  # Only allocated once a track fails
+        self.track_timings: Optional[Dict[int, Dict[str, float]]] = None  # Step seconds, once a track has any
+        self.errors: Optional[list] = None
+        self.file_path: Optional[str] = None
+        self.stages: Optional[Dict[str, dict]] = None  # Final pipeline stage counts
+
+    @property
+    def total_tracks(self) -> int:
+        return len(self.track_states)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def set_tracks(self, tracks: Iterable[Track]):
+        """Start every track of the album as pending."""
+        tracks = list(tracks)
+        self.track_numbers = array("H", (track.number for track in tracks))
+        self.track_titles = tuple(track.title for track in tracks)
+        self.track_states = bytearray(len(tracks))
+        self.track_errors = None
+        self.track_timings = None
+
+    def track_state(self, index: int) -> str:
+        return TRACK_STATES[self.track_states[index]]
+
+    def set_track_state(self, index: int, state: str, error: Optional[str] = None):
+        self.track_states[index] = _STATE_CODES[state]
+        if error is not None:
+            if self.track_errors is None:
+                self.track_errors = {}
+            self.track_errors[index] = error
+
+    def set_track_timings(self, index: int, timings: Dict[str, float]):
+        """Attach a track's step timings; the dict may keep being updated by the caller."""
+        if self.track_timings is None:
+            self.track_timings = {}
+        self.track_timings[index] = timings
+
+    def add_error(self, message: str):
+        if self.errors is None:
+            self.errors = []
+        self.errors.append(message)
+
+    def track_status(self, index: int) -> TrackStatus:
+        return TrackStatus(
+            track_number=self.track_numbers[index],
+            track_title=self.track_titles[index],
+            status=self.track_state(index),
+            error=self.track_errors.get(index) if self.track_errors else None,
+            timings=dict(self.track_timings.get(index) or {}) if self.track_timings else {}
+        )
+
+    def to_status(self) -> JobStatus:
+        """Expand into the API's JobStatus model."""
+        return JobStatus(
+            status=self.status,
+            progress=self.progress,
+            current_track=self.current_track,
+            total_tracks=self.total_tracks,
+            completed_tracks=self.completed_tracks,
+            track_statuses=[self.track_status(index) for index in range(self.total_tracks)],
+            errors=list(self.errors or ()),
+            file_path=self.file_path,
+            stages={name: StageStatus(**counts) for name, counts in (self.stages or {}).items()},
+            priority=self.priority
+        )
+
+    @classmethod
+    def from_status(cls, status: JobStatus) -> "JobRecord":
+        """Rebuild a record from a stored JobStatus."""
+        record = cls(status.priority)
+        record.status = status.status
+        record.progress = status.progress
+        record.current_track = status.current_track
+        record.completed_tracks = status.completed_tracks
+        record.track_numbers = array("H", (track.track_number for track in status.track_statuses))
+        record.track_titles = tuple(track.track_title for track in status.track_statuses)
+        record.track_states = bytearray(_STATE_CODES.get(track.status, 0) for track in status.track_statuses)
+        for index, track in enumerate(status.track_statuses):
+            if track.error:
+                record.set_track_state(index, track.status, track.error)
+            if track.timings:
+                record.set_track_timings(index, dict(track.timings))
+        record.errors = list(status.errors) or None
+        record.file_path = status.file_path
+        record.stages = {name: stage.dict() for name, stage in status.stages.items()} or None
+        return record
+
+
+class JobRegistry:
+    """
+    Jobs by ID. Unfinished jobs are always kept; finished ones are evicted
+    once they are older than the TTL or beyond the count limit, oldest first.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_finished: int,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_finished = max_finished
+        self.on_evict = on_evict
+        self._jobs: Dict[str, JobRecord] = {}
+        self._finished: "OrderedDict[str, float]" = OrderedDict()  # job_id -> finish time
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._jobs
+
+    def __getitem__(self, job_id: str) -> JobRecord:
+        return self._jobs[job_id]
+
+    def __setitem__(self, job_id: str, record: JobRecord):
+        self._jobs[job_id] = record
+        if record.finished:
+            self.mark_finished(job_id)
+        self.prune()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._jobs)
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        return self._jobs.get(job_id)
+
+    def mark_finished(self, job_id: str):
+        """Start the job's TTL; call when it completes, fails or is cancelled."""
+        self._finished[job_id] = time.monotonic()
+        self._finished.move_to_end(job_id)
+        self.prune()
+
+    def prune(self) -> int:
+        """
+        Evict expired finished jobs and the oldest beyond max_finished.
+
+        Returns:
+            Number of jobs evicted
+        """
+        cutoff = time.monotonic() - self.ttl_seconds
+        evicted = 0
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > cutoff and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+            if self.on_evict:
+                self.on_evict(job_id)
+            evicted += 1
+        return evicted
@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional
+from api.schemas import JobPriority
+
+# Lower runs first
+PRIORITY_RANK = {
+    JobPriority.HIGH: 0,
+    JobPriority.NORMAL: 1,
+    JobPriority.LOW: 2,
+}
+# Speculative work (album prefetch) only gets slots no job is waiting for
+PREFETCH_RANK = PRIORITY_RANK[JobPriority.LOW] + 1
+
+
+class _Waiter:
+    __slots__ = ("job_id", "rank", "seq", "future")
+
+    def __init__(self, job_id: str, rank: int, seq: int):
+        self.job_id = job_id
+        self.rank = rank
+        self.seq = seq
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class SlotPool:
+    """
+    A fixed number of work slots shared by every job. A free slot goes to the
+    highest priority class first, then to the job currently holding the fewest
+    slots, then to the oldest request, so one large album can't starve the rest.
+    """
+
+    def __init__(self, name: str, size: int, priorities: Dict[str, int]):
+        self.name = name
+        self.size = max(1, size)
+        self.priorities = priorities  # Shared job_id -> rank map owned by the scheduler
+        self.held: Dict[str, int] = {}
+        self.waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def in_use(self) -> int:
+        return sum(self.held.values())
+
+    async def acquire(self, job_id: str):
+        if self.in_use < self.size and not self.waiters:
+            self.held[job_id] = self.held.get(job_id, 0) + 1
+            return
+
+        waiter = _Waiter(job_id, self.priorities.get(job_id, PRIORITY_RANK[JobPriority.NORMAL]), next(self._seq))
+        self.waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled; hand the slot on
+                self.release(job_id)
+            raise
+
+    def release(self, job_id: str):
+        count = self.held.get(job_id, 0) - 1
+        if count > 0:
+            self.held[job_id] = count
+        else:
+            self.held.pop(job_id, None)
+        self._grant()
+
+    def _grant(self):
+        while self.waiters and self.in_use < self.size:
+            waiter = min(
+                self.waiters,
+                key=lambda w: (w.rank, self.held.get(w.job_id, 0), w.seq)
+            )
+            self.waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            self.held[waiter.job_id] = self.held.get(waiter.job_id, 0) + 1
+            waiter.future.set_result(None)
+
+    def status(self) -> Dict[str, int]:
+        return {"size": self.size, "in_use": self.in_use, "waiting": len(self.waiters)}
+
+
+class JobScheduler:
+    """
+    Admits montage jobs into a bounded set of running jobs by priority, and
+    shares per-stage work slots between the running jobs.
+    """
+
+    def __init__(
+        self,
+        max_jobs: int,
+        stage_slots: Dict[str, int],
+        default_job_seconds: float = 120.0
+    ):
+        self.max_jobs = max(1, max_jobs)
+        self.priorities: Dict[str, int] = {}
+        self.running: Dict[str, float] = {}  # job_id -> monotonic start time
+        self.waiting: List[_Waiter] = []
+        self.pools = {name: SlotPool(name, size, self.priorities) for name, size in stage_slots.items()}
+        self.default_job_seconds = default_job_seconds
+        self.recent_durations: Deque[float] = deque(maxlen=20)
+        self._seq = itertools.count()
+
+    async def admit(self, job_id: str, priority: JobPriority = JobPriority.NORMAL):
+        """Wait until the job may start running."""
+        rank = PRIORITY_RANK[JobPriority(priority)]
+        self.priorities[job_id] = rank
+
+        if len(self.running) < self.max_jobs and not self.waiting:
+            self.running[job_id] = time.monotonic()
+            return
+
+        waiter = _Waiter(job_id, rank, next(self._seq))
+        self.waiting.append(waiter)
+        self.waiting.sort(key=lambda w: (w.rank, w.seq))
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self.waiting:
+                self.waiting.remove(waiter)
+            self.priorities.pop(job_id, None)
+            if job_id in self.running:
+                self.finish(job_id)
+            raise
+
+    def finish(self, job_id: str):
+        """Mark a job done and start the next queued one."""
+        started = self.running.pop(job_id, None)
+        self.priorities.pop(job_id, None)
+        if started is not None:
+            self.recent_durations.append(time.monotonic() - started)
+
+        while self.waiting and len(self.running) < self.max_jobs:
+            waiter = self.waiting.pop(0)
+            if waiter.future.done():
+                continue
+            self.running[waiter.job_id] = time.monotonic()
+            waiter.future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, stage: str, job_id: str):
+        """Hold one of the stage's shared slots for the duration of the block."""
+        pool = self.pools[stage]
+        await pool.acquire(job_id)
+        try:
+            yield
+        finally:
+            pool.release(job_id)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position among jobs waiting to start, or None if not waiting."""
+        for position, waiter in enumerate(self.waiting, start=1):
+            if waiter.job_id == job_id:
+                return position
+        return None
+
+    def average_job_seconds(self) -> float:
+        if not self.recent_durations:
+            return self.default_job_seconds
+        return sum(self.recent_durations) / len(self.recent_durations)
+
+    def estimated_start(self, job_id: str) -> Optional[datetime]:
+        """
+        When a waiting job should start, assuming every job takes the recent
+        average: replay the queue ahead of it against the running jobs'
+        expected finish times.
+        """
+        position = self.queue_position(job_id)
+        if position is None:
+            return None
+        return datetime.now() + timedelta(seconds=self.start_delay(position))
+
+    def start_delay(self, position: int) -> float:
+        """Seconds until the job at a 1-based queue position should start."""
+        average = self.average_job_seconds()
+        now = time.monotonic()
+        free_at = [max(average - (now - started), 0.0) for started in self.running.values()]
+        free_at += [0.0] * (self.max_jobs - len(free_at))
+        heapq.heapify(free_at)
+
+        start = 0.0
+        for _ in range(position):
+            start = heapq.heappop(free_at)
+            heapq.heappush(free_at, start + average)
+
+        return start
+
+    def status(self) -> dict:
+        return {
+            "running": len(self.running),
+            "max_jobs": self.max_jobs,
+            "queued": len(self.waiting),
+            "stages": {name: pool.status() for name, pool in self.pools.items()},
+        }
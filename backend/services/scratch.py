@@ -0,0 +1,85 @@
+import os
+import asyncio
+import logging
+import numpy as np
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PcmScratch:
+    """
+    Decoded PCM kept in a memory-mapped float32 file instead of the Python heap.
+    Slices of ``samples`` are views into the map, so the page cache (not the
+    process) holds the audio.
+    """
+
+    def __init__(self, path: str, rate: int, channels: int):
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.samples: Optional[np.ndarray] = np.memmap(path, dtype=np.float32, mode="r").reshape(-1, channels)
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.rate if self.samples is not None else 0.0
+
+    def close(self):
+        """Drop the mapping and delete the scratch file."""
+        self.samples = None
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except Exception as e:
+            print(f"Error removing scratch file {self.path}: {e}")
+
+
+async def decode_to_scratch(
+    audio_path: str,
+    scratch_path: str,
+    rate: int = 44100,
+    channels: int = 2
+) -> PcmScratch:
+    """
+    Decode an audio file with ffmpeg straight into a raw float32 file and map it.
+
+    Args:
+        audio_path: Source audio file
+        scratch_path: Raw PCM file to create
+        rate: Output sample rate
+        channels: Output channel count
+
+    Returns:
+        PcmScratch mapping the decoded audio
+
+    Raises:
+        Exception: If decoding fails or produces no audio
+    """
+    from pydub import AudioSegment
+
+    process = await asyncio.create_subprocess_exec(
+        AudioSegment.converter, "-v", "error", "-y",
+        "-i", audio_path,
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ac", str(channels), "-ar", str(rate),
+        scratch_path,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        # Don't leave ffmpeg writing a file nobody will read
+        process.kill()
+        await process.wait()
+        if os.path.exists(scratch_path):
+            os.remove(scratch_path)
+        raise
+
+    if process.returncode != 0 or not os.path.exists(scratch_path) or os.path.getsize(scratch_path) == 0:
+        if os.path.exists(scratch_path):
+            os.remove(scratch_path)
+        raise Exception(f"Failed to decode {audio_path}: {stderr.decode(errors='replace').strip()}")
+
+    logger.info(f"Decoded {audio_path} -> {scratch_path} ({os.path.getsize(scratch_path) / 1024 / 1024:.1f}MB)")
+    return PcmScratch(scratch_path, rate, channels)
@@ -0,0 +1,177 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Only one cProfile profiler can be active per thread, and every job shares
+# the event loop thread, so concurrent profiled jobs take turns
+_active_profiler: Optional[cProfile.Profile] = None
+_tracemalloc_users = 0
+
+# Chrome trace thread for job-level spans; tracks use their track number
+JOB_THREAD = 0
+
+
+class JobTrace:
+    """
+    Spans recorded for one profiled job, exported in the Chrome trace-event
+    format (load the JSON in chrome://tracing or Perfetto). Every track gets
+    its own row; job-level steps are on row 0.
+
+    Optionally the job also runs under cProfile and tracemalloc. Both are
+    process-wide: the profile covers everything on the event loop while the
+    job runs (not work in worker threads), and memory samples count all
+    allocations, not just this job's.
+    """
+
+    def __init__(self, job_id: str, use_cprofile: bool = False, use_tracemalloc: bool = False):
+        self.job_id = job_id
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.origin = time.perf_counter()
+        self.events: List[dict] = []
+        self.threads: Dict[int, str] = {JOB_THREAD: "job"}
+        self.other: Dict[str, object] = {"job_id": job_id}
+        self.profiler: Optional[cProfile.Profile] = None
+        self.tracing_memory = False  # Holds a tracemalloc user count
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self.origin) * 1_000_000
+
+    def name_track(self, track_number: int, title: str):
+        self.threads[track_number] = f"track {track_number}: {title}"
+
+    @contextmanager
+    def span(self, name: str, track: int = JOB_THREAD, **args):
+        """Record the block as one complete ("X") event on the track's row."""
+        start = self._now_us()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.events.append({
+                "name": name,
+                "cat": "job" if track == JOB_THREAD else "track",
+                "ph": "X",
+                "ts": round(start, 1),
+                "dur": round(self._now_us() - start, 1),
+                "pid": 1,
+                "tid": track,
+                "args": args,
+            })
+            if self.tracing_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                self.events.append({
+                    "name": "traced memory (MB)",
+                    "ph": "C",
+                    "ts": round(self._now_us(), 1),
+                    "pid": 1,
+                    "args": {"current": round(current / 1024 / 1024, 2), "peak": round(peak / 1024 / 1024, 2)},
+                })
+
+    def start(self):
+        """Start cProfile and tracemalloc if requested."""
+        global _active_profiler, _tracemalloc_users
+
+        if self.use_cprofile:
+            if _active_profiler is None:
+                self.profiler = _active_profiler = cProfile.Profile()
+                self.profiler.enable()
+            else:
+                self.other["cprofile"] = "skipped: another profiled job was running"
+
+        if self.use_tracemalloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _tracemalloc_users += 1
+            self.tracing_memory = True
+
+    def stop(self, top: int = 30):
+        """Stop profilers and keep their top entries in the trace's otherData."""
+        global _active_profiler, _tracemalloc_users
+
+        if self.profiler is not None:
+            self.profiler.disable()
+
+        # Snapshot before formatting the profile, which allocates plenty itself
+        if self.tracing_memory:
+            snapshot = tracemalloc.take_snapshot()
+            self.other["tracemalloc"] = [str(stat) for stat in snapshot.statistics("lineno")[:top]]
+            self.other["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+            self.tracing_memory = False
+            _tracemalloc_users -= 1
+            if _tracemalloc_users <= 0:
+                _tracemalloc_users = 0
+                tracemalloc.stop()
+
+        if self.profiler is not None:
+            if _active_profiler is self.profiler:
+                _active_profiler = None
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            self.other["cprofile"] = out.getvalue().splitlines()
+            self.profiler = None
+
+    def to_chrome(self) -> dict:
+        names = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+            for tid, name in self.threads.items()
+        ]
+        names.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": f"job {self.job_id}"}})
+        return {
+            "traceEvents": names + self.events,
+            "displayTimeUnit": "ms",
+            "otherData": self.other,
+        }
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_chrome(), f)
+        logger.info(f"Wrote job trace {path}")
+
+
+def prune_traces(trace_dir: str, max_files: int = 0, max_age_hours: float = 0) -> int:
+    """
+    Delete saved traces older than max_age_hours, then the oldest ones past
+    max_files. A limit of 0 isn't applied.
+
+    Returns:
+        Number of traces deleted
+    """
+    if not os.path.isdir(trace_dir):
+        return 0
+
+    traces = []
+    for name in os.listdir(trace_dir):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(trace_dir, name)
+        try:
+            traces.append((os.path.getmtime(path), path))
+        except FileNotFoundError:
+            continue
+    traces.sort(reverse=True)
+
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for position, (mtime, path) in enumerate(traces):
+        if (max_files and position >= max_files) or (max_age_hours and mtime < cutoff):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                logger.error(f"Error removing trace {path}: {e}")
+    if removed:
+        logger.info(f"Removed {removed} old job trace(s) from {trace_dir}")
+    return removed
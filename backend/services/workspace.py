@@ -0,0 +1,83 @@
+import os
+import time
+import shutil
+import logging
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorkspace:
+    """
+    Directory for one job's intermediate files (downloads in progress,
+    decoded PCM). Everything in it is disposable, so the root may be on a
+    RAM-backed filesystem, and cleaning up after a job is a single rmtree.
+    """
+
+    def __init__(self, root: str, job_id: str):
+        self.job_id = job_id
+        self.path = os.path.join(root, job_id)
+
+    def create(self) -> "JobWorkspace":
+        os.makedirs(self.path, exist_ok=True)
+        return self
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def size_bytes(self) -> int:
+        """Bytes currently used by the workspace's files."""
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass  # Removed while walking
+        return total
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def last_modified(self) -> float:
+        """Newest mtime of the workspace or anything in it; 0 if it's gone."""
+        newest = 0.0
+        for root, _, files in os.walk(self.path):
+            for path in [root] + [os.path.join(root, name) for name in files]:
+                try:
+                    newest = max(newest, os.path.getmtime(path))
+                except OSError:
+                    pass  # Removed while walking
+        return newest
+
+
+def sweep_workspaces(root: str, keep: Iterable[str], min_age_seconds: float = 0) -> int:
+    """
+    Remove workspaces left behind by jobs that no longer exist, e.g. after a
+    crash.
+
+    Args:
+        root: Workspace root directory
+        keep: Job IDs whose workspaces are still in use
+        min_age_seconds: Only remove workspaces untouched for at least this
+            long, for roots shared with processes whose jobs aren't in keep
+
+    Returns:
+        Number of workspaces removed
+    """
+    if not os.path.isdir(root):
+        return 0
+
+    keep = set(keep)
+    cutoff = time.time() - min_age_seconds
+    removed = 0
+    for entry in os.scandir(root):
+        if not entry.is_dir() or entry.name in keep:
+            continue
+        if min_age_seconds and JobWorkspace(root, entry.name).last_modified() > cutoff:
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+    if removed:
+        logger.info(f"Removed {removed} orphaned job workspace(s) from {root}")
+    return removed
@@ -0,0 +1,18 @@
+"""
+Run from backend/ with ``python -m pytest``. The services read their
+settings at import time, so keep the global instances away from ~/.junt
+before any of them is imported.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+_scratch = tempfile.mkdtemp(prefix="junt-tests-")
+os.environ.setdefault("JOB_STORE_ENABLED", "false")
+os.environ.setdefault("ARTIFACT_CACHE_DIR", os.path.join(_scratch, "artifacts"))
+os.environ.setdefault("TEMP_DIR", os.path.join(_scratch, "temp"))
+os.environ.setdefault("COMPUTE_WORKERS", "0")
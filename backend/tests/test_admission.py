@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from api.schemas import AlbumDetail, MontageBatchItem, Track
+from services.admission import AdmissionController
+from services.batches import BatchManager
+from services.registry import JobRecord
+from services.scheduler import JobScheduler
+
+
+class StubJobs:
+    """The parts of JobManager admission control reads."""
+
+    def __init__(self):
+        self.scheduler = JobScheduler(2, {}, default_job_seconds=60)
+        self.jobs = {}
+        self.queued = 0
+        self.metadata = self
+
+    def queued_count(self) -> int:
+        return self.queued
+
+    def add_job(self, job_id: str, status: str = "queued"):
+        record = JobRecord()
+        record.status = status
+        self.jobs[job_id] = record
+
+    async def get_album_details(self, mbid: str) -> AlbumDetail:
+        return AlbumDetail(mbid=mbid, title="Album", artist="Artist", tracks=[Track(number=1, title="One")])
+
+    def create_job(self, mbid, duration, codec=None, bitrate=None, priority=None, album=None) -> str:
+        job_id = f"{mbid}-{duration.value}"
+        self.add_job(job_id)
+        return job_id
+
+
+@pytest.fixture
+def jobs():
+    return StubJobs()
+
+
+@pytest.fixture
+def controller(jobs, tmp_path, monkeypatch):
+    controller = AdmissionController(
+        jobs,
+        str(tmp_path),
+        max_queued_jobs=20,
+        min_free_mb=0,
+        max_load_per_cpu=0,
+        max_jobs_per_client=3,
+        retry_seconds=30
+    )
+    monkeypatch.setattr(controller, "load_per_cpu", lambda: 0.5)
+    return controller
+
+
+def test_admits_when_under_every_limit(controller):
+    assert controller.check("client") is None
+    assert controller.check() is None
+
+
+def test_queue_full_counts_new_jobs(controller, jobs):
+    jobs.queued = 19
+    assert controller.check(new_jobs=1) is None
+
+    rejection = controller.check(new_jobs=2)
+    assert rejection.reason == "queue_full"
+    assert rejection.retry_after >= 1
+    assert rejection.estimated_start is not None
+
+
+def test_disk_space(controller, monkeypatch):
+    controller.min_free_mb = 1024
+    monkeypatch.setattr(controller, "free_mb", lambda: 100.0)
+    assert controller.check().reason == "disk_space"
+
+    # Unknown free space doesn't block requests
+    monkeypatch.setattr(controller, "free_mb", lambda: None)
+    assert controller.check() is None
+
+
+def test_cpu_load(controller, monkeypatch):
+    controller.max_load_per_cpu = 1.0
+    monkeypatch.setattr(controller, "load_per_cpu", lambda: 1.5)
+    rejection = controller.check()
+    assert rejection.reason == "cpu_load"
+    assert rejection.retry_after == 30
+
+
+def test_client_limit_counts_unfinished_jobs(controller, jobs):
+    for job_id in ("a", "b"):
+        jobs.add_job(job_id)
+        controller.record("client", job_id)
+
+    assert controller.check("client", new_jobs=1) is None
+    assert controller.check("client", new_jobs=2).reason == "client_limit"
+    assert controller.check("other", new_jobs=2) is None
+    # Without a client the per-client limit isn't checked
+    assert controller.check(None, new_jobs=2) is None
+
+    jobs.jobs["a"].status = "completed"
+    assert controller.active_jobs("client") == 1
+    assert controller.check("client", new_jobs=2) is None
+
+
+def test_limits_of_zero_are_not_checked(controller, jobs):
+    controller.max_queued_jobs = 0
+    controller.max_jobs_per_client = 0
+    jobs.queued = 1000
+    for index in range(10):
+        jobs.add_job(str(index))
+        controller.record("client", str(index))
+
+    assert controller.check("client", new_jobs=50) is None
+
+
+def test_batch_is_admitted_on_current_load(controller, jobs):
+    # Larger than both the queue and the client limit, on an idle server
+    assert controller.check_batch("client") is None
+
+    jobs.queued = 20
+    assert controller.check_batch("client").reason == "queue_full"
+    jobs.queued = 0
+
+    for job_id in ("a", "b", "c"):
+        jobs.add_job(job_id)
+        controller.record("client", job_id)
+    assert controller.check_batch("client").reason == "client_limit"
+    assert controller.check_batch("other") is None
+
+
+def test_batch_jobs_count_against_the_client(controller, jobs):
+    batches = BatchManager(jobs, controller)
+    items = [MontageBatchItem(mbid=f"album-{index}", duration="short") for index in range(5)]
+
+    async def submit():
+        batch_id = batches.submit(items, client="client")
+        await batches.tasks[batch_id]
+        return batch_id
+
+    assert controller.check_batch("client") is None
+    batch_id = asyncio.run(submit())
+
+    # Every item queued, beyond the client's limit of 3
+    assert batches.batches[batch_id].job_ids == [f"album-{index}-short" for index in range(5)]
+    assert controller.active_jobs("client") == 5
+    # Later requests wait for them
+    assert controller.check("client").reason == "client_limit"
+    assert controller.check_batch("client").reason == "client_limit"
+    assert not batches.tasks
@@ -0,0 +1,67 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from api.schemas import AlbumDetail, AudioCodec, Track
+from services.jobs import JobContext, JobManager, TrackWork
+from services.registry import JobRecord
+from services.workspace import JobWorkspace
+
+TRACKS = [Track(number=number, title=f"Track {number}") for number in (1, 2, 3)]
+
+
+@pytest.fixture
+def album_job(tmp_path, monkeypatch):
+    """A job whose three clips are measured and waiting for the album encode; track 2's fails."""
+    manager = JobManager()
+    job_id = "job-1"
+    job = manager.jobs[job_id] = JobRecord()
+    job.set_tracks(TRACKS)
+    album = AlbumDetail(mbid="mbid", title="Album", artist="Artist", tracks=TRACKS)
+    context = JobContext(job_id, album, 0.1, AudioCodec.MP3, "192k", tmp_path, JobWorkspace(str(tmp_path), job_id))
+
+    works = []
+    for index, track in enumerate(TRACKS):
+        work = TrackWork(index, track)
+        work.clip = (np.zeros((4410, 2), dtype=np.float32), 44100)
+        work.clip_seconds = 0.1
+        work.loudness = -14.0
+        works.append(work)
+
+    events = []
+
+    async def encode_clip(samples, rate, output_path, **kwargs):
+        await asyncio.sleep(0.01)
+        if output_path.endswith("track_02.mp3"):
+            raise RuntimeError("encoder crashed")
+        events.append(("encoded", output_path.rsplit("_", 1)[1]))
+
+    monkeypatch.setattr(manager.processor, "encode_clip", encode_clip)
+    monkeypatch.setattr(manager.processor, "compute_gains", lambda loudness, *args, **kwargs: [0.0] * len(loudness))
+    monkeypatch.setattr(manager, "_publish", lambda job_id, kind, data, share=True: events.append((kind, data)))
+    return manager, context, works, events
+
+
+def test_one_failed_encode_fails_only_its_track(album_job):
+    manager, context, works, events = album_job
+
+    encoded = asyncio.run(manager._encode_album(context, works))
+    assert [work.track.number for work in encoded] == [1, 3]
+
+    job = manager.jobs[context.job_id]
+    assert [job.track_state(index) for index in range(3)] == ["complete", "failed", "complete"]
+    assert job.completed_tracks == 2
+    assert job.errors == ["Track 2: encoder crashed"]
+
+
+def test_tracks_complete_only_after_their_encode(album_job):
+    manager, context, works, events = album_job
+
+    asyncio.run(manager._encode_album(context, works))
+
+    order = [(kind, data if kind == "encoded" else data.get("track_number")) for kind, data in events]
+    for number in (1, 3):
+        assert order.index(("encoded", f"0{number}.mp3")) < order.index(("track_complete", number))
+    assert ("track_complete", 2) not in order
+    assert ("error", 2) in order
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from services.artifacts import TrackArtifactCache
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Locks are checked by PID with os.kill")
+
+OLD = 1_000_000_000  # An mtime far past any max age
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TrackArtifactCache(str(tmp_path), max_mb=1, max_age_hours=1)
+
+
+def cached(cache: TrackArtifactCache, key: str) -> str:
+    path = cache.download_path(key)
+    with open(path, "wb") as f:
+        f.write(b"mp3")
+    os.utime(path, (OLD, OLD))
+    return path
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_lease_is_visible_to_other_processes(cache, tmp_path):
+    source = tmp_path / "download.mp3"
+
+    async def download():
+        source.write_bytes(b"mp3")
+        return str(source)
+
+    path = asyncio.run(cache.fetch_download("key", download))
+    assert os.path.exists(cache.lock_path("key"))
+
+    # Another process sharing the directory sees the lease
+    other = TrackArtifactCache(cache.cache_dir, max_mb=1, max_age_hours=1)
+    os.utime(path, (OLD, OLD))
+    other.prune()
+    assert os.path.exists(path)
+
+    cache.release("key", path)
+    assert not os.path.exists(cache.lock_path("key"))
+    # Releasing counts as a use
+    assert os.path.getmtime(path) > OLD
+
+
+def test_prune_skips_entries_locked_by_live_processes(cache):
+    path = cached(cache, "key")
+    open(cache.lock_path("key", os.getppid()), "w").close()
+
+    cache.prune()
+    assert os.path.exists(path)
+
+
+def test_prune_removes_stale_locks(cache):
+    path = cached(cache, "key")
+    lock = cache.lock_path("key", dead_pid())
+    open(lock, "w").close()
+
+    cache.prune()
+    assert not os.path.exists(lock)
+    assert not os.path.exists(path)
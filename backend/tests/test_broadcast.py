@@ -0,0 +1,61 @@
+import asyncio
+
+from services.broadcast import Subscriber
+
+TOPIC = "job:abc"
+
+
+def message(type_: str, topic: str = TOPIC, **data) -> dict:
+    return {"topic": topic, "type": type_, "data": data}
+
+
+def queued(*messages) -> list:
+    """Offer messages to a subscriber whose sends never finish and return its queue."""
+    async def offer():
+        stalled = asyncio.Event()
+        subscriber = Subscriber(lambda _message: stalled.wait(), send_timeout=60)
+        for item in messages:
+            subscriber.offer(item)
+        result = [(item["topic"], item["type"], item["data"]) for item in subscriber.queue]
+        subscriber.close()
+        return result
+
+    return asyncio.run(offer())
+
+
+def test_consecutive_progress_is_merged():
+    assert queued(
+        message("progress", current_track=1, progress=0.1),
+        message("progress", current_track=1, progress=0.2, status="processing"),
+    ) == [(TOPIC, "progress", {"current_track": 1, "progress": 0.2, "status": "processing"})]
+
+
+def test_progress_never_moves_ahead_of_events():
+    assert queued(
+        message("progress", current_track=1, progress=0.4),
+        message("track_complete", track_number=1),
+        message("progress", current_track=1, progress=0.5),
+        message("done", tracks=[]),
+        message("progress", current_track=1, progress=1.0),
+    ) == [
+        (TOPIC, "progress", {"current_track": 1, "progress": 0.4}),
+        (TOPIC, "track_complete", {"track_number": 1}),
+        (TOPIC, "progress", {"current_track": 1, "progress": 0.5}),
+        (TOPIC, "done", {"tracks": []}),
+        (TOPIC, "progress", {"current_track": 1, "progress": 1.0}),
+    ]
+
+
+def test_only_the_newest_message_of_a_topic_is_merged_into():
+    assert queued(
+        message("progress", progress=0.1),
+        message("progress", current_track=3, progress=0.5),
+        message("progress", progress=0.6),
+        message("progress", topic="job:other", progress=0.9),
+        message("progress", progress=0.7),
+    ) == [
+        (TOPIC, "progress", {"progress": 0.1}),
+        (TOPIC, "progress", {"current_track": 3, "progress": 0.5}),
+        (TOPIC, "progress", {"progress": 0.7}),
+        ("job:other", "progress", {"progress": 0.9}),
+    ]
@@ -0,0 +1,148 @@
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from services.computepool import MB, ComputeMemoryExceeded, ComputePool
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"),
+    reason="RSS is read from /proc"
+)
+
+
+def worker_pid() -> int:
+    return os.getpid()
+
+
+def allocate(megabytes: int) -> int:
+    """Touch memory and hold it long enough for the pool to sample RSS."""
+    block = bytearray(megabytes * MB)
+    for offset in range(0, len(block), 4096):
+        block[offset] = 1
+    time.sleep(2)
+    return len(block)
+
+
+def allocate_in_subprocess(megabytes: int, pid_file: str) -> int:
+    """Leave the allocation to a child process, as ffmpeg decodes are."""
+    child = subprocess.Popen([sys.executable, "-c", (
+        f"import time; block = bytearray({megabytes} * 1024 * 1024)\n"
+        "for offset in range(0, len(block), 4096): block[offset] = 1\n"
+        "time.sleep(5)"
+    )])
+    with open(pid_file, "w") as f:
+        f.write(str(child.pid))
+    return child.wait()
+
+
+def fail():
+    raise KeyError("boom")
+
+
+@pytest.fixture
+def pool_factory(monkeypatch):
+    pools = []
+
+    def create(**kwargs) -> ComputePool:
+        pool = ComputePool(1, poll_seconds=0.02, **kwargs)
+        # Plain spawn children: nothing to preload, and this module's
+        # functions import by name in the child
+        pool._context = multiprocessing.get_context("spawn")
+        pools.append(pool)
+        return pool
+
+    yield create
+    for pool in pools:
+        pool.shutdown()
+
+
+def wait_for_exit(pid: int, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                if f.read().rsplit(")", 1)[1].split()[0] in ("Z", "X"):
+                    return True
+        except FileNotFoundError:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_without_workers_runs_in_threads():
+    pool = ComputePool(0)
+    assert run(pool.run(worker_pid)) == os.getpid()
+    assert pool.workers == []
+
+
+def test_worker_is_replaced_after_max_tasks(pool_factory):
+    pool = pool_factory(max_tasks_per_child=2)
+
+    async def tasks():
+        return [await pool.run(worker_pid) for _ in range(5)]
+
+    pids = run(tasks())
+    assert os.getpid() not in pids
+    assert pids[0] == pids[1] != pids[2] == pids[3] != pids[4]
+    assert pool.recycled["max_tasks"] == 2
+
+
+def test_task_exceptions_keep_the_worker(pool_factory):
+    pool = pool_factory(max_tasks_per_child=10)
+
+    async def tasks():
+        first = await pool.run(worker_pid)
+        with pytest.raises(KeyError):
+            await pool.run(fail)
+        return first, await pool.run(worker_pid)
+
+    first, second = run(tasks())
+    assert first == second
+    assert sum(pool.recycled.values()) == 0
+
+
+def test_task_over_rss_ceiling_is_killed(pool_factory):
+    pool = pool_factory(max_tasks_per_child=10, max_task_rss_mb=200)
+
+    async def tasks():
+        first = await pool.run(worker_pid)
+        with pytest.raises(ComputeMemoryExceeded):
+            await pool.run(allocate, 400)
+        # The next task gets a fresh worker
+        return first, await pool.run(worker_pid)
+
+    first, second = run(tasks())
+    assert first != second
+    assert pool.recycled["memory"] == 1
+    assert pool.stats()["workers"][0]["pid"] == second
+
+
+def test_task_under_rss_ceiling_completes(pool_factory):
+    pool = pool_factory(max_tasks_per_child=10, max_task_rss_mb=1024)
+
+    assert run(pool.run(allocate, 50)) == 50 * MB
+    assert pool.recycled["memory"] == 0
+    assert pool.stats()["workers"][0]["peak_rss_mb"] >= 50
+
+
+def test_subprocess_memory_counts_against_the_task(pool_factory, tmp_path):
+    pool = pool_factory(max_tasks_per_child=10, max_task_rss_mb=300)
+    pid_file = str(tmp_path / "child.pid")
+
+    with pytest.raises(ComputeMemoryExceeded):
+        run(pool.run(allocate_in_subprocess, 400, pid_file))
+    assert pool.recycled["memory"] == 1
+
+    # The subprocess went down with its worker (left as a zombie if nothing reaps it)
+    with open(pid_file) as f:
+        child = int(f.read())
+    assert wait_for_exit(child)
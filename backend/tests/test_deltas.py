@@ -0,0 +1,102 @@
+from services.deltas import DeltaEncoder
+
+TOPIC = "job:abc"
+
+
+def status_message() -> dict:
+    return {
+        "topic": TOPIC,
+        "type": "status",
+        "data": {
+            "status": "processing",
+            "progress": 0.0,
+            "current_track": None,
+            "total_tracks": 2,
+            "completed_tracks": 0,
+            "errors": [],
+            "track_statuses": [
+                {"track_number": 1, "track_title": "One", "status": "pending", "error": None},
+                {"track_number": 2, "track_title": "Two", "status": "pending", "error": None},
+            ],
+            "stages": {"download": {"queued": 2, "active": 0, "done": 0}},
+        },
+    }
+
+
+def progress(**data) -> dict:
+    return {"topic": TOPIC, "type": "progress", "data": data}
+
+
+def test_snapshot_is_compact():
+    snapshot = DeltaEncoder().encode(status_message())
+
+    assert snapshot["type"] == "snapshot"
+    data = snapshot["data"]
+    # Empty and null fields are left out
+    assert "current_track" not in data and "errors" not in data
+    assert data["tracks"] == [[1, "pending", "One"], [2, "pending", "Two"]]
+    assert data["st"] == {"download": [2, 0, 0]}
+    assert data["status"] == "processing"
+
+
+def test_progress_only_sends_changes():
+    encoder = DeltaEncoder()
+    encoder.encode(status_message())
+
+    delta = encoder.encode(progress(
+        status="processing",
+        progress=0.5,
+        track_status={"track_number": 1, "track_title": "One", "status": "downloading"},
+        stages={"download": {"queued": 1, "active": 1, "done": 0}},
+    ))
+    assert delta == {
+        "topic": TOPIC,
+        "type": "delta",
+        "data": {"progress": 0.5, "tr": [1, "downloading"], "st": {"download": [1, 1, 0]}},
+    }
+
+    # Nothing changed: nothing to send
+    assert encoder.encode(progress(progress=0.5, stages={"download": {"queued": 1, "active": 1, "done": 0}})) is None
+
+
+def test_track_errors_are_included():
+    encoder = DeltaEncoder()
+    encoder.encode(status_message())
+
+    delta = encoder.encode(progress(
+        track_status={"track_number": 2, "track_title": "Two", "status": "failed", "error": "Download failed"}
+    ))
+    assert delta["data"]["tr"] == [2, "failed", "Download failed"]
+
+
+def test_album_is_sent_once():
+    encoder = DeltaEncoder()
+    album = {"mbid": "m", "title": "Album", "tracks": []}
+
+    assert encoder.encode(progress(album=album))["data"] == {"album": album}
+    assert encoder.encode(progress(album=album)) is None
+
+
+def test_forget_starts_over():
+    encoder = DeltaEncoder()
+    encoder.encode(progress(progress=0.25))
+    assert encoder.encode(progress(progress=0.25)) is None
+
+    encoder.forget(TOPIC)
+    assert encoder.encode(progress(progress=0.25))["data"] == {"progress": 0.25}
+
+
+def test_events_and_other_topics_pass_through():
+    encoder = DeltaEncoder()
+    done = {"topic": TOPIC, "type": "done", "data": {"tracks": []}}
+    library = {"topic": "library", "type": "montage_saved", "data": {"id": "x"}}
+
+    assert encoder.encode(done) is done
+    assert encoder.encode(library) is library
+
+
+def test_connections_are_independent():
+    first, second = DeltaEncoder(), DeltaEncoder()
+    first.encode(progress(progress=0.5))
+
+    assert second.encode(progress(progress=0.5))["data"] == {"progress": 0.5}
@@ -0,0 +1,117 @@
+import pytest
+
+from api.schemas import AlbumDetail, JobStatus, Track, TrackStatus
+from services.jobstore import JobStore
+
+
+def job_status(status: str = "queued", completed: int = 0) -> JobStatus:
+    return JobStatus(
+        status=status,
+        progress=completed / 2,
+        total_tracks=2,
+        completed_tracks=completed,
+        track_statuses=[
+            TrackStatus(track_number=1, track_title="One", status="complete" if completed else "pending"),
+            TrackStatus(track_number=2, track_title="Two", status="pending"),
+        ],
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+def create(store: JobStore, job_id: str, status: str = "queued", mbid: str = "mbid"):
+    store.create_job(job_id, mbid, "short", "mp3", "192k", "normal", job_status(status), owner="process-1")
+
+
+def test_job_round_trip(store):
+    create(store, "job-1")
+    album = AlbumDetail(mbid="mbid", title="Album", artist="Artist", tracks=[Track(number=1, title="One")])
+    store.save_album("job-1", album)
+    store.update_status("job-1", job_status("processing", completed=1))
+
+    assert store.load_album("job-1") == album
+    status = store.load_status("job-1")
+    assert status.status == "processing"
+    assert status.completed_tracks == 1
+    assert status.track_statuses[0].status == "complete"
+
+    assert store.load_status("missing") is None
+    assert store.load_album("missing") is None
+
+
+def test_track_stages_keep_earlier_values(store):
+    create(store, "job-1")
+    store.save_track("job-1", 0, "downloaded", artifact_key="key-1")
+    store.save_track("job-1", 0, "analyzed", loudness=-12.5, clip_seconds=30.0)
+    store.save_track("job-1", 0, "encoded", file_path="/montages/job-1/track_01.mp3")
+    store.save_track("job-1", 1, "failed")
+
+    tracks = store.load_tracks("job-1")
+    assert tracks[0]["stage"] == "encoded"
+    assert tracks[0]["artifact_key"] == "key-1"
+    assert tracks[0]["loudness"] == -12.5
+    assert tracks[0]["file_path"] == "/montages/job-1/track_01.mp3"
+    assert tracks[1]["stage"] == "failed"
+
+
+def test_unfinished_jobs_survive_reopening(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path)
+    create(store, "queued", "queued")
+    create(store, "running", "processing")
+    create(store, "done", "completed")
+    store.close()
+
+    reopened = JobStore(path)
+    unfinished = reopened.unfinished_jobs()
+    assert [row["job_id"] for row in unfinished] == ["queued", "running"]
+    assert unfinished[0]["owner"] == "process-1"
+    assert reopened.find_unfinished("mbid", "short", "mp3", "192k") == "running"
+    assert reopened.find_unfinished("mbid", "long", "mp3", "192k") is None
+    reopened.close()
+
+
+def test_claim_job_has_one_winner(store):
+    create(store, "job-1")
+    assert store.claim_job("job-1", "process-2", "process-1")
+    assert not store.claim_job("job-1", "process-3", "process-1")
+
+
+def test_requesters(store):
+    create(store, "job-1")
+    store.add_requester("job-1")
+
+    assert store.release_requester("job-1") == 1
+    assert store.release_requester("job-1") == 0
+    assert store.release_requester("job-1") == 0
+    assert store.release_requester("missing") == 0
+
+
+def test_disabled_store_does_nothing(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), enabled=False)
+    create(store, "job-1")
+
+    assert store.load_status("job-1") is None
+    assert store.unfinished_jobs() == []
+    assert store.release_requester("job-1") == 0
+    assert not (tmp_path / "jobs.db").exists()
+
+
+def test_prune_deletes_expired_finished_jobs(store):
+    create(store, "old-done", "completed")
+    create(store, "old-failed", "failed")
+    create(store, "old-running", "processing")
+    store.save_track("old-done", 0, "encoded")
+    store.db.execute("UPDATE jobs SET updated_at = '2000-01-01T00:00:00'")
+    create(store, "new-done", "completed")
+
+    assert store.prune(3600) == 2
+    remaining = [row["job_id"] for row in store.db.execute("SELECT job_id FROM jobs ORDER BY job_id")]
+    assert remaining == ["new-done", "old-running"]
+    assert store.load_tracks("old-done") == {}
+    assert store.prune(3600) == 0
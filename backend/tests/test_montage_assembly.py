@@ -0,0 +1,91 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from api.schemas import AlbumDetail, AudioCodec, Track
+from config.settings import settings
+from services import processor as processor_module
+from services.jobs import JobContext, JobManager, TrackWork
+from services.processor import ProcessorService
+from services.registry import JobRecord
+from services.workspace import JobWorkspace
+
+
+@pytest.fixture
+def frames(monkeypatch):
+    monkeypatch.setattr(settings, "MONTAGE_ASSEMBLY", "frames")
+    monkeypatch.setattr(settings, "CLIP_BITRATE", None)
+    monkeypatch.setattr(settings, "MONTAGE_BITRATE", None)
+    monkeypatch.setattr(settings, "MONTAGE_CODEC", "mp3")
+
+
+@pytest.fixture
+def splices(monkeypatch):
+    """Record frame splices instead of decoding MP3, so no ffmpeg is needed."""
+    calls = []
+
+    def splice(clip_paths, output_path, crossfade_duration, bitrate=None):
+        calls.append((list(clip_paths), bitrate))
+        Path(output_path).write_bytes(b"montage")
+
+    monkeypatch.setattr(processor_module, "splice_with_crossfades", splice)
+    monkeypatch.setattr(ProcessorService, "_write_montage_peaks", staticmethod(lambda *args: None))
+    return calls
+
+
+def test_clip_bitrate(frames, monkeypatch):
+    assert ProcessorService.clip_bitrate(AudioCodec.MP3) == "320k"
+    assert ProcessorService.clip_bitrate(AudioCodec.MP3, "128k") == "128k"
+    # Frames can't be copied across codecs
+    assert ProcessorService.clip_bitrate(AudioCodec.AAC) == "160k"
+
+    monkeypatch.setattr(settings, "CLIP_BITRATE", "256k")
+    assert ProcessorService.clip_bitrate(AudioCodec.MP3) == "256k"
+
+    monkeypatch.setattr(settings, "CLIP_BITRATE", None)
+    monkeypatch.setattr(settings, "MONTAGE_ASSEMBLY", "reencode")
+    assert ProcessorService.clip_bitrate(AudioCodec.MP3) == "192k"
+
+
+def test_default_clips_are_spliced_at_the_montage_bitrate(frames, splices, tmp_path):
+    clips = [str(tmp_path / f"track_0{number}.mp3") for number in (1, 2)]
+    clip_kbps = int(ProcessorService.clip_bitrate(AudioCodec.MP3).rstrip("k"))
+
+    asyncio.run(ProcessorService.create_montage(clips, str(tmp_path / "montage.mp3"), 0.5))
+    assert splices == [(clips, clip_kbps)]
+
+
+@pytest.fixture
+def job(tmp_path):
+    """A job manager with one job whose three tracks were encoded, except the second."""
+    manager = JobManager()
+    manager.jobs["job-1"] = JobRecord()
+    album = AlbumDetail(mbid="mbid", title="Album", artist="Artist", tracks=[Track(number=1, title="One")])
+    context = JobContext("job-1", album, 0.1, AudioCodec.MP3, "320k", tmp_path, JobWorkspace(str(tmp_path), "job-1"))
+    works = []
+    for number in (1, 2, 3):
+        work = TrackWork(number - 1, Track(number=number, title=str(number)))
+        work.file_path = str(tmp_path / f"track_0{number}.mp3")
+        works.append(work)
+    works[1].file_path = None
+    return manager, context, works
+
+
+def test_job_assembles_its_montage(frames, splices, job, tmp_path):
+    manager, context, works = job
+
+    path = asyncio.run(manager._assemble_montage(context, works, 0.5))
+    assert path == str(tmp_path / "montage.mp3")
+    assert splices == [([works[0].file_path, works[2].file_path], 320)]
+
+
+def test_montage_failure_keeps_the_job(frames, job, monkeypatch):
+    manager, context, works = job
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("no ffmpeg")
+
+    monkeypatch.setattr(manager.processor, "create_montage", fail)
+    assert asyncio.run(manager._assemble_montage(context, works, 0.5)) is None
+    assert manager.jobs["job-1"].errors == ["Montage: no ffmpeg"]
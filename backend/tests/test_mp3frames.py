@@ -0,0 +1,115 @@
+import asyncio
+import shutil
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pydub")
+if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+    pytest.skip("ffmpeg and ffprobe are needed to encode test clips", allow_module_level=True)
+
+from benchmarks.codec_benchmark import synthetic_audio
+from services.mp3frames import Mp3Stream, splice_with_crossfades
+from services.processor import ProcessorService
+
+RATE = 44100
+CLIP_SECONDS = 4
+
+
+def encode_clip(path, seconds=CLIP_SECONDS, bitrate="128k") -> str:
+    synthetic_audio(seconds, RATE).export(str(path), format="mp3", bitrate=bitrate)
+    return str(path)
+
+
+@pytest.fixture
+def clips(tmp_path):
+    return [encode_clip(tmp_path / f"clip_{index}.mp3") for index in range(3)]
+
+
+def read_stream(path) -> Mp3Stream:
+    with open(path, "rb") as f:
+        return Mp3Stream(f.read())
+
+
+def test_parses_frames_and_gapless_info(clips):
+    stream = read_stream(clips[0])
+
+    assert (stream.sample_rate, stream.channels, stream.samples_per_frame) == (RATE, 2, 1152)
+    assert stream.has_gapless_info
+    assert stream.tag_frame is not None
+    assert {frame.bitrate for frame in stream.frames} == {128}
+    assert stream.length == CLIP_SECONDS * RATE
+
+
+def test_rejects_data_without_frames():
+    with pytest.raises(ValueError):
+        Mp3Stream(bytes(4096))
+
+
+def test_decode_returns_requested_range(clips):
+    stream = read_stream(clips[0])
+
+    pcm = stream.decode(RATE, RATE + 5000)
+    assert pcm.shape == (5000, 2)
+    assert np.abs(pcm).max() > 0.1
+
+    # Samples past the end of the stream are silence
+    tail = stream.decode(stream.length - 100, stream.length + 100)
+    assert tail.shape == (200, 2)
+    assert not tail[100:].any()
+
+
+def test_splice_keeps_gapless_length(clips, tmp_path):
+    output = str(tmp_path / "montage.mp3")
+    splice_with_crossfades(clips, output, crossfade_duration=1.0, bitrate=128)
+
+    montage = read_stream(output)
+    assert montage.has_gapless_info
+    # Each of the two crossfades is nudged by less than half a frame onto the frame grid
+    expected = 3 * CLIP_SECONDS * RATE - 2 * RATE
+    assert abs(montage.length - expected) < montage.samples_per_frame
+
+    # Copied frames come through byte for byte
+    first = read_stream(clips[0])
+    assert montage.frame_bytes(0, 10) == first.frame_bytes(0, 10)
+
+
+def test_splice_at_the_top_bitrate(tmp_path):
+    # No higher bitrate is left to carry the reservoir after a seam
+    clips = [encode_clip(tmp_path / f"clip_{index}.mp3", bitrate="320k") for index in range(3)]
+    output = str(tmp_path / "montage.mp3")
+    splice_with_crossfades(clips, output, crossfade_duration=1.0, bitrate=320)
+
+    montage = read_stream(output)
+    expected = 3 * CLIP_SECONDS * RATE - 2 * RATE
+    assert abs(montage.length - expected) < montage.samples_per_frame
+
+
+def test_splice_refuses_other_bitrate(clips, tmp_path):
+    with pytest.raises(ValueError, match="kbps"):
+        splice_with_crossfades(clips, str(tmp_path / "montage.mp3"), 1.0, bitrate=320)
+
+
+@pytest.mark.parametrize("bitrate, broken", [
+    ("128k", "missing"),
+    ("128k", "truncated"),
+    ("320k", None),
+])
+def test_splice_frames_falls_back(clips, tmp_path, bitrate, broken):
+    if broken == "missing":
+        clips.append(str(tmp_path / "missing.mp3"))
+    elif broken == "truncated":
+        truncated = tmp_path / "truncated.mp3"
+        with open(clips[0], "rb") as f:
+            truncated.write_bytes(f.read()[:300])
+        clips.append(str(truncated))
+
+    output = str(tmp_path / "montage.mp3")
+    assert not asyncio.run(ProcessorService._splice_frames(clips, output, 1.0, "frames", bitrate))
+
+
+def test_splice_frames_only_when_enabled(clips, tmp_path):
+    output = str(tmp_path / "montage.mp3")
+    assert not asyncio.run(ProcessorService._splice_frames(clips, output, 1.0, "reencode", "128k"))
+    assert asyncio.run(ProcessorService._splice_frames(clips, output, 1.0, "frames", "128k"))
+    assert read_stream(output).frames
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from api.schemas import Track
+from config.settings import settings
+from services.jobs import JobManager
+from services.jobstore import JobStore
+from services.registry import JobRecord, JobRegistry
+
+
+def record(status: str = "queued") -> JobRecord:
+    job = JobRecord()
+    job.status = status
+    return job
+
+
+def test_unfinished_jobs_are_never_evicted():
+    registry = JobRegistry(ttl_seconds=0, max_finished=0)
+    registry["running"] = record("processing")
+    registry.prune()
+
+    assert "running" in registry
+
+
+def test_finished_jobs_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    evicted = []
+    registry = JobRegistry(ttl_seconds=60, max_finished=10, on_evict=evicted.append)
+
+    registry["a"] = record("completed")
+    now[0] += 30
+    registry["b"] = record("failed")
+    assert registry.prune() == 0
+
+    now[0] += 31
+    assert registry.prune() == 1
+    assert "a" not in registry and "b" in registry
+    assert evicted == ["a"]
+
+
+def test_oldest_finished_jobs_beyond_limit_are_evicted():
+    registry = JobRegistry(ttl_seconds=3600, max_finished=2)
+    for job_id in ("a", "b", "c"):
+        registry[job_id] = record()
+        registry[job_id].status = "completed"
+        registry.mark_finished(job_id)
+
+    assert list(registry) == ["b", "c"]
+
+
+def test_record_round_trips_through_status():
+    job = record("processing")
+    job.set_tracks([Track(number=1, title="One"), Track(number=2, title="Two")])
+    job.set_track_state(0, "complete")
+    job.set_track_state(1, "failed", "Download failed")
+    job.add_error("Track 2 failed")
+
+    status = JobRecord.from_status(job.to_status()).to_status()
+    assert status == job.to_status()
+    assert status.track_statuses[1].error == "Download failed"
+
+
+def test_job_manager_prunes_on_a_timer(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_PRUNE_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "JOB_STORE_RETENTION_HOURS", 1)
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.create_job("stored", "mbid", "short", "mp3", "192k", "normal", record("completed").to_status())
+    store.db.execute("UPDATE jobs SET updated_at = '2000-01-01T00:00:00'")
+    manager = JobManager(store=store)
+    manager.jobs.ttl_seconds = 0.01
+    manager.jobs["done"] = record("completed")
+
+    async def run():
+        # No jobs are added or finished meanwhile; only the timer prunes
+        manager.start_pruning()
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            manager.pruner.cancel()
+
+    assert "done" in manager.jobs
+    asyncio.run(run())
+
+    assert "done" not in manager.jobs
+    assert store.load_status("stored") is None
+    store.close()
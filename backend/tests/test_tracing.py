@@ -0,0 +1,32 @@
+import os
+import time
+
+from services.tracing import JobTrace, prune_traces
+
+
+def saved_trace(directory, job_id: str, age_hours: float) -> str:
+    path = str(directory / f"{job_id}.json")
+    JobTrace(job_id).save(path)
+    then = time.time() - age_hours * 3600
+    os.utime(path, (then, then))
+    return path
+
+
+def test_prune_keeps_the_newest_traces(tmp_path):
+    for index in range(5):
+        saved_trace(tmp_path, f"job-{index}", age_hours=index)
+
+    assert prune_traces(str(tmp_path), max_files=3) == 2
+    assert sorted(os.listdir(tmp_path)) == ["job-0.json", "job-1.json", "job-2.json"]
+
+
+def test_prune_deletes_expired_traces(tmp_path):
+    saved_trace(tmp_path, "new", age_hours=1)
+    saved_trace(tmp_path, "old", age_hours=200)
+    (tmp_path / "notes.txt").write_text("not a trace")
+
+    assert prune_traces(str(tmp_path), max_age_hours=168) == 1
+    assert sorted(os.listdir(tmp_path)) == ["new.json", "notes.txt"]
+    # No limits, nothing deleted
+    assert prune_traces(str(tmp_path)) == 0
+    assert prune_traces(str(tmp_path / "missing"), max_files=1) == 0
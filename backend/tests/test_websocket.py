@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from api.routes.websocket import websocket_multiplex
+
+
+class FakeWebSocket:
+    """Feeds client frames to the endpoint and collects what it sends."""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self) -> str:
+        # Let the subscriber's sender catch up between frames
+        await asyncio.sleep(0.01)
+        if not self.frames:
+            raise WebSocketDisconnect()
+        return self.frames.pop(0)
+
+    async def send_json(self, message: dict):
+        self.sent.append(message)
+
+    async def send_text(self, text: str):
+        self.sent.append(text)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def converse(*frames) -> list:
+    websocket = FakeWebSocket(frames)
+    asyncio.run(websocket_multiplex(websocket))
+    return websocket.sent
+
+
+@pytest.mark.parametrize("request_frame", [
+    {"action": "subscribe", "topics": [1]},
+    {"action": "subscribe", "topics": ["library", None]},
+    {"action": "subscribe", "topics": {"library": True}},
+    {"action": "subscribe", "topics": "library"},
+    {"topics": ["library"]},
+    ["subscribe"],
+    "subscribe",
+])
+def test_malformed_requests_get_an_error_frame(request_frame):
+    sent = converse(json.dumps(request_frame), "not json", "ping", json.dumps({"action": "subscribe", "topics": ["library"]}))
+
+    errors = [message for message in sent if isinstance(message, dict) and message["type"] == "error"]
+    assert len(errors) == 2
+    # The connection keeps working afterwards
+    assert "pong" in sent
+    assert sent[-1] == {"topic": None, "type": "subscriptions", "data": {"topics": ["library"]}}
+
+
+def test_unknown_topics_and_jobs_are_reported():
+    sent = converse(json.dumps({"action": "subscribe", "topics": ["nope", "job:missing"]}))
+
+    assert {"topic": "nope", "type": "error", "data": {"message": "Unknown topic"}} in sent
+    assert {"topic": "job:missing", "type": "error", "data": {"message": "Job not found"}} in sent
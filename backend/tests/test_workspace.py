@@ -0,0 +1,35 @@
+import os
+import time
+
+from services.workspace import JobWorkspace, sweep_workspaces
+
+
+def workspace(root, job_id: str, age_seconds: float = 0) -> JobWorkspace:
+    workspace = JobWorkspace(str(root), job_id).create()
+    path = workspace.file("track_1.mp3")
+    with open(path, "wb") as f:
+        f.write(b"mp3")
+    then = time.time() - age_seconds
+    for item in (path, workspace.path):
+        os.utime(item, (then, then))
+    return workspace
+
+
+def test_sweep_keeps_listed_jobs(tmp_path):
+    workspace(tmp_path, "kept")
+    workspace(tmp_path, "orphan")
+
+    assert sweep_workspaces(str(tmp_path), keep=["kept"]) == 1
+    assert os.listdir(tmp_path) == ["kept"]
+
+
+def test_sweep_spares_recently_used_workspaces(tmp_path):
+    workspace(tmp_path, "resumable", age_seconds=7200)
+    workspace(tmp_path, "old", age_seconds=7200)
+    busy = workspace(tmp_path, "busy", age_seconds=7200)
+    # Another process is still writing into this one
+    with open(busy.file("pcm_1.f32"), "wb") as f:
+        f.write(b"pcm")
+
+    assert sweep_workspaces(str(tmp_path), keep=["resumable"], min_age_seconds=3600) == 1
+    assert sorted(os.listdir(tmp_path)) == ["busy", "resumable"]
@@ -0,0 +1,53 @@
+"""
+Processing worker for distributed mode. Start the API with
+JOB_QUEUE_ENABLED=true and run any number of these (same JOB_QUEUE_URL):
+
+    python worker.py
+"""
+from services.jobs import job_manager
+from services.jobqueue import open_queue
+from services.distributed import QueueWorker
+from services.computepool import compute_pool
+from config.settings import settings
+import asyncio
+import os
+import signal
+import socket
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+async def main():
+    queue = open_queue(settings.JOB_QUEUE_URL, settings.WORKER_LEASE_SECONDS)
+    worker = QueueWorker(
+        job_manager,
+        queue,
+        settings.WORKER_ID or f"{socket.gethostname()}:{os.getpid()}",
+        settings.JOB_QUEUE_POLL_SECONDS
+    )
+
+    # SIGTERM stops the worker like Ctrl+C: running jobs go back to the queue
+    task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    job_manager.start_pruning()
+    try:
+        await worker.run()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if job_manager.pruner:
+            job_manager.pruner.cancel()
+        compute_pool.shutdown()
+        queue.close()
+
+
+if __name__ == "__main__":
+    os.makedirs(settings.TEMP_DIR, exist_ok=True)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -57,7 +57,8 @@ export function ProcessingView({ jobId, albumData, durationType, onReset, onGoTo
             return {
               number: ts.track_number,
               title: ts.track_title,
-              duration: trackInfo?.duration || 0
+              duration: trackInfo?.duration || 0,
+              recording_id: trackInfo?.recording_id
               // file_path will be constructed by the backend
             };
           });
@@ -81,7 +82,7 @@ export function ProcessingView({ jobId, albumData, durationType, onReset, onGoTo
     const interval = setInterval(() => {
       api.getJobStatus(jobId).then((newStatus) => {
         setStatus(newStatus);
-        if (newStatus.status === 'completed' || newStatus.status === 'failed') {
+        if (['completed', 'failed', 'cancelled'].includes(newStatus.status)) {
           setIsComplete(true);
           clearInterval(interval);
         }